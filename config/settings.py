@@ -145,9 +145,140 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
+# Media storage backend. 'filesystem' keeps uploads under MEDIA_ROOT; 's3'
+# stores them in an S3-compatible bucket (AWS S3, MinIO, Ceph RGW ...) through
+# django-storages (`uv sync --extra s3`), so several web nodes share media
+# without an NFS mount. All media I/O goes through the Storage API
+# (todolist_app/media_storage.py). For a local stand-in run
+# `docker compose --profile s3 up -d minio` and set
+# MEDIA_S3_ENDPOINT_URL=http://localhost:9000.
+MEDIA_STORAGE_BACKEND = env_get('MEDIA_STORAGE_BACKEND', 'filesystem')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+if MEDIA_STORAGE_BACKEND == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': env_get('MEDIA_S3_BUCKET', 'media'),
+            'endpoint_url': env_get('MEDIA_S3_ENDPOINT_URL') or None,
+            'region_name': env_get('MEDIA_S3_REGION') or None,
+            'access_key': env_get('MEDIA_S3_ACCESS_KEY_ID'),
+            'secret_key': env_get('MEDIA_S3_SECRET_ACCESS_KEY'),
+            'location': env_get('MEDIA_S3_PREFIX', ''),
+            # 媒體一律經由 /media/ 檢視提供（條件請求、Range），bucket 不需公開
+            'default_acl': None,
+            'querystring_auth': False,
+            'file_overwrite': False,
+        },
+    }
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB in bytes
 
+# Reject junk/oversized images from their first bytes, then hash uploads (BLAKE2b)
+# while they stream so identical images can be deduplicated
+FILE_UPLOAD_HANDLERS = [
+    'todolist_app.upload_handlers.ImageUploadGuardHandler',
+    'todolist_app.upload_handlers.HashingMemoryFileUploadHandler',
+    'todolist_app.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Pillow decompression-bomb limit (pixels); decoding more than twice this fails
+IMAGE_MAX_PIXELS = 4000 * 4000
+
+# Per-process limits for image decodes: at most IMAGE_DECODE_CONCURRENCY decodes
+# run at once and their estimated pixel memory stays within IMAGE_MEMORY_BUDGET
+# bytes; further uploads/variant jobs wait (see image_utils.DecodeLimiter)
+IMAGE_MEMORY_BUDGET = env_int('IMAGE_MEMORY_BUDGET', 256 * 1024 * 1024)
+IMAGE_DECODE_CONCURRENCY = env_int('IMAGE_DECODE_CONCURRENCY', 2)
+
+# Image variant registry (see todolist_app/image_utils.py).
+# crop: 'square' (pad to square), 'fit' (keep aspect ratio) or 'cover' (center crop).
+# formats are in preference order; the last entry is the fallback served to
+# clients that do not advertise the others in their Accept header. Add 'AVIF'
+# in front of 'WEBP' to enable AVIF output (slower to encode).
+# Set 'eager': False to skip a variant at upload time; it is then rendered on
+# first request by /media/thumb/<image_id>/<variant> and kept in the
+# thumbnail disk cache below.
+# thumb150 / preview800 back the thumbnail150 / thumbnail800 fields (admin
+# lists, API) and stay eager; the other sizes are rendered on demand. Images
+# uploaded before a variant was added get it with `manage.py backfill_image_variants`.
+IMAGE_VARIANTS = {
+    'thumb150': {'size': 150, 'crop': 'square', 'formats': ['WEBP', 'JPEG'], 'quality': 85},
+    'preview400': {'size': 400, 'crop': 'fit', 'formats': ['WEBP', 'JPEG'], 'quality': 85, 'eager': False},
+    'preview800': {'size': 800, 'crop': 'fit', 'formats': ['WEBP', 'JPEG'], 'quality': 85},
+    'preview1600': {'size': 1600, 'crop': 'fit', 'formats': ['WEBP', 'JPEG'], 'quality': 85, 'eager': False},
+}
+
+# Media files of deleted rows are removed after the transaction commits, in a
+# background thread pool (set to False to remove them inline in the commit hook)
+MEDIA_CLEANUP_ASYNC = env_bool('MEDIA_CLEANUP_ASYNC', True)
+MEDIA_CLEANUP_WORKERS = 2
+
+# Variants of bulk-uploaded images are generated after commit on a thread pool
+# (set to False to generate them inline in the commit hook)
+IMAGE_PROCESSING_ASYNC = env_bool('IMAGE_PROCESSING_ASYNC', True)
+IMAGE_PROCESSING_WORKERS = 4
+BULK_UPLOAD_MAX_FILES = 50
+# Total (decompressed) size of one bulk upload batch, zip entries included
+BULK_UPLOAD_MAX_BYTES = env_int('BULK_UPLOAD_MAX_BYTES', 100 * 1024 * 1024)
+
+# Media files are served by todolist_app.views_media.serve_media in every
+# environment. Behind nginx set MEDIA_ACCEL_MODE=x-accel-redirect and map
+# MEDIA_ACCEL_PREFIX to MEDIA_ROOT in an `internal` location; behind
+# Apache/lighttpd use x-sendfile. Empty streams the file from Python.
+MEDIA_ACCEL_MODE = env_get('MEDIA_ACCEL_MODE', '')
+MEDIA_ACCEL_PREFIX = env_get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# On-demand thumbnail cache (size-bounded, least recently used files are evicted).
+# Node-local and outside MEDIA_ROOT: it is served only through /media/thumb/
+# and is not swept by sweep_media.
+THUMB_CACHE_DIR = env_get('THUMB_CACHE_DIR', str(BASE_DIR / 'thumbcache'))
+THUMB_CACHE_MAX_BYTES = env_int('THUMB_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+# Cache shared by the web processes (rendered markdown, ...). Defaults to
+# per-process memory; to share it across processes/nodes set e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://127.0.0.1:6379/1, or
+# CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache and
+# CACHE_LOCATION=cache_table (after `manage.py createcachetable`).
+CACHES = {
+    'default': {
+        'BACKEND': env_get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env_get('CACHE_LOCATION', ''),
+    },
+}
+
+# Rendered BlogPost HTML is cached by (content hash, renderer version) in this alias
+MARKDOWN_RENDER_CACHE = 'default'
+
+# Public blog list: keyset-paginated page size and lifetime (seconds) of the
+# cached page fragments; any BlogPost save/delete invalidates them (blog_cache)
+BLOG_LIST_PAGE_SIZE = 20
+BLOG_LIST_CACHE_TIMEOUT = 300
+
+# Whole anonymous blog_detail / blog_list responses are cached this long
+# (seconds); saving or deleting a post invalidates its pages right away
+BLOG_PAGE_CACHE_TIMEOUT = 600
+
+# Full-text search (PostgreSQL tsvector; other databases use an icontains fallback).
+# 'simple' does no stemming, which suits mixed Chinese/English posts
+BLOG_SEARCH_CONFIG = env_get('BLOG_SEARCH_CONFIG', 'simple')
+# Search results per normalized query are cached this long (seconds)
+BLOG_SEARCH_CACHE_TIMEOUT = 300
+
+# Feeds and sitemaps: cached chunks expire after SYNDICATION_CACHE_TIMEOUT and
+# model changes invalidate them; proxies may keep them SYNDICATION_MAX_AGE seconds
+SYNDICATION_CACHE_TIMEOUT = 3600
+SYNDICATION_MAX_AGE = 900
+SITEMAP_MAX_URLS = 50000
+# Storefront URL templates ('{id}' is replaced) for the product / category
+# sitemaps; a section is left out while its template is empty
+CATALOG_PRODUCT_URL = env_get('CATALOG_PRODUCT_URL', '')
+CATALOG_CATEGORY_URL = env_get('CATALOG_CATEGORY_URL', '')
+
 # Production security hardening: enable only when DEBUG is False.
 if not DEBUG:
     # Redirect HTTP to HTTPS
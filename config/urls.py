@@ -17,13 +17,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include # 記得導入 include
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('app/', include('todolist_app.urls')), # 把 my_first_app 的網址掛載在 /app/ 之下
+    path(settings.MEDIA_URL.lstrip('/'), include('todolist_app.media_urls')),
 ]
-
-# Serve media files in development only
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Todo, BlogPost, Product, ProductImage, Category
+from django.template.defaultfilters import filesizeformat
+from .models import Todo, BlogPost, Product, ProductImage, Category, Tag
+from .blog_search import match_posts, uses_tsvector
 try:
 	from mptt.admin import MPTTModelAdmin
 except Exception:
@@ -20,6 +22,44 @@ class BlogPostAdmin(admin.ModelAdmin):
 	prepopulated_fields = {'slug': ('title',)}
 	readonly_fields = ('htmlContent', 'publishedAt', 'createdAt', 'updatedAt')
 
+	def get_search_results(self, request, queryset, search_term):
+		# PostgreSQL 上改用 searchVector 的 GIN 索引；其他資料庫維持 search_fields 的 ILIKE
+		if search_term.strip() and uses_tsvector(queryset.db):
+			return match_posts(queryset, search_term), False
+		return super().get_search_results(request, queryset, search_term)
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+	# postCount 由文章儲存時維護，不在此編輯
+	list_display = ('name', 'slug', 'postCount')
+	search_fields = ('name', 'slug')
+	prepopulated_fields = {'slug': ('name',)}
+	readonly_fields = ('postCount',)
+
+
+def image_metadata_display(obj):
+	"""以已儲存的中繼資料顯示「寬x高 · 格式 · 大小」，不讀取檔案"""
+	if not obj or not obj.has_image_metadata:
+		return '-'
+	parts = [f'{obj.imageWidth}x{obj.imageHeight}']
+	if obj.imageFormat:
+		parts.append(obj.imageFormat)
+	if obj.imageBytes is not None:
+		parts.append(filesizeformat(obj.imageBytes))
+	return ' · '.join(parts)
+
+
+def placeholder_display(obj):
+	"""顯示預覽佔位圖與主色色塊（皆為欄位中的資料，不需額外請求）"""
+	if not obj or not obj.placeholder:
+		return '-'
+	return format_html(
+		'<img src="{}" width="40" height="40" style="object-fit: cover; image-rendering: auto;" /> '
+		'<span style="display:inline-block;width:20px;height:20px;vertical-align:top;background:{};" title="{}"></span>',
+		obj.placeholder, obj.dominantColor or 'transparent', obj.dominantColor,
+	)
+
 
 class ProductImageInline(admin.TabularInline):
 	"""
@@ -29,8 +69,8 @@ class ProductImageInline(admin.TabularInline):
 	"""
 	model = ProductImage
 	extra = 1
-	fields = ('image_preview', 'image', 'isPrimary', 'displayOrder', 'altText')
-	readonly_fields = ('image_preview', 'uploadedAt')
+	fields = ('image_preview', 'image', 'image_info', 'placeholder_preview', 'isPrimary', 'displayOrder', 'altText')
+	readonly_fields = ('image_preview', 'image_info', 'placeholder_preview', 'uploadedAt')
 	ordering = ('-isPrimary', 'displayOrder')
 	
 	def image_preview(self, obj):
@@ -48,6 +88,16 @@ class ProductImageInline(admin.TabularInline):
 	
 	image_preview.short_description = '預覽'
 
+	def image_info(self, obj):
+		return image_metadata_display(obj)
+
+	image_info.short_description = '圖片資訊'
+
+	def placeholder_preview(self, obj):
+		return placeholder_display(obj)
+
+	placeholder_preview.short_description = '佔位圖 / 主色'
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -62,6 +112,7 @@ class ProductAdmin(admin.ModelAdmin):
 	readonly_fields = ('primary_image_preview', 'createdAt', 'updatedAt')
 	inlines = [ProductImageInline]
 	filter_horizontal = ('categories',)
+	actions = ['clone_products']
 	
 	fieldsets = (
 		(None, {
@@ -107,14 +158,19 @@ class ProductAdmin(admin.ModelAdmin):
 
 	categories_display.short_description = 'Categories'
 
+	@admin.action(description='複製選取的商品（含分類與圖片）')
+	def clone_products(self, request, queryset):
+		clones = [product.clone() for product in queryset]
+		self.message_user(request, f'已複製 {len(clones)} 個商品')
+
 
 @admin.register(Category)
 class CategoryAdmin(MPTTModelAdmin):
 	list_display = ('categoryName', 'parent', 'product_count', 'displayOrder', 'image_preview')
 	search_fields = ('categoryName',)
 	list_filter = ('parent', 'isActive')
-	readonly_fields = ('image_preview', 'createdAt', 'updatedAt')
-	fields = ('categoryName', 'parent', 'description', 'displayOrder', 'image', 'image_preview', 'isActive')
+	readonly_fields = ('image_preview', 'image_info', 'placeholder_preview', 'createdAt', 'updatedAt')
+	fields = ('categoryName', 'parent', 'description', 'displayOrder', 'image', 'image_preview', 'image_info', 'placeholder_preview', 'isActive')
 
 	def product_count(self, obj):
 		return obj.products.count()
@@ -124,6 +180,14 @@ class CategoryAdmin(MPTTModelAdmin):
 			return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', obj.thumbnail150.url)
 		return '-'
 
+	def image_info(self, obj):
+		return image_metadata_display(obj)
+
+	def placeholder_preview(self, obj):
+		return placeholder_display(obj)
+
 	image_preview.short_description = '圖片預覽'
+	image_info.short_description = '圖片資訊'
+	placeholder_preview.short_description = '佔位圖 / 主色'
 	product_count.short_description = '商品數'
 
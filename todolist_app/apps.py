@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class MyFirstAppConfig(AppConfig):
     name = 'todolist_app'
-    
\ No newline at end of file
+
+    def ready(self):
+        from .image_utils import configure_pillow_limits
+        configure_pillow_limits()
@@ -0,0 +1,119 @@
+"""
+公開部落格頁面快取
+
+匿名訪客的文章頁與列表頁整頁快取（含 ETag / Last-Modified），命中時不查詢資料庫、也不渲染模板。
+文章頁以 slug 為鍵，文章儲存或刪除時刪除；列表頁以列表版本為鍵，版本遞增後舊頁面自然失效。
+"""
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+import time
+
+
+LIST_VERSION_KEY = 'blog:list:version'
+PAGE_KEY_PREFIX = 'blog:page'
+DEFAULT_LIST_CACHE_TIMEOUT = 300
+DEFAULT_PAGE_CACHE_TIMEOUT = 600
+
+
+def blog_cache():
+    return caches[getattr(settings, 'BLOG_CACHE', 'default')]
+
+
+def list_cache_timeout():
+    return getattr(settings, 'BLOG_LIST_CACHE_TIMEOUT', DEFAULT_LIST_CACHE_TIMEOUT)
+
+
+def page_cache_timeout():
+    return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', DEFAULT_PAGE_CACHE_TIMEOUT)
+
+
+def list_version():
+    """Current version of the public post listing."""
+    cache = blog_cache()
+    version = cache.get(LIST_VERSION_KEY)
+    if version is None:
+        # add() so two processes starting at once agree on the initial value;
+        # a timestamp so an evicted key never restarts at an old version
+        cache.add(LIST_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(LIST_VERSION_KEY)
+    return version
+
+
+def bump_list_version():
+    """Invalidate every cached list page."""
+    cache = blog_cache()
+    try:
+        cache.incr(LIST_VERSION_KEY)
+    except ValueError:
+        # key missing (evicted or never read): restart from a value that cannot
+        # match a version an old page was cached under
+        cache.set(LIST_VERSION_KEY, time.time_ns(), None)
+
+
+def detail_page_key(slug):
+    return f'{PAGE_KEY_PREFIX}:detail:{slug}'
+
+
+def list_page_key(cursor):
+    return f'{PAGE_KEY_PREFIX}:list:{list_version()}:{cursor}'
+
+
+def tag_page_key(slug, cursor):
+    return f'{PAGE_KEY_PREFIX}:tag:{list_version()}:{slug}:{cursor}'
+
+
+def invalidate_posts(slugs):
+    """Drop the cached detail pages of `slugs` and every cached list page."""
+    blog_cache().delete_many([detail_page_key(slug) for slug in slugs if slug])
+    bump_list_version()
+
+
+def make_etag(*parts):
+    return quote_etag('-'.join(str(p) for p in parts))
+
+
+def is_cacheable(request):
+    """Only anonymous GET/HEAD requests without pending flash messages share pages."""
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # len() loads the messages without marking them as shown
+    return not len(messages.get_messages(request))
+
+
+def cached_page(request, key, build):
+    """Serve the page cached under `key`, building and storing it on a miss.
+
+    `build()` returns ``(response, etag, last_modified_timestamp)``. Requests
+    that may not share a cached page get the built response as is.
+    """
+    cacheable = is_cacheable(request)
+    entry = blog_cache().get(key) if cacheable else None
+    if entry is None:
+        response, etag, lastModified = build()
+        if not cacheable or response.status_code != 200:
+            return response
+        entry = {
+            'content': response.content,
+            'contentType': response['Content-Type'],
+            'etag': etag,
+            'lastModified': lastModified,
+        }
+        blog_cache().set(key, entry, page_cache_timeout())
+    return _entry_response(request, entry)
+
+
+def _entry_response(request, entry):
+    response = HttpResponse(entry['content'], content_type=entry['contentType'])
+    response['ETag'] = entry['etag']
+    if entry['lastModified'] is not None:
+        response['Last-Modified'] = http_date(entry['lastModified'])
+    # the same URL renders differently once signed in (session cookie)
+    patch_vary_headers(response, ('Cookie',))
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['lastModified'], response=response,
+    )
@@ -0,0 +1,219 @@
+"""Full-text search over published blog posts.
+
+On PostgreSQL every post carries a weighted ``tsvector`` (``BlogPost.
+searchVector``: title A, tags and summary B, rendered body text C) that
+``BlogPost.save`` rebuilds with a single UPDATE whenever one of those fields
+may have changed. Queries use ``websearch_to_tsquery`` against it through the
+GIN index declared on the model (``SearchVectorIndex``), are ranked with
+``ts_rank`` and get ``ts_headline`` snippets computed only for the returned
+rows. The body text is derived in SQL from ``htmlContent`` by ``body_text``,
+so the indexed text and the snippets are built from the same source.
+
+Other databases (SQLite in tests and local development) have no ``tsvector``;
+they fall back to ``icontains`` matching with the same weights applied in
+Python, so the endpoint behaves the same, only slower.
+
+Queries are normalized (NFKC, case-folded, whitespace collapsed, bounded
+length) before being cached. Cached results are keyed by the blog list version
+(``blog_cache.list_version``), so any post save or delete invalidates them.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, Func, Q, TextField, Value
+from django.db.models.functions import Coalesce, Replace
+from django.utils.html import escape, strip_tags
+import hashlib
+import html
+import re
+import unicodedata
+
+from .blog_cache import blog_cache, list_version
+
+
+SEARCH_CACHE_PREFIX = 'blog:search'
+DEFAULT_SEARCH_CACHE_TIMEOUT = 300
+DEFAULT_SEARCH_CONFIG = 'simple'
+MAX_QUERY_LENGTH = 100
+MAX_QUERY_TERMS = 8
+MAX_RESULTS = 50
+
+# ts_headline / fallback snippet markers, replaced by <mark> after escaping
+START_SEL = '\x02'
+STOP_SEL = '\x03'
+SNIPPET_CHARS = 160
+
+# relative weights of the fallback ranking, mirroring ts_rank's A/B/C defaults;
+# 'body' is the visible text of htmlContent, the source of the snippets
+FALLBACK_WEIGHTS = (('title', 1.0), ('tags', 0.4), ('summary', 0.4), ('body', 0.2))
+FALLBACK_CANDIDATES = 500
+
+# entities the sanitizer leaves in rendered text, decoded by body_text (&amp; last)
+HTML_ENTITIES = (('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&#x27;', "'"), ('&#39;', "'"), ('&amp;', '&'))
+
+
+def search_config():
+    return getattr(settings, 'BLOG_SEARCH_CONFIG', DEFAULT_SEARCH_CONFIG)
+
+
+def search_cache_timeout():
+    return getattr(settings, 'BLOG_SEARCH_CACHE_TIMEOUT', DEFAULT_SEARCH_CACHE_TIMEOUT)
+
+
+def uses_tsvector(using=None):
+    return connections[using or DEFAULT_DB_ALIAS].vendor == 'postgresql'
+
+
+def normalize_query(query):
+    """Canonical form of a user query: the cache key and what is searched for."""
+    text = unicodedata.normalize('NFKC', query or '').casefold()
+    terms = text.split()[:MAX_QUERY_TERMS]
+    return ' '.join(terms)[:MAX_QUERY_LENGTH].strip()
+
+
+def plain_text(htmlContent):
+    """Visible text of rendered post HTML."""
+    return ' '.join(html.unescape(strip_tags(htmlContent or '')).split())
+
+
+def body_text():
+    """SQL expression for the visible text of `htmlContent` (PostgreSQL).
+
+    Tags are replaced by spaces and the sanitizer's entities decoded, the SQL
+    counterpart of `plain_text`. Both the C-weighted part of the vector and
+    the ts_headline snippets use it.
+    """
+    source = Coalesce('htmlContent', Value(''), output_field=TextField())
+    text = Func(source, Value('<[^>]+>'), Value(' '), Value('g'), function='regexp_replace', output_field=TextField())
+    for entity, char in HTML_ENTITIES:
+        text = Replace(text, Value(entity), Value(char), output_field=TextField())
+    return text
+
+
+def search_vector_expression():
+    from django.contrib.postgres.search import SearchVector
+
+    config = search_config()
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector('tags', 'summary', weight='B', config=config)
+        + SearchVector(body_text(), weight='C', config=config)
+    )
+
+
+def update_search_vector(post, using=None):
+    """Rebuild the stored tsvector of `post` (no-op without PostgreSQL)."""
+    if uses_tsvector(using):
+        update_search_vectors(type(post)._base_manager.using(using).filter(pk=post.pk))
+
+
+def update_search_vectors(queryset):
+    """Rebuild the stored tsvectors of every post in `queryset` with one UPDATE."""
+    return queryset.update(searchVector=search_vector_expression())
+
+
+def tsquery(normalized):
+    from django.contrib.postgres.search import SearchQuery
+    return SearchQuery(normalized, search_type='websearch', config=search_config())
+
+
+def match_posts(queryset, query):
+    """Restrict a BlogPost queryset to posts matching `query` through the GIN index (PostgreSQL only)."""
+    return queryset.filter(searchVector=tsquery(normalize_query(query)))
+
+
+def highlight(text):
+    """Escape `text` and turn the selection markers into <mark> elements."""
+    return escape(text).replace(START_SEL, '<mark>').replace(STOP_SEL, '</mark>')
+
+
+def search_posts(query, limit=10):
+    """Return up to `limit` ranked results for `query`, served from the cache when possible.
+
+    Each result is a dict with slug, title, publishedAt (ISO 8601), rank and
+    an HTML-safe snippet whose matches are wrapped in <mark>.
+    """
+    normalized = normalize_query(query)
+    if not normalized:
+        return []
+    limit = max(1, min(limit, MAX_RESULTS))
+    digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+    key = f'{SEARCH_CACHE_PREFIX}:{list_version()}:{limit}:{digest}'
+    cache = blog_cache()
+    results = cache.get(key)
+    if results is None:
+        search = _search_tsvector if uses_tsvector() else _search_fallback
+        results = search(normalized, limit)
+        cache.set(key, results, search_cache_timeout())
+    return results
+
+
+def _published_posts():
+    from .models import BlogPost
+    return BlogPost.objects.filter(status=BlogPost.STATUS_PUBLISHED, publishedAt__isnull=False)
+
+
+def _result(post, rank, snippet):
+    return {
+        'slug': post.slug,
+        'title': post.title,
+        'publishedAt': post.publishedAt.isoformat(),
+        'rank': round(rank, 6),
+        'snippet': snippet,
+    }
+
+
+def _search_tsvector(normalized, limit):
+    from django.contrib.postgres.search import SearchHeadline, SearchRank
+
+    query = tsquery(normalized)
+    posts = (
+        _published_posts()
+        .filter(searchVector=query)
+        .annotate(
+            rank=SearchRank(F('searchVector'), query),
+            # ts_headline is expensive; Postgres evaluates it only for the LIMITed rows
+            headline=SearchHeadline(
+                body_text(), query, config=search_config(), start_sel=START_SEL, stop_sel=STOP_SEL,
+                max_words=35, min_words=15, max_fragments=2, fragment_delimiter=' … ',
+            ),
+        )
+        .only('slug', 'title', 'publishedAt')
+        .order_by('-rank', '-publishedAt', '-id')[:limit]
+    )
+    return [_result(post, post.rank, highlight(post.headline)) for post in posts]
+
+
+def _search_fallback(normalized, limit):
+    terms = normalized.split()
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(tags__icontains=term) | Q(summary__icontains=term) | Q(htmlContent__icontains=term)
+    candidates = (
+        _published_posts().filter(condition)
+        .only('slug', 'title', 'publishedAt', 'tags', 'summary', 'htmlContent')
+        .order_by('-publishedAt', '-id')[:FALLBACK_CANDIDATES]
+    )
+    scored = []
+    for post in candidates:
+        body = plain_text(post.htmlContent)
+        fields = {'title': post.title, 'tags': post.tags, 'summary': post.summary, 'body': body}
+        folded = {field: text.casefold() for field, text in fields.items()}
+        # htmlContent__icontains also matches markup; only the visible text counts
+        if not all(any(term in text for text in folded.values()) for term in terms):
+            continue
+        rank = sum(weight * folded[field].count(term) for field, weight in FALLBACK_WEIGHTS for term in terms)
+        scored.append((rank, post, body))
+    scored.sort(key=lambda item: item[0], reverse=True)  # stable: ties stay newest first
+    return [_result(post, rank, _fallback_snippet(body or post.summary, terms)) for rank, post, body in scored[:limit]]
+
+
+def _fallback_snippet(text, terms):
+    folded = text.casefold()
+    positions = [p for p in (folded.find(term) for term in terms) if p >= 0]
+    start = max(min(positions, default=0) - SNIPPET_CHARS // 4, 0)
+    window = text[start:start + SNIPPET_CHARS]
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    marked = pattern.sub(lambda m: f'{START_SEL}{m.group(0)}{STOP_SEL}', window)
+    prefix = '… ' if start else ''
+    suffix = ' …' if start + SNIPPET_CHARS < len(text) else ''
+    return prefix + highlight(marked) + suffix
@@ -0,0 +1,166 @@
+"""Bulk creation of product images from a multipart batch or a zip archive.
+
+``collect_uploads`` flattens the request files (archives are expanded in
+memory, entry by entry, with the per-image byte limit and the batch's file
+count and total size enforced while reading, so an oversized archive is
+rejected at the first entry past a limit),
+``validate_uploads`` checks and hashes every image on a thread pool, and
+``create_product_images`` writes the files, inserts all rows with one
+``bulk_create`` and queues variant generation (see ``image_tasks``).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import models, transaction
+from .image_utils import ALLOWED_EXTENSIONS, MAX_FILE_SIZE, _get_extension, hash_file, validate_image_file
+from .image_tasks import queue_variants
+import mimetypes
+import os
+import zipfile
+
+
+BULK_UPLOAD_MAX_FILES = 50
+BULK_UPLOAD_MAX_BYTES = 100 * 1024 * 1024
+
+
+class BulkUploadError(Exception):
+    """Raised when the batch as a whole cannot be accepted."""
+
+
+def _max_files():
+    return getattr(settings, 'BULK_UPLOAD_MAX_FILES', BULK_UPLOAD_MAX_FILES)
+
+
+def _max_bytes():
+    return getattr(settings, 'BULK_UPLOAD_MAX_BYTES', BULK_UPLOAD_MAX_BYTES)
+
+
+class _BatchLimits:
+    """Running file count and (decompressed) byte total of one batch."""
+
+    def __init__(self):
+        self.maxFiles = _max_files()
+        self.maxBytes = _max_bytes()
+        self.files = 0
+        self.bytes = 0
+
+    def add_file(self):
+        self.files += 1
+        if self.files > self.maxFiles:
+            raise BulkUploadError(f'一次最多上傳 {self.maxFiles} 張圖片')
+
+    def add_bytes(self, size):
+        self.bytes += size
+        if self.bytes > self.maxBytes:
+            raise BulkUploadError(f'一次上傳的圖片總大小不可超過 {self.maxBytes // (1024 * 1024)} MB')
+
+    def read_cap(self):
+        # 單張上限與批次剩餘額度取較小者，多讀 1 byte 以判斷是否超過
+        return min(MAX_FILE_SIZE, self.maxBytes - self.bytes) + 1
+
+
+def _is_archive(upload):
+    return _get_extension(upload.name) == 'zip' or upload.content_type in ('application/zip', 'application/x-zip-compressed')
+
+
+def _expand_archive(upload, limits):
+    """Yield SimpleUploadedFile objects for the image entries of a zip upload.
+
+    Each entry is counted against `limits` before and after it is read.
+    """
+    try:
+        archive = zipfile.ZipFile(upload)
+    except zipfile.BadZipFile:
+        raise BulkUploadError(f'無效的壓縮檔: {upload.name}')
+
+    with archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+            if _get_extension(name) not in ALLOWED_EXTENSIONS:
+                continue
+            limits.add_file()
+            with archive.open(info) as fh:
+                # 不信任壓縮檔宣告的大小，最多讀取上限 + 1 byte
+                data = fh.read(limits.read_cap())
+            # 超過單張上限的檔案留給 validate_uploads 回報，只計入上限以內的部分
+            limits.add_bytes(min(len(data), MAX_FILE_SIZE))
+            contentType = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            yield SimpleUploadedFile(name, data, content_type=contentType)
+
+
+def collect_uploads(files):
+    """Return the list of image uploads in `files` (a list of UploadedFile)."""
+    limits = _BatchLimits()
+    uploads = []
+    for upload in files:
+        if _is_archive(upload):
+            uploads.extend(_expand_archive(upload, limits))
+        else:
+            limits.add_file()
+            limits.add_bytes(upload.size)
+            uploads.append(upload)
+    if not uploads:
+        raise BulkUploadError('沒有可上傳的圖片')
+    return uploads
+
+
+def _validate_one(upload):
+    try:
+        validate_image_file(upload)
+    except ValidationError as e:
+        messages = e.message_dict.get('image') if hasattr(e, 'error_dict') else e.messages
+        return messages[0]
+    # 先在背景執行緒算好雜湊，attach_image_blob 不必再讀一次檔案
+    upload.contentHash = hash_file(upload)
+    return None
+
+
+def validate_uploads(uploads, workers=None):
+    """Validate and hash every upload in parallel.
+
+    Returns a list of ``{'file': name, 'error': message}`` for the failures.
+    """
+    workers = workers or getattr(settings, 'IMAGE_PROCESSING_WORKERS', 4)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(uploads)))) as pool:
+        results = list(pool.map(_validate_one, uploads))
+    return [{'file': upload.name, 'error': error} for upload, error in zip(uploads, results) if error]
+
+
+def create_product_images(product, uploads, primaryIndex=None, altText=''):
+    """Create ProductImage rows for already validated `uploads`.
+
+    displayOrder continues after the product's current images. The image at
+    `primaryIndex` becomes the primary image; without it the first upload is
+    primary only when the product has none yet.
+    """
+    from .models import Product, ProductImage, attach_image_blob
+
+    with transaction.atomic():
+        # 鎖定商品列，避免兩個批次同時取得相同的 displayOrder 起點
+        list(Product.objects.select_for_update().filter(pk=product.pk).values_list('pk', flat=True))
+        existing = ProductImage.objects.filter(product=product)
+        stats = existing.aggregate(lastOrder=models.Max('displayOrder'), primaries=models.Count('pk', filter=models.Q(isPrimary=True)))
+        nextOrder = (stats['lastOrder'] + 1) if stats['lastOrder'] is not None else 0
+        if primaryIndex is None and not stats['primaries']:
+            primaryIndex = 0
+        if primaryIndex is not None and stats['primaries']:
+            existing.filter(isPrimary=True).update(isPrimary=False)
+
+        images = []
+        for i, upload in enumerate(uploads):
+            img = ProductImage(
+                product=product,
+                image=upload,
+                isPrimary=(i == primaryIndex),
+                displayOrder=nextOrder + i,
+                altText=altText,
+            )
+            attach_image_blob(img)
+            images.append(img)
+
+        images = ProductImage.objects.bulk_create(images)
+        queue_variants(images)
+    return images
@@ -0,0 +1,98 @@
+"""Background generation of image variants.
+
+Paths that create many images at once (bulk upload) skip the synchronous
+variant rendering of ``ProductImage.save`` and call ``queue_variants`` instead.
+The work is handed to a small thread pool once the transaction commits, so
+the rows are visible to the worker's own database connection. Images that
+share a file (same ``ImageBlob``) are processed in one task, so the variants
+are rendered once and reused by the others.
+
+With ``IMAGE_PROCESSING_ASYNC = False`` the variants are generated inline in
+the commit hook instead.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import close_old_connections, transaction
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executorLock = threading.Lock()
+_pending = set()
+_pendingLock = threading.Lock()
+
+
+def generate_product_image_variants(pks):
+    """Render the eager variants of the given ProductImage rows, in order."""
+    from .models import GENERATED_IMAGE_FIELDS, ProductImage, render_image_variants, store_image_variants
+
+    for img in ProductImage.objects.filter(pk__in=pks).select_related('product').order_by('pk'):
+        if not img.image:
+            continue
+        try:
+            # 解碼與編碼在交易外進行，交易只包含資料列的寫入
+            variants = render_image_variants(img, 'productImage')
+            with transaction.atomic():
+                store_image_variants(img, 'productImage', variants)
+                ProductImage.objects.filter(pk=img.pk).update(**{f: getattr(img, f) for f in GENERATED_IMAGE_FIELDS})
+        except Exception:
+            logger.warning('Failed to generate variants for product image %s', img.pk, exc_info=True)
+
+
+def _run(pks):
+    try:
+        generate_product_image_variants(pks)
+    finally:
+        # 執行緒有自己的資料庫連線，用完即關閉
+        close_old_connections()
+
+
+def queue_variants(images, using=None):
+    """Generate variants for `images` after the current transaction commits."""
+    groups = defaultdict(list)
+    for img in images:
+        groups[img.image.name].append(img.pk)
+
+    def dispatch():
+        for pks in groups.values():
+            if getattr(settings, 'IMAGE_PROCESSING_ASYNC', True):
+                _submit(pks)
+            else:
+                generate_product_image_variants(pks)
+
+    transaction.on_commit(dispatch, using=using, robust=True)
+
+
+def _get_executor():
+    global _executor
+    with _executorLock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 4),
+                thread_name_prefix='image-variants',
+            )
+        return _executor
+
+
+def _submit(pks):
+    future = _get_executor().submit(_run, pks)
+    with _pendingLock:
+        _pending.add(future)
+    future.add_done_callback(_forget)
+
+
+def _forget(future):
+    with _pendingLock:
+        _pending.discard(future)
+
+
+def wait_for_pending(timeout=None):
+    """Block until queued variant generation finishes (tests, management commands)."""
+    with _pendingLock:
+        futures = list(_pending)
+    if futures:
+        wait(futures, timeout=timeout)
@@ -1,25 +1,284 @@
-from PIL import Image
+from PIL import Image, ImageOps, features
+from contextlib import contextmanager
 from io import BytesIO
+from dataclasses import dataclass
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.exceptions import ValidationError
+import base64
+import hashlib
 import os
+import struct
+import threading
 
 
 ALLOWED_EXTENSIONS = ('jpg', 'jpeg', 'png', 'webp')
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 MAX_DIMENSIONS = (4000, 4000)
+# Pillow raises DecompressionBombError above twice this many pixels
+MAX_IMAGE_PIXELS = MAX_DIMENSIONS[0] * MAX_DIMENSIONS[1]
+
+# How much of an upload is buffered while looking for the image header.
+# JPEG SOF markers can sit behind a large EXIF block, hence the 64KB cap.
+HEADER_SNIFF_BYTES = 64 * 1024
+# Bytes needed to tell JPEG, PNG and WebP apart
+MAGIC_BYTES_LENGTH = 12
+
+# Low-quality inline placeholder (LQIP) painted while the real image loads
+PLACEHOLDER_SIZE = 20
+PLACEHOLDER_QUALITY = 40
+# Sample size and palette size used to pick the dominant color
+DOMINANT_COLOR_SAMPLE = 64
+DOMINANT_COLOR_PALETTE = 5
+
+# Per-process limits for pixel decodes (see DecodeLimiter). Overridable with
+# settings.IMAGE_MEMORY_BUDGET (bytes) and settings.IMAGE_DECODE_CONCURRENCY.
+DEFAULT_IMAGE_MEMORY_BUDGET = 256 * 1024 * 1024
+DEFAULT_IMAGE_DECODE_CONCURRENCY = 2
+# Pillow stores multi-band pixels in 32 bits; while an image is reduced to its
+# working size the decoded frame and one resampling buffer are alive together.
+DECODE_BYTES_PER_PIXEL = 4
+DECODE_BUFFERS = 2
+
+# BLAKE2b digest size (bytes) used for content-addressed uploads
+CONTENT_HASH_DIGEST_SIZE = 32
+
+CROP_MODES = ('square', 'fit', 'cover')
+
+FORMAT_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+    'AVIF': 'image/avif',
+}
+
+FORMAT_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+    'AVIF': 'avif',
+}
+
+
+@dataclass(frozen=True)
+class VariantSpec:
+    """A named output size/format combination from the variant registry."""
+    name: str
+    size: int
+    crop: str
+    formats: tuple
+    quality: int = 85
+    eager: bool = True
+
+    @property
+    def fallback_format(self):
+        return self.formats[-1]
+
+
+def format_supported(fmt):
+    """Return True when the installed Pillow can encode `fmt`."""
+    fmt = (fmt or '').upper()
+    if fmt not in FORMAT_MIME_TYPES:
+        return False
+    if fmt in ('WEBP', 'AVIF'):
+        return features.check(fmt.lower())
+    return True
+
+
+def get_variant_specs():
+    """Build the variant registry from settings.IMAGE_VARIANTS.
+
+    Returns an ordered dict of name -> VariantSpec. Formats the local Pillow
+    build cannot encode are dropped, so AVIF silently degrades to the next
+    format in the list. Variants with `'eager': False` are not rendered at
+    upload time; they are produced on first request by `thumb_cache`.
+    """
+    configured = getattr(settings, 'IMAGE_VARIANTS', {})
+    specs = {}
+    for name, opts in configured.items():
+        crop = opts.get('crop', 'fit')
+        if crop not in CROP_MODES:
+            raise ValueError(f'Unknown crop mode for image variant {name!r}: {crop!r}')
+        formats = tuple(f.upper() for f in opts.get('formats', ['JPEG']) if format_supported(f))
+        if not formats:
+            formats = ('JPEG',)
+        specs[name] = VariantSpec(
+            name=name,
+            size=int(opts['size']),
+            crop=crop,
+            formats=formats,
+            quality=int(opts.get('quality', 85)),
+            eager=bool(opts.get('eager', True)),
+        )
+    return specs
+
+
+def configure_pillow_limits():
+    """Apply the decompression-bomb limit (settings.IMAGE_MAX_PIXELS) to Pillow."""
+    Image.MAX_IMAGE_PIXELS = int(getattr(settings, 'IMAGE_MAX_PIXELS', MAX_IMAGE_PIXELS))
+
+
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(data):
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            raise ValueError('corrupt JPEG marker')
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # fill byte
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # EOI / start of scan before any frame header
+            raise ValueError('JPEG has no frame header')
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def _webp_size(data):
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        if data[23:26] != b'\x9d\x01\x2a':
+            raise ValueError('corrupt VP8 frame')
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        if data[20] != 0x2F:
+            raise ValueError('corrupt VP8L frame')
+        b0, b1, b2, b3 = data[21:25]
+        width = 1 + (b0 | (b1 & 0x3F) << 8)
+        height = 1 + (b1 >> 6 | b2 << 2 | (b3 & 0x0F) << 10)
+        return width, height
+    if chunk == b'VP8X':
+        width = 1 + int.from_bytes(data[24:27], 'little')
+        height = 1 + int.from_bytes(data[27:30], 'little')
+        return width, height
+    raise ValueError('unknown WebP chunk')
+
+
+def sniff_image_header(data):
+    """Identify an image from its leading bytes without decoding it.
+
+    Returns ``(format, (width, height))``. The size is None while `data` is
+    too short to reach the header; the format is None when the magic bytes
+    match none of the accepted formats (only final once `data` holds at least
+    MAGIC_BYTES_LENGTH bytes). Raises ValueError for a recognised format
+    whose header is corrupt.
+    """
+    if data[:3] == b'\xff\xd8\xff':
+        return 'JPEG', _jpeg_size(data)
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        if len(data) < 24:
+            return 'PNG', None
+        if data[12:16] != b'IHDR':
+            raise ValueError('PNG does not start with IHDR')
+        return 'PNG', struct.unpack('>II', data[16:24])
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'WEBP', _webp_size(data)
+    return None, None
+
+
+def check_image_size(width, height, *, max_dims=MAX_DIMENSIONS):
+    """Raise ValidationError when the pixel size exceeds the configured limits."""
+    if width > max_dims[0] or height > max_dims[1]:
+        raise ValidationError({'image': f'圖片尺寸不可超過 {max_dims[0]}x{max_dims[1]} 像素'})
+    if Image.MAX_IMAGE_PIXELS and width * height > Image.MAX_IMAGE_PIXELS:
+        raise ValidationError({'image': f'圖片像素數不可超過 {Image.MAX_IMAGE_PIXELS}'})
+
+
+def upload_rejection(file_obj):
+    """Return the reason an upload handler rejected this file, if any."""
+    reason = getattr(file_obj, 'rejectionReason', None)
+    if reason is None:
+        # FieldFile wrapping a freshly assigned upload
+        reason = getattr(getattr(file_obj, '_file', None), 'rejectionReason', None)
+    return reason
+
+
+def read_image_metadata(file_obj):
+    """Return width, height, format and byte size of `file_obj`.
+
+    Only the image header is parsed; the pixel data is not decoded. Returns
+    None when the file is not a readable image.
+    """
+    try:
+        file_obj.seek(0)
+    except Exception:
+        pass
+    try:
+        with Image.open(file_obj) as img:
+            width, height = img.size
+            fmt = img.format or ''
+    except Exception:
+        return None
+    finally:
+        try:
+            file_obj.seek(0)
+        except Exception:
+            pass
+    return {'width': width, 'height': height, 'format': fmt, 'bytes': getattr(file_obj, 'size', None)}
 
 
 def _get_extension(name):
     return os.path.splitext(name)[1].lstrip('.').lower() if name else ''
 
 
+def new_content_hasher():
+    return hashlib.blake2b(digest_size=CONTENT_HASH_DIGEST_SIZE)
+
+
+def hash_file(file_obj):
+    """Return the hex BLAKE2b digest of `file_obj`, reading it in chunks.
+
+    Uploads that went through `upload_handlers` already carry the digest
+    computed while the request body streamed in; it is reused as-is.
+    """
+    precomputed = getattr(file_obj, 'contentHash', None)
+    if precomputed:
+        return precomputed
+
+    hasher = new_content_hasher()
+    try:
+        file_obj.seek(0)
+    except Exception:
+        pass
+    if hasattr(file_obj, 'chunks'):
+        for chunk in file_obj.chunks():
+            hasher.update(chunk)
+    else:
+        for chunk in iter(lambda: file_obj.read(64 * 1024), b''):
+            hasher.update(chunk)
+    try:
+        file_obj.seek(0)
+    except Exception:
+        pass
+    return hasher.hexdigest()
+
+
 def validate_image_file(file_obj, *, allowed_exts=ALLOWED_EXTENSIONS, max_bytes=MAX_FILE_SIZE, max_dims=MAX_DIMENSIONS):
     """Validate uploaded image file: extension, size, and dimensions.
 
     Raises `ValidationError` on failure.
     """
     # file_obj may be a Django FieldFile or UploadedFile
+    reason = upload_rejection(file_obj)
+    if reason:
+        raise ValidationError({'image': reason})
+
     name = getattr(file_obj, 'name', None)
     ext = _get_extension(name)
     if ext not in allowed_exts:
@@ -44,62 +303,223 @@ def validate_image_file(file_obj, *, allowed_exts=ALLOWED_EXTENSIONS, max_bytes=
             pass
         with Image.open(file_obj) as img:
             width, height = img.size
-            if width > max_dims[0] or height > max_dims[1]:
-                raise ValidationError({'image': f'圖片尺寸不可超過 {max_dims[0]}x{max_dims[1]} 像素'})
+            check_image_size(width, height, max_dims=max_dims)
     except ValidationError:
         raise
+    except Image.DecompressionBombError:
+        raise ValidationError({'image': f'圖片像素數不可超過 {Image.MAX_IMAGE_PIXELS}'})
     except Exception as e:
         raise ValidationError({'image': f'無效的圖片檔案: {str(e)}'})
 
 
-def make_square_thumbnail(file_obj, size=150, quality=85):
-    """Return (filename, ContentFile) for a square thumbnail of given size."""
-    try:
-        file_obj.seek(0)
-    except Exception:
-        pass
+class DecodeLimiter:
+    """Admission control for pixel decodes within one process.
 
-    with Image.open(file_obj) as img:
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-
-        thumb = img.copy()
-        thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+    At most `concurrency` decodes run at a time and the estimated pixel memory
+    of the running ones stays within `budget` bytes; callers block until both
+    allow them in. A single decode larger than the whole budget is admitted
+    alone instead of waiting forever.
+    """
+
+    def __init__(self, budget, concurrency):
+        self.budget = max(int(budget), 1)
+        self.concurrency = max(int(concurrency), 1)
+        self.active = 0
+        self.reserved = 0
+        self.peakReserved = 0
+        self._cond = threading.Condition()
+
+    def _admissible(self, nbytes):
+        if self.active >= self.concurrency:
+            return False
+        return self.active == 0 or self.reserved + nbytes <= self.budget
+
+    @contextmanager
+    def reserve(self, nbytes):
+        with self._cond:
+            self._cond.wait_for(lambda: self._admissible(nbytes))
+            self.active += 1
+            self.reserved += nbytes
+            self.peakReserved = max(self.peakReserved, self.reserved)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self.reserved -= nbytes
+                self._cond.notify_all()
+
+
+_limiter = None
+_limiterLock = threading.Lock()
+
+
+def get_decode_limiter():
+    """Return the process-wide DecodeLimiter for the current settings."""
+    global _limiter
+    budget = getattr(settings, 'IMAGE_MEMORY_BUDGET', DEFAULT_IMAGE_MEMORY_BUDGET)
+    concurrency = getattr(settings, 'IMAGE_DECODE_CONCURRENCY', DEFAULT_IMAGE_DECODE_CONCURRENCY)
+    with _limiterLock:
+        if _limiter is None or (_limiter.budget, _limiter.concurrency) != (max(int(budget), 1), max(int(concurrency), 1)):
+            _limiter = DecodeLimiter(budget, concurrency)
+        return _limiter
+
+
+def estimate_decode_bytes(size):
+    """Estimated peak pixel memory for decoding an image of `size` and reducing it."""
+    return size[0] * size[1] * DECODE_BYTES_PER_PIXEL * DECODE_BUFFERS
+
+
+def _working_size(size, specs, placeholder):
+    """Smallest size, same aspect ratio, that every requested output can be cut from."""
+    width, height = size
+    scale = 0.0
+    for spec in specs:
+        side = min(width, height) if spec.crop == 'cover' else max(width, height)
+        scale = max(scale, spec.size / side)
+    if placeholder:
+        scale = max(scale, DOMINANT_COLOR_SAMPLE / max(width, height))
+    scale = min(scale, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _flatten_to_rgb(img):
+    """Composite transparent images onto white and return an RGB image."""
+    if img.mode == 'P':
+        img = img.convert('RGBA')
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _resize(img, size, crop):
+    """Return a new image resized according to the crop mode."""
+    if crop == 'cover':
+        return ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+
+    thumb = ImageOps.contain(img, (size, size), Image.Resampling.LANCZOS) if max(img.size) > size else img
+    if crop == 'square':
         thumb_square = Image.new('RGB', (size, size), (255, 255, 255))
         offset = ((size - thumb.width) // 2, (size - thumb.height) // 2)
         thumb_square.paste(thumb, offset)
+        return thumb_square
+    return thumb
 
-        bio = BytesIO()
-        thumb_square.save(bio, format='JPEG', quality=quality)
-        bio.seek(0)
-        filename = f"thumb_{size}x{size}.jpg"
-        return filename, ContentFile(bio.read())
 
+def _encode(img, fmt, quality):
+    bio = BytesIO()
+    img.save(bio, format=fmt, quality=quality)
+    return ContentFile(bio.getvalue())
 
-def make_preview_thumbnail(file_obj, max_size=800, quality=85):
-    """Return (filename, ContentFile) for a preview thumbnail keeping aspect ratio."""
+
+def _contain_size(size, box):
+    scale = min(box / size[0], box / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def _placeholder(base):
+    """Return (data URI of a ~20px preview, dominant color '#rrggbb') for an RGB image."""
+    sample = base.resize(_contain_size(base.size, DOMINANT_COLOR_SAMPLE), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+    tiny = sample.resize(_contain_size(sample.size, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+    fmt = 'WEBP' if format_supported('WEBP') else 'JPEG'
+    bio = BytesIO()
+    tiny.save(bio, format=fmt, quality=PLACEHOLDER_QUALITY)
+    dataUri = f'data:{FORMAT_MIME_TYPES[fmt]};base64,{base64.b64encode(bio.getvalue()).decode("ascii")}'
+
+    quantized = sample.quantize(colors=DOMINANT_COLOR_PALETTE, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return dataUri, f'#{r:02x}{g:02x}{b:02x}'
+
+
+def _render(file_obj, specs, placeholder):
     try:
         file_obj.seek(0)
     except Exception:
         pass
 
+    rendered = []
     with Image.open(file_obj) as img:
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-
-        thumb = img.copy()
-        thumb.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-
-        bio = BytesIO()
-        thumb.save(bio, format='JPEG', quality=quality)
-        bio.seek(0)
-        filename = f"preview_{max_size}x{max_size}.jpg"
-        return filename, ContentFile(bio.read())
+        working = _working_size(img.size, specs, placeholder)
+        # let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of full size
+        img.draft(None, (working[0] * 2, working[1] * 2))
+        with get_decode_limiter().reserve(estimate_decode_bytes(img.size)):
+            # palette images resample with NEAREST; expand them first
+            frame = img.convert('RGBA') if img.mode == 'P' else img
+            # shrink in place to the working size so the full-size buffer is
+            # released right away; flattening, cropping and encoding then
+            # only ever touch the small image
+            frame.thumbnail(working, Image.Resampling.LANCZOS)
+            base = _flatten_to_rgb(frame)
+        for spec in specs:
+            resized = _resize(base, spec.size, spec.crop)
+            for fmt in spec.formats:
+                rendered.append((spec, fmt, _encode(resized, fmt, spec.quality), resized.width, resized.height))
+        extra = _placeholder(base) if placeholder else None
+    return rendered, extra
+
+
+def render_variants(file_obj, specs):
+    """Render every (spec, format) pair from a single decode of `file_obj`.
+
+    Returns a list of (spec, fmt, ContentFile, width, height).
+    """
+    return _render(file_obj, specs, placeholder=False)[0]
+
+
+def render_variants_and_placeholder(file_obj, specs):
+    """Like `render_variants`, plus the LQIP placeholder from the same decode.
+
+    Returns (rendered, (data_uri, dominant_color)).
+    """
+    return _render(file_obj, specs, placeholder=True)
+
+
+def compute_placeholder(file_obj):
+    """Decode `file_obj` and return (data_uri, dominant_color)."""
+    return _render(file_obj, [], placeholder=True)[1]
+
+
+def negotiate_format(accept_header, formats):
+    """Pick the first format in `formats` the client explicitly accepts.
+
+    Modern formats must be named in Accept (a bare */* does not count, since
+    older browsers send it too); otherwise the last format is returned.
+    """
+    accepted = set()
+    for part in (accept_header or '').split(','):
+        fields = [f.strip() for f in part.split(';')]
+        mime = fields[0].lower()
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if mime and q > 0:
+            accepted.add(mime)
+
+    for fmt in formats[:-1]:
+        if FORMAT_MIME_TYPES.get(fmt) in accepted:
+            return fmt
+    return formats[-1]
+
+
+def make_square_thumbnail(file_obj, size=150, quality=85):
+    """Return (filename, ContentFile) for a square thumbnail of given size."""
+    spec = VariantSpec(name=f'square{size}', size=size, crop='square', formats=('JPEG',), quality=quality)
+    _, _, content, _, _ = render_variants(file_obj, [spec])[0]
+    return f"thumb_{size}x{size}.jpg", content
+
+
+def make_preview_thumbnail(file_obj, max_size=800, quality=85):
+    """Return (filename, ContentFile) for a preview thumbnail keeping aspect ratio."""
+    spec = VariantSpec(name=f'preview{max_size}', size=max_size, crop='fit', formats=('JPEG',), quality=quality)
+    _, _, content, _, _ = render_variants(file_obj, [spec])[0]
+    return f"preview_{max_size}x{max_size}.jpg", content
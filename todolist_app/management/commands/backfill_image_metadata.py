@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from todolist_app.image_utils import compute_placeholder, hash_file
+from todolist_app.models import Category, ImageVariant, ProductImage
+
+
+METADATA_FIELDS = ['imageWidth', 'imageHeight', 'imageBytes', 'imageFormat', 'contentHash', 'placeholder', 'dominantColor']
+VARIANT_FIELDS = ['fileSize', 'contentHash']
+
+
+class Command(BaseCommand):
+    help = '補齊既有商品圖片、分類圖片與縮圖變體的中繼資料（尺寸、大小、格式、內容雜湊、預覽佔位圖與主色）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批 bulk_update 的筆數（預設 200）')
+        parser.add_argument('--force', action='store_true', help='重新計算所有資料列，而非只處理缺少中繼資料的列')
+
+    def handle(self, *args, **options):
+        batchSize = max(options['batch_size'], 1)
+        force = options['force']
+
+        for model in (ProductImage, Category):
+            qs = model.objects.exclude(image='')
+            if not force:
+                qs = qs.filter(Q(imageWidth__isnull=True) | Q(contentHash='') | Q(placeholder=''))
+            updated, missing = self._backfill(qs.only('pk', 'image', *METADATA_FIELDS), METADATA_FIELDS, self._fill_owner, batchSize)
+            self.stdout.write(f'{model.__name__}: updated {updated}, unreadable {missing}')
+
+        qs = ImageVariant.objects.all()
+        if not force:
+            qs = qs.filter(Q(fileSize=0) | Q(contentHash=''))
+        updated, missing = self._backfill(qs.only('pk', 'file', *VARIANT_FIELDS), VARIANT_FIELDS, self._fill_variant, batchSize)
+        self.stdout.write(f'ImageVariant: updated {updated}, unreadable {missing}')
+
+    def _backfill(self, qs, fields, fill, batchSize):
+        updated = missing = 0
+        batch = []
+        for obj in qs.iterator(chunk_size=batchSize):
+            if not fill(obj):
+                missing += 1
+                continue
+            batch.append(obj)
+            if len(batch) >= batchSize:
+                type(obj).objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+        if batch:
+            type(batch[0]).objects.bulk_update(batch, fields)
+            updated += len(batch)
+        return updated, missing
+
+    def _fill_owner(self, obj):
+        try:
+            with obj.image.open('rb') as fh:
+                ok = obj.set_image_metadata(fh, hash_file(fh))
+                if ok:
+                    obj.placeholder, obj.dominantColor = compute_placeholder(fh)
+        except OSError as e:
+            self.stderr.write(f'Cannot read {obj.image.name}: {e}')
+            return False
+        return ok
+
+    def _fill_variant(self, variant):
+        try:
+            with variant.file.open('rb') as fh:
+                variant.fileSize = fh.size
+                variant.contentHash = hash_file(fh)
+        except OSError as e:
+            self.stderr.write(f'Cannot read {variant.file.name}: {e}')
+            return False
+        return True
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from todolist_app.image_utils import get_variant_specs
+from todolist_app.media_cleanup import schedule_delete
+from todolist_app.models import GENERATED_IMAGE_FIELDS, Category, ProductImage, render_image_variants, store_image_variants
+
+
+OWNERS = ((ProductImage, 'productImage'), (Category, 'category'))
+
+
+class Command(BaseCommand):
+    help = '為缺少 eager 縮圖變體列的既有商品圖片與分類圖片產生變體（沒有變體列的舊圖片在 /media/variant/ 會回傳 404）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='重新產生所有圖片的變體，而非只處理缺少變體的圖片')
+
+    def handle(self, *args, **options):
+        names = [name for name, spec in get_variant_specs().items() if spec.eager]
+        for model, ownerField in OWNERS:
+            qs = model.objects.exclude(image='')
+            if not options['force']:
+                qs = qs.annotate(
+                    storedVariants=Count('variants__variantName', filter=Q(variants__variantName__in=names), distinct=True),
+                ).filter(storedVariants__lt=len(names))
+            updated = failed = 0
+            # 先取出 pk 再逐筆處理，寫入的列不影響尚未讀取的查詢結果
+            for pk in list(qs.order_by('pk').values_list('pk', flat=True)):
+                if self._backfill(model, ownerField, pk):
+                    updated += 1
+                else:
+                    failed += 1
+            self.stdout.write(f'{model.__name__}: generated {updated}, failed {failed}')
+
+    def _backfill(self, model, ownerField, pk):
+        qs = model.objects.select_related('product') if model is ProductImage else model.objects
+        owner = qs.get(pk=pk)
+        oldThumbs = [f.name for f in (owner.thumbnail150, owner.thumbnail800) if f and f.name]
+        try:
+            # 解碼與編碼在交易外進行，交易只包含資料列的寫入
+            variants = render_image_variants(owner, ownerField)
+        except OSError as e:
+            self.stderr.write(f'Cannot render {owner.image.name}: {e}')
+            return False
+
+        with transaction.atomic():
+            store_image_variants(owner, ownerField, variants)
+            model.objects.filter(pk=pk).update(**{f: getattr(owner, f) for f in GENERATED_IMAGE_FIELDS})
+            # 舊版縮圖欄位改指向變體檔案後，原本的縮圖檔於提交後清理（仍被引用的檔案會略過）
+            storage = model._meta.get_field('thumbnail150').storage
+            stale = [name for name in oldThumbs if name not in {owner.thumbnail150.name, owner.thumbnail800.name}]
+            if stale:
+                schedule_delete(storage, stale)
+        return True
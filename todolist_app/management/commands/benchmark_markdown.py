@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from todolist_app.models import BlogPost
+from todolist_app.utils import markdown_renderer
+from todolist_app.utils.markdown_renderer import ALLOWED_ATTRIBUTES, ALLOWED_TAGS, EXTENSIONS, MarkdownEngine
+import glob
+import os
+import statistics
+import time
+
+
+def render_per_call(markdownText):
+    """舊做法：每次呼叫都建立新的 Markdown 管線與 Cleaner，並為 linkify 再解析一次 HTML"""
+    bleach = markdown_renderer.bleach
+    unsafeHtml = markdown_renderer.markdown.markdown(markdownText or '', extensions=list(EXTENSIONS), output_format='html5')
+    cleaned = bleach.clean(unsafeHtml, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+    return bleach.linkify(cleaned)
+
+
+class Command(BaseCommand):
+    help = '以實際文章為語料比較 Markdown 渲染：每次新建管線 vs. 重複使用的 MarkdownEngine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['posts', 'docs'], default='posts',
+                            help='語料來源：posts（資料庫中的文章，沒有文章時改用 docs）或 docs（專案內的 .md 文件）')
+        parser.add_argument('--limit', type=int, default=200, help='最多使用幾篇文章（預設 200）')
+        parser.add_argument('--repeat', type=int, default=5, help='每種做法重複整份語料幾輪，取中位數（預設 5）')
+
+    def handle(self, *args, **options):
+        corpus = self._corpus(options['source'], max(options['limit'], 1))
+        if not corpus:
+            raise CommandError('找不到可用的 Markdown 語料')
+        repeat = max(options['repeat'], 1)
+        totalChars = sum(len(text) for text in corpus)
+        self.stdout.write(f'Corpus: {len(corpus)} documents, {totalChars} characters; {repeat} rounds each')
+
+        engine = MarkdownEngine()
+        engine.render('')  # 預先建立管線，與長駐的 worker 行程狀態一致
+
+        baseline = self._measure(render_per_call, corpus, repeat)
+        reused = self._measure(engine.render, corpus, repeat)
+        for label, seconds in (('per-call pipeline', baseline), ('reused engine', reused)):
+            self.stdout.write(f'{label:>18}: {seconds * 1000:9.1f} ms/round, {seconds / len(corpus) * 1e6:9.1f} us/doc')
+        self.stdout.write(f'Speedup: {baseline / reused:.2f}x')
+
+    def _corpus(self, source, limit):
+        if source == 'posts':
+            texts = list(BlogPost.objects.order_by('-pk').values_list('markdownContent', flat=True)[:limit])
+            if texts:
+                return texts
+            self.stdout.write('No posts in the database; using project docs instead')
+        pattern = os.path.join(str(settings.BASE_DIR), '**', '*.md')
+        texts = []
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            if f'{os.sep}.' in path or 'node_modules' in path:
+                continue
+            with open(path, encoding='utf-8') as fh:
+                texts.append(fh.read())
+            if len(texts) >= limit:
+                break
+        return texts
+
+    def _measure(self, render, corpus, repeat):
+        rounds = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for text in corpus:
+                render(text)
+            rounds.append(time.perf_counter() - started)
+        return statistics.median(rounds)
@@ -0,0 +1,111 @@
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from todolist_app.blog_cache import invalidate_posts
+from todolist_app.blog_search import update_search_vectors, uses_tsvector
+from todolist_app.models import BlogPost
+from todolist_app.utils.markdown_renderer import (
+    RENDER_CACHE_TIMEOUT, RENDERER_VERSION, markdown_content_hash, render_cache, render_cache_key, render_many,
+)
+import multiprocessing
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = '以目前的渲染器重新產生文章的 htmlContent、目錄與閱讀統計（只處理 rendererVersion 不同的文章，多行程渲染並批次寫回）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批讀取、渲染與 bulk_update 的筆數（預設 200）')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='渲染用的子行程數（預設為 CPU 數；1 表示在目前行程中渲染）')
+        parser.add_argument('--force', action='store_true', help='重新渲染所有文章，而非只處理渲染器版本不同的文章')
+
+    def handle(self, *args, **options):
+        batchSize = max(options['batch_size'], 1)
+        workers = max(options['workers'], 1)
+        qs = BlogPost.objects.all()
+        if not options['force']:
+            qs = qs.exclude(rendererVersion=RENDERER_VERSION)
+        # 只讀取渲染需要的欄位；寫回以 update() 進行，不經過 save()，不會觸發 slug 分配與 signal。
+        # 依 pk 順序串流，寫回的都是已讀過的列，不影響之後讀取的內容
+        posts = qs.only('pk', 'slug', 'markdownContent', 'contentHash').order_by('pk').iterator(chunk_size=batchSize)
+
+        self.updated = self.cached = self.skipped = 0
+        self.searchVectors = uses_tsvector()
+        started = time.perf_counter()
+        if workers == 1:
+            for batch in self._batches(posts, batchSize):
+                self._write(batch, render_many(self._pending(batch)))
+        else:
+            self._render_in_pool(posts, batchSize, workers)
+
+        self.stdout.write(
+            f'Re-rendered {self.updated} posts ({self.cached} from the render cache) '
+            f'with renderer {RENDERER_VERSION} in {time.perf_counter() - started:.1f}s; '
+            f'skipped {self.skipped} edited while rendering'
+        )
+
+    def _render_in_pool(self, posts, batchSize, workers):
+        # 最多同時有 workers * 2 批在子行程中，讀取資料庫與渲染重疊進行，記憶體用量也有上限
+        # spawn：Django 行程可能已有背景執行緒，fork 有死結風險；render_many 所在模組不需 django.setup()
+        inFlight = {}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for batch in self._batches(posts, batchSize):
+                inFlight[executor.submit(render_many, self._pending(batch))] = batch
+                if len(inFlight) >= workers * 2:
+                    self._collect(inFlight, FIRST_COMPLETED)
+            self._collect(inFlight, ALL_COMPLETED)
+
+    def _collect(self, inFlight, returnWhen):
+        done, _ = wait(inFlight, return_when=returnWhen)
+        for future in done:
+            self._write(inFlight.pop(future), future.result())
+
+    def _batches(self, posts, batchSize):
+        """
+        把文章分批並預先計算雜湊；渲染快取中已有的內容直接取用，不送進子行程。
+        回傳 [(post, contentHash, 渲染結果或 None), ...]。
+        """
+        batch = []
+        for post in posts:
+            batch.append(post)
+            if len(batch) >= batchSize:
+                yield self._prepare(batch)
+                batch = []
+        if batch:
+            yield self._prepare(batch)
+
+    def _prepare(self, posts):
+        hashes = [markdown_content_hash(post.markdownContent) for post in posts]
+        keys = [render_cache_key(h) for h in hashes]
+        hits = render_cache().get_many(keys)
+        batch = [(post, h, hits.get(key)) for post, h, key in zip(posts, hashes, keys)]
+        self.cached += sum(document is not None for _, _, document in batch)
+        return batch
+
+    def _pending(self, batch):
+        # 同一批中相同內容只渲染一次
+        return list({h: post.markdownContent for post, h, document in batch if document is None}.items())
+
+    def _write(self, batch, rendered):
+        rendered = dict(rendered)
+        render_cache().set_many(
+            {render_cache_key(h): document for h, document in rendered.items()},
+            RENDER_CACHE_TIMEOUT,
+        )
+        posts = []
+        with transaction.atomic():
+            for post, contentHash, document in batch:
+                # 讀取後文章可能已被編輯並重新渲染：只在 contentHash 仍是讀取時的值才寫回，否則略過
+                readHash = post.contentHash
+                post.apply_rendered(document if document is not None else rendered[contentHash], contentHash)
+                fields = {field: getattr(post, field) for field in BlogPost.RENDERED_FIELDS}
+                if BlogPost.objects.filter(pk=post.pk, contentHash=readHash).update(**fields):
+                    posts.append(post)
+            if posts and self.searchVectors:
+                # 向量由資料庫中的 htmlContent 計算，須在寫入新內容之後
+                update_search_vectors(BlogPost.objects.filter(pk__in=[post.pk for post in posts]))
+        invalidate_posts(post.slug for post in posts)
+        self.updated += len(posts)
+        self.skipped += len(batch) - len(posts)
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from todolist_app.media_cleanup import reference_fields, remove_files
+from todolist_app.media_storage import file_stat, walk_files
+import datetime
+import json
+import os
+import time
+
+
+def collect_referenced_names():
+    """以 values_list iterator 收集所有 ImageField（與 ImageBlob）引用的檔名，不載入完整 model"""
+    referenced = set()
+    for model, fieldName in reference_fields():
+        qs = model._default_manager.exclude(**{fieldName: ''}).values_list(fieldName, flat=True)
+        referenced.update(name for name in qs.iterator(chunk_size=2000) if name)
+    return referenced
+
+
+def scan_shard(storage, shard, referenced, cutoff):
+    """以 Storage.listdir 走訪單一最上層目錄，回傳 [(name, size, mtime)] 未被引用且超過寬限期的檔案"""
+    orphans = []
+    for name in walk_files(storage, shard):
+        if name in referenced:
+            continue
+        orphan = _stat_orphan(storage, name, cutoff)
+        if orphan:
+            orphans.append(orphan)
+    return orphans
+
+
+def _stat_orphan(storage, name, cutoff):
+    # 只對未被引用的檔案查詢大小與修改時間（物件儲存每次查詢都是一個請求）
+    try:
+        size, modified = file_stat(storage, name)
+    except FileNotFoundError:
+        return None
+    mtime = modified.timestamp()
+    if mtime > cutoff:
+        # 可能是上傳中、尚未寫入資料庫的檔案
+        return None
+    return name, size, mtime
+
+
+class Command(BaseCommand):
+    help = '掃描媒體儲存空間（MEDIA_ROOT 或 S3 bucket），刪除沒有被任何商品、分類或圖片變體引用的檔案與空目錄'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只列出孤立檔案，不實際刪除')
+        parser.add_argument('--grace-seconds', type=int, default=3600,
+                            help='略過最近 N 秒內修改過的檔案，避免刪除上傳中的檔案（預設 3600）')
+        parser.add_argument('--report', help='以 NDJSON 格式將每個孤立檔案寫入此路徑（- 代表標準輸出）')
+        parser.add_argument('--shard', action='append', default=None,
+                            help='只掃描指定的最上層目錄（可重複指定），例如 --shard products')
+        parser.add_argument('--workers', type=int, default=4, help='平行掃描的執行緒數（預設 4）')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        try:
+            topDirs, topFiles = storage.listdir('')
+        except FileNotFoundError:
+            self.stdout.write('媒體儲存空間不存在，無需清理')
+            return
+
+        dryRun = options['dry_run']
+        cutoff = time.time() - max(options['grace_seconds'], 0)
+        shards = self._shards(topDirs, options['shard'])
+
+        referenced = collect_referenced_names()
+
+        orphans = []
+        workers = max(options['workers'], 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self._sweep_shard, storage, shard, topFiles, referenced, cutoff, dryRun): shard for shard in shards}
+            for future, shard in futures.items():
+                try:
+                    orphans.extend(future.result())
+                except OSError as e:
+                    self.stderr.write(f'Failed to scan {shard or "."}: {e}')
+
+        orphans.sort()
+        self._write_report(options.get('report'), orphans, dryRun)
+
+        totalBytes = sum(size for _, size, _ in orphans)
+        verb = 'Would remove' if dryRun else 'Removed'
+        self.stdout.write(f'Done. {verb} {len(orphans)} orphan files ({totalBytes} bytes) across {len(shards)} shards; {len(referenced)} referenced files.')
+
+    def _shards(self, topDirs, requested):
+        excluded = set()
+        root = str(getattr(settings, 'MEDIA_ROOT', '') or '')
+        cacheDir = getattr(settings, 'THUMB_CACHE_DIR', None)
+        if root and cacheDir:
+            rel = os.path.relpath(str(cacheDir), root)
+            if not rel.startswith('..'):
+                # thumb_cache 自行以 LRU 淘汰管理，不屬於資料庫引用的檔案
+                excluded.add(rel.split(os.sep)[0])
+
+        if requested:
+            return [s.strip('/') for s in requested if s.strip('/') not in excluded]
+
+        # '' 代表儲存空間最上層的檔案（不遞迴）
+        return [''] + [name for name in topDirs if name not in excluded]
+
+    def _sweep_shard(self, storage, shard, topFiles, referenced, cutoff, dryRun):
+        if shard == '':
+            orphans = [_stat_orphan(storage, name, cutoff) for name in topFiles if name not in referenced]
+            orphans = [o for o in orphans if o]
+        else:
+            orphans = scan_shard(storage, shard, referenced, cutoff)
+
+        if orphans and not dryRun:
+            remove_files(storage, [name for name, _, _ in orphans])
+        return orphans
+
+    def _write_report(self, target, orphans, dryRun):
+        if not target:
+            return
+        action = 'would-delete' if dryRun else 'deleted'
+        lines = (
+            json.dumps({
+                'path': name,
+                'size': size,
+                'mtime': datetime.datetime.fromtimestamp(mtime, tz=datetime.timezone.utc).isoformat(),
+                'action': action,
+            }, ensure_ascii=False)
+            for name, size, mtime in orphans
+        )
+        if target == '-':
+            for line in lines:
+                self.stdout.write(line)
+            return
+        with open(target, 'w', encoding='utf-8') as fh:
+            for line in lines:
+                fh.write(line + '\n')
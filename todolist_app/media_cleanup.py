@@ -0,0 +1,148 @@
+"""
+媒體檔案的延遲批次刪除
+
+signal 以 schedule_delete 登記檔名，同一交易的檔名於提交後一次處理：先以一次查詢略過仍被引用的檔案，
+再刪除其餘檔案並清除留下的空目錄。預設在背景執行緒中刪除（MEDIA_CLEANUP_ASYNC）；交易回滾時不刪除任何檔案。
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from .media_storage import prune_empty_dirs
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executorLock = threading.Lock()
+_pending = set()
+_pendingLock = threading.Lock()
+
+
+class CleanupBatch:
+    """on_commit callback holding the file names gathered in one transaction."""
+
+    def __init__(self, using):
+        self.using = using
+        self.names = defaultdict(set)
+        self.done = False
+
+    def add(self, storage, names):
+        self.names[storage].update(n for n in names if n)
+
+    def __call__(self):
+        self.done = True
+        for storage, names in self.names.items():
+            names = names - referenced_names(names, using=self.using)
+            if not names:
+                continue
+            if getattr(settings, 'MEDIA_CLEANUP_ASYNC', True):
+                _submit(storage, sorted(names))
+            else:
+                remove_files(storage, sorted(names))
+
+
+def _current_batch(using):
+    """Return the batch registered at the current savepoint level, if any."""
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+    sids = set(connection.savepoint_ids)
+    for entrySids, func, _ in connection.run_on_commit:
+        if isinstance(func, CleanupBatch) and not func.done and entrySids == sids:
+            return func
+    return None
+
+
+def schedule_delete(storage, names, using=None):
+    """Queue `names` for removal from `storage` once the transaction commits.
+
+    Outside a transaction the removal is dispatched immediately.
+    """
+    names = [n for n in names if n]
+    if not names:
+        return
+    using = using or 'default'
+    batch = _current_batch(using)
+    if batch is None:
+        batch = CleanupBatch(using)
+        batch.add(storage, names)
+        transaction.on_commit(batch, using=using, robust=True)
+    else:
+        batch.add(storage, names)
+
+
+def reference_fields():
+    """Yield (model, field name) for every column that can point at a media file."""
+    for model in apps.get_app_config('todolist_app').get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field.name
+    yield apps.get_model('todolist_app', 'ImageBlob'), 'fileName'
+
+
+def referenced_names(names, using=None):
+    """Return the subset of `names` that some row still points at."""
+    names = list(names)
+    if not names:
+        return set()
+    found = set()
+    for model, fieldName in reference_fields():
+        found.update(
+            model._default_manager.using(using)
+            .filter(**{f'{fieldName}__in': names})
+            .values_list(fieldName, flat=True)
+        )
+    return found
+
+
+def remove_files(storage, names):
+    """Delete files, then prune the directories they leave empty (local storage only)."""
+    dirs = set()
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning('Failed to delete media file %s', name, exc_info=True)
+            continue
+        parent = os.path.dirname(name)
+        # 保留最上層目錄（products/、categories/），只清理其下的子目錄
+        while parent and os.path.dirname(parent):
+            dirs.add(parent)
+            parent = os.path.dirname(parent)
+    prune_empty_dirs(storage, dirs)
+
+
+def _get_executor():
+    global _executor
+    with _executorLock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'MEDIA_CLEANUP_WORKERS', 2),
+                thread_name_prefix='media-cleanup',
+            )
+        return _executor
+
+
+def _submit(storage, names):
+    future = _get_executor().submit(remove_files, storage, names)
+    with _pendingLock:
+        _pending.add(future)
+    future.add_done_callback(_forget)
+
+
+def _forget(future):
+    with _pendingLock:
+        _pending.discard(future)
+
+
+def wait_for_pending(timeout=None):
+    """Block until queued background removals finish (tests, management commands)."""
+    with _pendingLock:
+        futures = list(_pending)
+    if futures:
+        wait(futures, timeout=timeout)
@@ -0,0 +1,184 @@
+"""Serving media files without the DEBUG-only static view.
+
+``serve_file`` answers conditional requests (If-None-Match,
+If-Modified-Since) with 304, supports single byte ranges (206/416) and
+streams the body through ``FileResponse`` in ``STREAM_BLOCK_SIZE`` blocks.
+Files are read through their ``Storage``, so the same code serves local disk
+and an S3-compatible bucket; for local files under WSGI the server's
+``wsgi.file_wrapper`` can still use ``sendfile`` on the open file.
+
+When ``MEDIA_ACCEL_MODE`` is set, no bytes go through Python at all: the
+response only carries an ``X-Accel-Redirect`` (nginx) or ``X-Sendfile``
+(Apache/lighttpd) header and the fronting proxy sends the file, including
+Range handling. X-Sendfile needs a local path, so it only applies to local
+storage; X-Accel-Redirect for remote storage points at the storage name and
+the internal location is expected to proxy to the bucket.
+"""
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+from urllib.parse import quote
+from .media_storage import file_stat, local_path
+import mimetypes
+import os
+import re
+
+
+STREAM_BLOCK_SIZE = 256 * 1024
+
+# Names written by upload_to / image_variant_upload_path start with a uuid or
+# content-hash prefix, so their content never changes under the same URL.
+IMMUTABLE_NAME_RE = re.compile(r'^[0-9a-f]{8}(?:[0-9a-f]{8})?_')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """File-like view of `length` bytes of an open file, from its current position."""
+
+    def __init__(self, fh, length):
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fh.close()
+
+
+def cache_control_for(name):
+    """Cache-Control for a media file, immutable when the name is uuid/hash prefixed."""
+    if IMMUTABLE_NAME_RE.match(os.path.basename(name)):
+        return IMMUTABLE_CACHE_CONTROL
+    return DEFAULT_CACHE_CONTROL
+
+
+def make_etag(size, modified):
+    return f'"{int(modified.timestamp() * 1_000_000):x}-{size:x}"'
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single-range header.
+
+    Returns None when the header should be ignored (malformed or several
+    ranges, in which case the whole file is sent) and raises ValueError when
+    the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('range not satisfiable')
+    return start, min(end, size - 1)
+
+
+def _not_modified(request, etag, mtime):
+    ifNoneMatch = request.headers.get('If-None-Match')
+    if ifNoneMatch:
+        tags = [t.strip().removeprefix('W/') for t in ifNoneMatch.split(',')]
+        return '*' in tags or etag in tags
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _accel_headers(storage, name):
+    mode = (getattr(settings, 'MEDIA_ACCEL_MODE', '') or '').lower()
+    if not mode:
+        return None
+    path = local_path(storage, name)
+    if mode == 'x-sendfile':
+        return {'X-Sendfile': path} if path else None
+    if mode == 'x-accel-redirect':
+        if path is None:
+            rel = name
+        else:
+            rel = os.path.relpath(path, str(settings.MEDIA_ROOT))
+            if rel.startswith('..'):
+                return None
+            rel = rel.replace(os.sep, '/')
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        return {'X-Accel-Redirect': prefix.rstrip('/') + '/' + quote(rel)}
+    raise ValueError(f'Unknown MEDIA_ACCEL_MODE: {mode!r}')
+
+
+def serve_file(request, storage, name, content_type=None, cache_control=None, vary=None):
+    """Return a response for the file `name` in `storage` (404 if it is missing)."""
+    try:
+        size, modified = file_stat(storage, name)
+    except FileNotFoundError:
+        raise Http404('File not found')
+
+    etag = make_etag(size, modified)
+    mtime = modified.timestamp()
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(mtime),
+        'Cache-Control': cache_control or cache_control_for(name),
+    }
+    if vary:
+        headers['Vary'] = vary
+
+    if _not_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    accel = _accel_headers(storage, name)
+    if accel:
+        response = HttpResponse(content_type=content_type)
+        for key, value in {**headers, **accel}.items():
+            response[key] = value
+        return response
+
+    byteRange = None
+    rangeHeader = request.headers.get('Range')
+    ifRange = request.headers.get('If-Range')
+    if rangeHeader and (not ifRange or ifRange == etag):
+        try:
+            byteRange = parse_range(rangeHeader, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    try:
+        fh = storage.open(name, 'rb')
+    except OSError:
+        raise Http404('File not found')
+    if byteRange is None:
+        response = FileResponse(fh, content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byteRange
+        fh.seek(start)
+        response = FileResponse(FileRange(fh, end - start + 1), content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response.block_size = STREAM_BLOCK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    for key, value in headers.items():
+        response[key] = value
+    return response
@@ -0,0 +1,101 @@
+"""
+與儲存後端無關的媒體檔案工具
+
+所有讀寫、刪除與列舉都經由 Django Storage（本機磁碟或 S3 相容儲存）；本機磁碟另有 stat、硬連結與清除空目錄等捷徑。
+檔案內容一律分段讀寫，不整個讀入記憶體。
+"""
+from datetime import datetime, timezone
+from django.core.files.storage import FileSystemStorage
+import os
+import posixpath
+import shutil
+import stat
+
+
+def local_path(storage, name):
+    """Return the filesystem path of `name`, or None when `storage` is not on local disk.
+
+    Only ``FileSystemStorage`` counts as local: other backends may implement
+    ``path()`` (``InMemoryStorage`` does) without the file existing there.
+    """
+    if not isinstance(storage, FileSystemStorage):
+        return None
+    return storage.path(name)
+
+
+def file_stat(storage, name):
+    """Return (size, modified datetime) of a stored file.
+
+    Raises FileNotFoundError when `name` is missing or is not a regular file.
+    """
+    path = local_path(storage, name)
+    if path is not None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            raise FileNotFoundError(name)
+        if not stat.S_ISREG(st.st_mode):
+            raise FileNotFoundError(name)
+        return st.st_size, datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
+    if not name or not storage.exists(name):
+        raise FileNotFoundError(name)
+    try:
+        return storage.size(name), storage.get_modified_time(name)
+    except (IsADirectoryError, NotImplementedError):
+        raise FileNotFoundError(name)
+
+
+def walk_files(storage, top=''):
+    """Yield the names of every file below `top`, depth first, using ``listdir``."""
+    stack = [top.strip('/')]
+    while stack:
+        rel = stack.pop()
+        try:
+            dirs, files = storage.listdir(rel)
+        except FileNotFoundError:
+            continue
+        for d in dirs:
+            stack.append(posixpath.join(rel, d) if rel else d)
+        for f in files:
+            yield posixpath.join(rel, f) if rel else f
+
+
+def copy_file(storage, sourceName, targetName):
+    """Store a copy of `sourceName` under (an available variant of) `targetName`.
+
+    On local disk the copy is a hard link (its mtime bumped to now, so sweeps
+    treat it as new), falling back to ``shutil.copyfile`` across filesystems;
+    elsewhere the content is streamed in chunks through
+    ``Storage.save``. Returns the name actually used.
+    """
+    sourcePath = local_path(storage, sourceName)
+    if sourcePath is None:
+        with storage.open(sourceName, 'rb') as fh:
+            return storage.save(targetName, fh)
+
+    targetName = storage.get_available_name(targetName)
+    targetPath = storage.path(targetName)
+    os.makedirs(os.path.dirname(targetPath), exist_ok=True)
+    try:
+        os.link(sourcePath, targetPath)
+    except OSError:
+        shutil.copyfile(sourcePath, targetPath)
+    else:
+        # 硬連結沿用來源的 mtime；更新為現在，sweep_media 的寬限期才能保護尚未提交的新引用
+        os.utime(targetPath)
+    return targetName
+
+
+def prune_empty_dirs(storage, dirs):
+    """Remove the given directories (deepest first) when they are empty.
+
+    Object stores have no directories, so this only acts on local storage.
+    """
+    if local_path(storage, '') is None:
+        return
+    for directory in sorted(dirs, key=lambda d: d.count('/'), reverse=True):
+        try:
+            os.rmdir(storage.path(directory))
+        except OSError:
+            # 目錄不存在或仍有其他檔案
+            pass
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views_media
+
+# 掛載在 settings.MEDIA_URL 之下（見 config/urls.py）；不論 DEBUG 與否都由 serve_media 回傳檔案
+urlpatterns = [
+    path('thumb/<int:image_id>/<slug:variant>', views_media.serve_thumbnail, name='media_thumbnail'),
+    path('variant/<str:kind>/<int:pk>/<slug:variant>/', views_media.serve_image_variant, name='media_image_variant'),
+    path('<path:path>', views_media.serve_media, name='media_file'),
+]
@@ -0,0 +1,61 @@
+# Generated by Django 6.1.2 on 2026-10-19 16:14
+
+import django.db.models.deletion
+import mptt.fields
+import todolist_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0008_add_mptt_fields_and_populate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='level',
+            field=models.PositiveIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='lft',
+            field=models.PositiveIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='parent',
+            field=mptt.fields.TreeForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='todolist_app.category'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='rght',
+            field=models.PositiveIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='tree_id',
+            field=models.PositiveIntegerField(db_index=True, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variantName', models.CharField(max_length=50)),
+                ('format', models.CharField(max_length=10)),
+                ('file', models.ImageField(upload_to=todolist_app.models.image_variant_upload_path)),
+                ('width', models.PositiveIntegerField(default=0)),
+                ('height', models.PositiveIntegerField(default=0)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='todolist_app.category')),
+                ('productImage', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='todolist_app.productimage')),
+            ],
+            options={
+                'verbose_name': '圖片變體',
+                'verbose_name_plural': '圖片變體',
+                'ordering': ['variantName', 'width'],
+                'constraints': [models.UniqueConstraint(fields=('productImage', 'variantName', 'format'), name='uniq_product_image_variant'), models.UniqueConstraint(fields=('category', 'variantName', 'format'), name='uniq_category_variant'), models.CheckConstraint(condition=models.Q(models.Q(('category__isnull', True), ('productImage__isnull', False)), models.Q(('category__isnull', False), ('productImage__isnull', True)), _connector='OR'), name='image_variant_single_owner')],
+            },
+        ),
+    ]
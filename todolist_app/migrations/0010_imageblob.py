@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0009_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contentHash', models.CharField(max_length=64, unique=True)),
+                ('fileName', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('refCount', models.PositiveIntegerField(default=0)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': '圖片檔案',
+                'verbose_name_plural': '圖片檔案',
+            },
+        ),
+        migrations.AddField(
+            model_name='imagevariant',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='variants', to='todolist_app.imageblob'),
+        ),
+    ]
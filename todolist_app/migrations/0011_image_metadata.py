@@ -0,0 +1,73 @@
+# Generated by Django 6.1.2 on 2026-10-19 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0010_imageblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='contentHash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='內容雜湊'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='imageBytes',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='檔案大小（bytes）'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='imageFormat',
+            field=models.CharField(blank=True, editable=False, max_length=10, verbose_name='圖片格式'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='imageHeight',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='圖片高度'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='imageWidth',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='圖片寬度'),
+        ),
+        migrations.AddField(
+            model_name='imagevariant',
+            name='contentHash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='imagevariant',
+            name='fileSize',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='contentHash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='內容雜湊'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='imageBytes',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='檔案大小（bytes）'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='imageFormat',
+            field=models.CharField(blank=True, editable=False, max_length=10, verbose_name='圖片格式'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='imageHeight',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='圖片高度'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='imageWidth',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='圖片寬度'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.1.2 on 2026-10-19 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0011_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='dominantColor',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='主色'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='預覽佔位圖（data URI）'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='dominantColor',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='主色'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='預覽佔位圖（data URI）'),
+        ),
+    ]
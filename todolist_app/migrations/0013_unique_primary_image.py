@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-19 16:48
+
+from django.db import migrations, models
+
+
+def keep_single_primary(apps, schema_editor):
+    """每個商品只保留一張主圖（displayOrder 最小者），其餘取消，才能建立唯一索引"""
+    ProductImage = apps.get_model('todolist_app', 'ProductImage')
+    duplicated = (
+        ProductImage.objects.filter(isPrimary=True)
+        .values('product_id')
+        .annotate(n=models.Count('id'))
+        .filter(n__gt=1)
+        .values_list('product_id', flat=True)
+    )
+    for productId in list(duplicated):
+        primaries = ProductImage.objects.filter(product_id=productId, isPrimary=True).order_by('displayOrder', 'id')
+        keep = primaries.values_list('id', flat=True).first()
+        primaries.exclude(id=keep).update(isPrimary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0012_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_single_primary, reverse_code=migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('isPrimary', True)), fields=('product', 'isPrimary'), name='uniq_primary_image_per_product'),
+        ),
+    ]
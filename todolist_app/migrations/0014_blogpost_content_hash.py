@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0013_unique_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='contentHash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='rendererVersion',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
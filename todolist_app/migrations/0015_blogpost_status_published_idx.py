@@ -0,0 +1,19 @@
+# Generated by Django 6.1.2 on 2026-10-19 17:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0014_blogpost_content_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', 'publishedAt', 'id'], name='blogpost_status_published_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.1.2 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0015_blogpost_status_published_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('slug', models.SlugField(allow_unicode=True, max_length=80, unique=True)),
+                ('postCount', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='tagSet',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='posts', to='todolist_app.tag'),
+        ),
+    ]
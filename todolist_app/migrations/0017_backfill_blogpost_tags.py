@@ -0,0 +1,72 @@
+"""Backfill Tag / BlogPost.tagSet from the comma-separated BlogPost.tags strings.
+
+Tag names are split and de-duplicated the same way as
+``todolist_app.models.parse_tag_names`` (copied here so the migration does not
+depend on the current model code). Tags, relations and the denormalized
+``postCount`` are written with bulk queries.
+"""
+
+from collections import Counter
+import re
+
+from django.db import migrations
+from django.utils.text import slugify
+
+
+TAG_SEPARATOR_RE = re.compile(r'[,，]')
+TAG_NAME_MAX_LENGTH = 64
+
+
+def parse_tag_names(value):
+    seen = {}
+    for raw in TAG_SEPARATOR_RE.split(value or ''):
+        name = ' '.join(raw.split())[:TAG_NAME_MAX_LENGTH]
+        tagSlug = slugify(name, allow_unicode=True)
+        if tagSlug and tagSlug not in seen:
+            seen[tagSlug] = name
+    return list(seen.items())
+
+
+def backfill_tags(apps, schema_editor):
+    BlogPost = apps.get_model('todolist_app', 'BlogPost')
+    Tag = apps.get_model('todolist_app', 'Tag')
+    Through = BlogPost.tagSet.through
+
+    names = {}
+    postSlugs = []
+    counts = Counter()
+    posts = BlogPost.objects.exclude(tags='').values_list('pk', 'tags', 'status').order_by('pk')
+    for pk, tags, status in posts.iterator(chunk_size=2000):
+        parsed = parse_tag_names(tags)
+        for tagSlug, name in parsed:
+            names.setdefault(tagSlug, name)
+            if status == 'published':
+                counts[tagSlug] += 1
+        postSlugs.append((pk, [tagSlug for tagSlug, _ in parsed]))
+    if not names:
+        return
+
+    Tag.objects.bulk_create(
+        [Tag(slug=tagSlug, name=name) for tagSlug, name in names.items()],
+        ignore_conflicts=True, batch_size=1000,
+    )
+    tagIds = dict(Tag.objects.filter(slug__in=names).values_list('slug', 'pk'))
+    Through.objects.bulk_create(
+        [Through(blogpost_id=pk, tag_id=tagIds[tagSlug]) for pk, slugs in postSlugs for tagSlug in slugs],
+        ignore_conflicts=True, batch_size=1000,
+    )
+    tags = list(Tag.objects.filter(slug__in=names))
+    for tag in tags:
+        tag.postCount = counts[tag.slug]
+    Tag.objects.bulk_update(tags, ['postCount'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0016_tag'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tags, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.1.2 on 2026-10-19 17:27
+
+import todolist_app.models
+from django.db import migrations
+
+
+def backfill_search_vectors(apps, schema_editor):
+    """PostgreSQL only: vectors for existing posts.
+
+    Other databases keep the placeholder column empty and search with the
+    icontains fallback in blog_search; later saves rebuild each vector.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from todolist_app.blog_search import update_search_vectors
+    update_search_vectors(apps.get_model('todolist_app', 'BlogPost').objects.using(schema_editor.connection.alias))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist_app', '0017_backfill_blogpost_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='searchVector',
+            field=todolist_app.models.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=todolist_app.models.SearchVectorIndex(fields=['searchVector'], name='blogpost_search_gin_idx'),
+        ),
+        migrations.RunPython(backfill_search_vectors, reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,25 +1,61 @@
-from django.db import models  # 👈 修正這裡，改為 import models
+from django.db import models, transaction, IntegrityError  # 👈 修正這裡，改為 import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
 from django.utils.text import slugify
 from django.utils import timezone
-from django.db.models.signals import post_delete, pre_delete
+from django.db.models.functions import Cast, Coalesce, Substr
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 import bleach
 import uuid
 import os
+import re
 from PIL import Image
 from io import BytesIO
 from django.core.files.base import ContentFile
-from .image_utils import validate_image_file, make_square_thumbnail, make_preview_thumbnail
-from .utils.markdown_renderer import render_markdown
+from .image_utils import validate_image_file, get_variant_specs, render_variants_and_placeholder, compute_placeholder, hash_file, read_image_metadata, upload_rejection, FORMAT_EXTENSIONS
+from .blog_cache import invalidate_posts
+from .blog_search import update_search_vector
+from .syndication import bump_catalog_version
+from .media_cleanup import schedule_delete
+from .media_storage import copy_file
+from .utils.markdown_renderer import RENDERER_VERSION, markdown_content_hash, render_document_cached
 try:
     from mptt.models import MPTTModel, TreeForeignKey
 except Exception:
     # django-mptt may not be installed in the environment yet; fallback to regular FK
     MPTTModel = models.Model
     TreeForeignKey = lambda *args, **kwargs: models.ForeignKey(*args, **kwargs)
+try:
+    from django.contrib.postgres.search import SearchVectorField as BaseSearchVectorField
+except Exception:
+    # psycopg 未安裝（例如以 SQLite 執行測試）時無法載入 contrib.postgres
+    BaseSearchVectorField = models.Field
+try:
+    from django.contrib.postgres.indexes import GinIndex as BaseGinIndex
+except Exception:
+    BaseGinIndex = models.Index
+
+
+class SearchVectorField(BaseSearchVectorField):
+    """PostgreSQL 上為 tsvector；其他資料庫只建立 text 欄位佔位，搜尋改用 blog_search 的備援查詢"""
+
+    def db_type(self, connection):
+        return 'tsvector' if connection.vendor == 'postgresql' else 'text'
+
+
+class SearchVectorIndex(BaseGinIndex):
+    """PostgreSQL 上為 GIN 索引；其他資料庫建立一般索引佔位（與 SearchVectorField 相同的處理方式）"""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return models.Index.create_sql(self, model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def check(self, model, connection):
+        # 只用到 GIN 的 DDL，不需要把 contrib.postgres（其 ready() 需要 psycopg）加入 INSTALLED_APPS
+        return [error for error in super().check(model, connection) if error.id != 'postgres.E005']
 
 class Todo(models.Model):
     # 👈 2. 建立關聯：一對多 (一個 User 有多個 Todo)
@@ -34,6 +70,60 @@ class Todo(models.Model):
         return f"{self.user.username} - {self.title}"    
 
 
+# 標籤分隔符號：半形與全形逗號
+TAG_SEPARATOR_RE = re.compile(r'[,，]')
+TAG_NAME_MAX_LENGTH = 64
+
+
+def parse_tag_names(value):
+    """
+    把逗號分隔的標籤字串拆成標籤名稱清單。
+
+    去除前後空白並合併連續空白；slug 相同的名稱（例如 `Django` 與 `django`）視為同一個標籤，
+    只保留第一次出現的寫法。回傳 [(slug, name), ...]，維持輸入順序。
+    """
+    seen = {}
+    for raw in TAG_SEPARATOR_RE.split(value or ''):
+        name = ' '.join(raw.split())[:TAG_NAME_MAX_LENGTH]
+        tagSlug = slugify(name, allow_unicode=True)
+        if tagSlug and tagSlug not in seen:
+            seen[tagSlug] = name
+    return list(seen.items())
+
+
+class Tag(models.Model):
+    """
+    文章標籤。
+
+    postCount 為帶有此標籤的已發佈文章數（反正規化計數），由 BlogPost.sync_tags
+    與文章刪除時的 signal 維護，標籤列表不需再 COUNT。
+    """
+    name = models.CharField(max_length=TAG_NAME_MAX_LENGTH)
+    slug = models.SlugField(max_length=80, unique=True, allow_unicode=True)
+    postCount = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def recount(cls, tagIds):
+        """以單一 UPDATE 重新計算指定標籤的已發佈文章數"""
+        tagIds = list(tagIds)
+        if not tagIds:
+            return
+        published = (
+            BlogPost.tagSet.through.objects
+            .filter(tag=models.OuterRef('pk'), blogpost__status=BlogPost.STATUS_PUBLISHED)
+            .values('tag')
+            .annotate(total=models.Count('pk'))
+            .values('total')
+        )
+        cls.objects.filter(pk__in=tagIds).update(postCount=Coalesce(models.Subquery(published), 0))
+
+
 class BlogPost(models.Model):
     # 作者（關聯到現有的 User 模型）
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blogPosts')  # 作者為必填
@@ -43,8 +133,18 @@ class BlogPost(models.Model):
     slug = models.SlugField(max_length=300, unique=True, blank=True)  # 可讀 slug，用於公開 URL
     markdownContent = models.TextField()  # 原始 Markdown 內容
     htmlContent = models.TextField(blank=True)  # 由 Markdown 轉出的安全 HTML
+    contentHash = models.CharField(max_length=64, blank=True, editable=False)  # htmlContent 對應的 markdownContent 雜湊
+    rendererVersion = models.CharField(max_length=16, blank=True, editable=False)  # 產生 htmlContent 的渲染器版本
+    # 與 htmlContent 同時產生的衍生資料，列表與文章頁直接顯示，不需在請求中重新計算
+    tocHtml = models.TextField(blank=True, editable=False)  # 目錄 HTML（已跳脫）
+    tocJson = models.JSONField(default=list, blank=True, editable=False)  # 目錄結構：[{level, id, name, children}]
+    wordCount = models.PositiveIntegerField(default=0, editable=False)  # 字數（中日韓文字每字計 1）
+    readingMinutes = models.PositiveSmallIntegerField(default=0, editable=False)  # 預估閱讀分鐘數
+    excerpt = models.CharField(max_length=300, blank=True, editable=False)  # 內文開頭的純文字摘錄
     summary = models.CharField(max_length=512, blank=True)  # 摘要
-    tags = models.CharField(max_length=255, blank=True)  # 簡易標籤，以逗號分隔
+    tags = models.CharField(max_length=255, blank=True)  # 作者輸入的標籤，以逗號分隔；儲存時同步到 tagSet
+    tagSet = models.ManyToManyField(Tag, related_name='posts', blank=True, editable=False)  # 正規化的標籤關聯
+    searchVector = SearchVectorField(null=True, blank=True, editable=False)  # 全文搜尋用的加權 tsvector（GIN 索引見 Meta.indexes）
 
     STATUS_DRAFT = 'draft'
     STATUS_PUBLISHED = 'published'
@@ -56,39 +156,190 @@ class BlogPost(models.Model):
 
     class Meta:
         ordering = ['-publishedAt', '-createdAt']
+        indexes = [
+            # 公開列表：status 篩選後依 (publishedAt, id) 做 keyset 分頁
+            models.Index(fields=['status', 'publishedAt', 'id'], name='blogpost_status_published_idx'),
+            # 全文搜尋：searchVector @@ tsquery
+            SearchVectorIndex(fields=['searchVector'], name='blogpost_search_gin_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values, **kwargs):
+        instance = super().from_db(db, field_names, values, **kwargs)
+        # 記錄已儲存的 slug：改 slug 時舊網址的快取頁面也要失效（見 blog_post_changed）
+        if 'slug' not in instance.get_deferred_fields():
+            instance._storedSlug = instance.slug
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if (fields is None or 'slug' in fields) and 'slug' not in self.get_deferred_fields():
+            self._storedSlug = self.slug
+
+    # 自動產生的 slug 在並行儲存時撞到唯一索引，最多重新分配的次數
+    SLUG_RETRY_LIMIT = 5
+
+    # 渲染時一併更新的欄位（refresh_html、rerender_posts）
+    RENDERED_FIELDS = ('htmlContent', 'tocHtml', 'tocJson', 'wordCount', 'readingMinutes', 'excerpt', 'contentHash', 'rendererVersion')
+
+    # 組成搜尋向量的欄位（htmlContent 取其純文字）
+    SEARCH_FIELDS = {'title', 'tags', 'summary', 'htmlContent'}
+
+    def allocate_slug(self):
+        """
+        依標題分配 slug，只用一次查詢。
+
+        以 slug__startswith（可使用索引）加上 slug__regex 找出 `base` 與 `base-N`，
+        在同一個彙總查詢中取得 base 是否已被使用與最大的 N，回傳下一個可用的 slug。
+        中文等標題 slugify 後為空時改用隨機 id，不需查詢。
+        """
+        baseSlug = slugify(self.title)[:240]
+        if not baseSlug:
+            return f"post-{uuid.uuid4().hex[:16]}"
+
+        suffixPattern = rf'^{re.escape(baseSlug)}-[0-9]+$'
+        stats = (
+            BlogPost.objects.filter(slug__startswith=baseSlug)
+            .exclude(pk=self.pk)
+            .aggregate(
+                baseTaken=models.Count('pk', filter=models.Q(slug=baseSlug)),
+                maxSuffix=models.Max(
+                    Cast(Substr('slug', len(baseSlug) + 2), models.IntegerField()),
+                    filter=models.Q(slug__regex=suffixPattern),
+                ),
+            )
+        )
+        if not stats['baseTaken']:
+            return baseSlug
+        return f"{baseSlug}-{(stats['maxSuffix'] or 0) + 1}"
+
     def save(self, *args, **kwargs):
-        # 如果沒有 slug，生成一個基於 title 的 slug（若衝突則附時間戳）
-        if not self.slug:
-            baseSlug = slugify(self.title)[:240]
-            
-            # 如果中文標題導致空 slug，使用 ID 或時間戳
-            if not baseSlug:
-                import uuid
-                baseSlug = f"post-{uuid.uuid4().hex[:8]}"
-            
-            candidate = baseSlug
-            suffix = 1
-            while BlogPost.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                candidate = f"{baseSlug}-{suffix}"
-                suffix += 1
-            self.slug = candidate
+        # 如果沒有 slug，依標題分配一個（衝突時附加遞增的數字 suffix）
+        slugGenerated = not self.slug
+        if slugGenerated:
+            self.slug = self.allocate_slug()
 
         # 處理發佈時間（由 draft -> published 時設定 publishedAt）
         if self.status == self.STATUS_PUBLISHED and not self.publishedAt:
             self.publishedAt = timezone.now()
 
-        # 產生 htmlContent（先用 Markdown 轉 HTML，再做消毒）
+        # 產生 htmlContent（先用 Markdown 轉 HTML，再做消毒）；內容未變時不重新渲染
         try:
-            self.htmlContent = render_markdown(self.markdownContent)
+            rendered = self.refresh_html()
         except Exception:
             # 若渲染失敗，保留原先的 htmlContent 並不阻斷保存
-            pass
+            rendered = False
 
-        super().save(*args, **kwargs)
+        updateFields = kwargs.get('update_fields')
+        if rendered and updateFields is not None:
+            kwargs['update_fields'] = set(updateFields) | set(self.RENDERED_FIELDS)
+
+        if slugGenerated:
+            self._save_with_allocated_slug(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+
+        # 標題、標籤、摘要或內容可能改變時重建搜尋向量
+        savedFields = kwargs.get('update_fields')
+        if savedFields is None or self.SEARCH_FIELDS & set(savedFields):
+            update_search_vector(self, using=kwargs.get('using'))
+
+    def _save_with_allocated_slug(self, *args, **kwargs):
+        for attempt in range(self.SLUG_RETRY_LIMIT):
+            try:
+                # savepoint：撞到唯一索引時只回滾這次 INSERT，外層交易仍可繼續
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                # 只在 slug 確實被其他文章搶先使用時重新分配，其他約束錯誤直接拋出
+                if attempt == self.SLUG_RETRY_LIMIT - 1 or not BlogPost.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
+                    raise
+                self.slug = self.allocate_slug()
+
+    def refresh_html(self):
+        """
+        依 markdownContent 的雜湊更新 htmlContent 與目錄、字數、閱讀時間、摘錄。
+
+        雜湊與渲染器版本都與上次相同時直接略過（狀態切換、摘要修改不會重新渲染）；
+        否則經由共用渲染快取取得渲染結果，相同內容只渲染一次。回傳是否有更新。
+        """
+        contentHash = markdown_content_hash(self.markdownContent)
+        if contentHash == self.contentHash and self.rendererVersion == RENDERER_VERSION:
+            return False
+        document, contentHash = render_document_cached(self.markdownContent, contentHash)
+        self.apply_rendered(document, contentHash)
+        return True
+
+    def apply_rendered(self, document, contentHash):
+        """寫入 render_document 的結果（HTML、目錄與閱讀統計）"""
+        self.htmlContent = document['html']
+        self.tocHtml = document['tocHtml']
+        self.tocJson = document['toc']
+        self.wordCount = document['wordCount']
+        self.readingMinutes = document['readingMinutes']
+        self.excerpt = document['excerpt']
+        self.contentHash = contentHash
+        self.rendererVersion = RENDERER_VERSION
+
+    def sync_tags(self):
+        """
+        依 tags 字串同步 tagSet，並重新計算新舊標籤的 postCount。
+
+        缺少的標籤以 bulk_create 一次建立（並行建立同名標籤時忽略衝突後重新查詢）；
+        文章狀態可能改變，所以即使標籤沒變也會重新計算計數。
+        """
+        parsed = dict(parse_tag_names(self.tags))
+        tags = {t.slug: t.pk for t in Tag.objects.filter(slug__in=parsed)}
+        missing = [Tag(slug=tagSlug, name=name) for tagSlug, name in parsed.items() if tagSlug not in tags]
+        if missing:
+            Tag.objects.bulk_create(missing, ignore_conflicts=True)
+            tags = {t.slug: t.pk for t in Tag.objects.filter(slug__in=parsed)}
+
+        newIds = set(tags.values())
+        oldIds = set(self.tagSet.values_list('pk', flat=True))
+        if newIds != oldIds:
+            self.tagSet.set(newIds)
+        Tag.recount(oldIds | newIds)
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def blog_post_changed(sender, instance, **kwargs):
+    """
+    文章新增、修改或刪除後讓該文章的快取頁面與所有快取的列表頁失效；
+    slug 改變時舊 slug 的快取頁面一併失效。
+
+    立即失效一次，並在交易提交後再失效一次：提交前其他請求仍會讀到舊資料並寫回快取，
+    第二次失效把這些頁面也丟掉。
+    """
+    slugs = {instance.slug, getattr(instance, '_storedSlug', '')} - {''}
+    invalidate_posts(slugs)
+    transaction.on_commit(lambda: invalidate_posts(slugs), using=kwargs.get('using'))
+    instance._storedSlug = instance.slug
+
+
+@receiver(post_save, sender=BlogPost)
+def blog_post_sync_tags(sender, instance, update_fields=None, raw=False, **kwargs):
+    """標籤字串或狀態可能改變時同步 tagSet 與標籤計數（loaddata 時由 fixture 自帶關聯）"""
+    if raw:
+        return
+    if update_fields is None or {'tags', 'status'} & set(update_fields):
+        instance.sync_tags()
+
+
+@receiver(pre_delete, sender=BlogPost)
+def blog_post_pre_delete(sender, instance, **kwargs):
+    # 關聯列會隨文章一起刪除，先記下要重新計數的標籤
+    instance._deletedTagIds = list(instance.tagSet.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=BlogPost)
+def blog_post_deleted_recount_tags(sender, instance, **kwargs):
+    Tag.recount(getattr(instance, '_deletedTagIds', ()))
 
 
 class Product(models.Model):
@@ -115,6 +366,10 @@ class Product(models.Model):
     def __str__(self):
         return self.productName
 
+    def clone(self, productName=None):
+        """複製此商品（含分類指派與圖片），詳見 clone_product"""
+        return clone_product(self, productName=productName)
+
     def clean_description(self):
         """清理商品描述中的危險 HTML 內容"""
         if self.description:
@@ -145,13 +400,20 @@ class Product(models.Model):
         super().save(*args, **kwargs)
 
 
+def _upload_prefix(instance):
+    """上傳檔名前綴：已計算內容雜湊時使用雜湊前 16 碼，否則使用隨機 uuid"""
+    contentHash = getattr(instance, '_pendingContentHash', None)
+    if contentHash:
+        return contentHash[:16]
+    return uuid.uuid4().hex[:8]
+
+
 def product_image_upload_path(instance, filename):
     """
     產生商品圖片的上傳路徑。
-    格式: products/<product_id>/<uuid>_<filename>
+    格式: products/<product_id>/<content hash 或 uuid>_<filename>
     """
-    ext = os.path.splitext(filename)[1]
-    unique_filename = f"{uuid.uuid4().hex[:8]}_{filename}"
+    unique_filename = f"{_upload_prefix(instance)}_{filename}"
     return f"products/{instance.product.id}/{unique_filename}"
 
 
@@ -178,10 +440,9 @@ def product_thumbnail800_upload_path(instance, filename):
 
 def category_image_upload_path(instance, filename):
     """產生分類圖片的上傳路徑。
-    格式: categories/<category_id>/<uuid>_<filename>
+    格式: categories/<category_id>/<content hash 或 uuid>_<filename>
     """
-    ext = os.path.splitext(filename)[1]
-    unique_filename = f"{uuid.uuid4().hex[:8]}_{filename}"
+    unique_filename = f"{_upload_prefix(instance)}_{filename}"
     # If instance has no id yet, store under temporary folder 'categories/tmp'
     cat_id = getattr(instance, 'id', None) or 'tmp'
     return f"categories/{cat_id}/{unique_filename}"
@@ -203,16 +464,275 @@ def category_thumbnail800_upload_path(instance, filename):
     return category_thumbnail_upload_path(instance, filename, '800x800')
 
 
-class ProductImage(models.Model):
+class ImageBlob(models.Model):
+    """
+    以內容雜湊（BLAKE2b）定址的原始圖片檔案。
+
+    相同內容的上傳共用同一個實體檔案與同一組縮圖；refCount 記錄目前有多少
+    ProductImage / Category 引用此檔案，歸零時才會刪除實體檔案。
+    """
+    contentHash = models.CharField(max_length=64, unique=True)
+    fileName = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refCount = models.PositiveIntegerField(default=0)
+    createdAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = '圖片檔案'
+        verbose_name_plural = '圖片檔案'
+
+    def __str__(self):
+        return f"{self.fileName} ({self.refCount})"
+
+
+class ImageMetadata(models.Model):
+    """
+    原始圖片（image 欄位）的中繼資料。
+
+    尺寸、大小、格式與雜湊於上傳處理時寫入（見 attach_image_blob）；約 20px 的
+    預覽佔位圖與主色於產生縮圖時一併計算（見 render_image_variants）。
+    驗證與 API 序列化直接讀取欄位，不需重新開啟檔案；既有資料由
+    backfill_image_metadata 指令補齊。
+    """
+    imageWidth = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='圖片寬度')
+    imageHeight = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='圖片高度')
+    imageBytes = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name='檔案大小（bytes）')
+    imageFormat = models.CharField(max_length=10, blank=True, editable=False, verbose_name='圖片格式')
+    contentHash = models.CharField(max_length=64, blank=True, editable=False, verbose_name='內容雜湊')
+    placeholder = models.TextField(blank=True, editable=False, verbose_name='預覽佔位圖（data URI）')
+    dominantColor = models.CharField(max_length=7, blank=True, editable=False, verbose_name='主色')
+
+    class Meta:
+        abstract = True
+
+    @property
+    def has_image_metadata(self):
+        return self.imageWidth is not None and self.imageHeight is not None
+
+    def set_image_metadata(self, file_obj, contentHash):
+        """由檔案標頭讀取尺寸與格式（不解碼像素）並寫入欄位，不儲存"""
+        meta = read_image_metadata(file_obj)
+        self.contentHash = contentHash or ''
+        if meta is None:
+            self.imageWidth = self.imageHeight = self.imageBytes = None
+            self.imageFormat = ''
+            return False
+        self.imageWidth = meta['width']
+        self.imageHeight = meta['height']
+        self.imageFormat = meta['format']
+        self.imageBytes = meta['bytes']
+        return True
+
+    def image_metadata_dict(self):
+        return {
+            'width': self.imageWidth,
+            'height': self.imageHeight,
+            'bytes': self.imageBytes,
+            'format': self.imageFormat or None,
+            'contentHash': self.contentHash or None,
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values, **kwargs):
+        instance = super().from_db(db, field_names, values, **kwargs)
+        instance._remember_image()
+        return instance
+
+    def _remember_image(self):
+        """記錄目前已儲存的圖片檔名、內容雜湊與縮圖檔名，作為下次 save 的比較基準"""
+        if self.get_deferred_fields() & {'image', 'contentHash', 'thumbnail150', 'thumbnail800'}:
+            # 不觸發延遲欄位的查詢；需要時由 _stored_image 查詢
+            self._storedImage = None
+            return
+        self._storedImage = {
+            'name': self.image.name or '',
+            'contentHash': self.contentHash,
+            'thumbs': [f.name for f in (self.thumbnail150, self.thumbnail800) if f and f.name],
+        }
+
+    def _stored_image(self):
+        stored = getattr(self, '_storedImage', None)
+        if stored is None:
+            # image 欄位載入時被延遲（only/defer）：向資料庫查詢一次
+            row = type(self).objects.filter(pk=self.pk).values('image', 'contentHash', 'thumbnail150', 'thumbnail800').first() or {}
+            stored = {
+                'name': row.get('image') or '',
+                'contentHash': row.get('contentHash') or '',
+                'thumbs': [n for n in (row.get('thumbnail150'), row.get('thumbnail800')) if n],
+            }
+        return stored
+
+    def detect_image_change(self, update_fields=None):
+        """
+        save 前呼叫：比對檔名與內容雜湊，判斷來源圖片是否真的改變。
+
+        - 上傳內容與目前檔案相同：沿用既有檔案，不寫入也不重新產生縮圖
+        - 內容不同：透過 attach_image_blob 寫入（或共用）新檔案
+        回傳被取代的舊圖片狀態；圖片未改變時回傳 None。未觸及 image 的儲存不做任何檔案 I/O。
+        """
+        if update_fields is not None and 'image' not in update_fields:
+            return None
+        if self.pk is None or self._state.adding:
+            attach_image_blob(self)
+            if self.image and not self.thumbnail150:
+                return {'name': '', 'contentHash': '', 'thumbs': []}
+            return None
+        if 'image' in self.get_deferred_fields():
+            return None
+
+        stored = self._stored_image()
+        fieldFile = self.image
+        if fieldFile and not fieldFile._committed:
+            if stored['name'] and hash_file(fieldFile.file) == stored['contentHash']:
+                self.image = stored['name']
+                return None
+            attach_image_blob(self)
+
+        if (self.image.name or '') == stored['name']:
+            return None
+        return stored
+
+    def render_image_change(self, previous):
+        """
+        save 後、交易外呼叫：圖片改變時解碼並寫入新的變體檔案（需要 pk 才能產生路徑）。
+
+        解碼與編碼期間不持有交易與 ImageBlob 的列鎖；回傳尚未寫入資料庫的變體列，
+        圖片未改變、已移除或產生失敗時回傳 None。
+        """
+        if previous is None or not self.image:
+            return None
+        return self.generate_thumbnails()
+
+    def apply_image_change(self, previous, ownerField, variants):
+        """
+        交易內呼叫：釋放被取代的檔案（只記錄檔名，排入交易提交後的批次清理）並以 variants 取代舊變體列。
+
+        回傳需要再以 update_fields 儲存的欄位；previous 為 None 時不做任何事。
+        """
+        if previous is None:
+            return None
+
+        storage = self.image.storage
+        names = list(previous['thumbs'])
+        if previous['name'] and release_image_blob(previous['name']):
+            names.append(previous['name'])
+        # 仍被其他列引用的檔案會在提交時略過
+        schedule_delete(storage, names, using=self._state.db)
+
+        fields = list(GENERATED_IMAGE_FIELDS)
+        if self.image:
+            if variants is not None:
+                store_image_variants(self, ownerField, variants)
+        else:
+            ImageVariant.objects.filter(**{ownerField: self}).delete()
+            self.thumbnail150 = self.thumbnail800 = ''
+            self.placeholder = self.dominantColor = ''
+            self.imageWidth = self.imageHeight = self.imageBytes = None
+            self.imageFormat = self.contentHash = ''
+            fields += ['imageWidth', 'imageHeight', 'imageBytes', 'imageFormat', 'contentHash']
+        return fields
+
+
+def attach_image_blob(instance, fieldName='image'):
+    """
+    在寫入尚未儲存的上傳檔案前，以內容雜湊查找既有檔案。
+
+    - 內容已存在：直接引用既有檔名並增加 refCount，不寫入新檔案
+    - 內容不存在：照常透過 upload_to 寫入，並建立 ImageBlob
+    回傳對應的 ImageBlob。
+    """
+    fieldFile = getattr(instance, fieldName)
+    if not fieldFile or fieldFile._committed:
+        return None
+
+    upload = fieldFile.file
+    contentHash = hash_file(upload)
+    storage = fieldFile.storage
+    if fieldName == 'image' and isinstance(instance, ImageMetadata):
+        instance.set_image_metadata(upload, contentHash)
+
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(contentHash=contentHash).first()
+        if blob is not None and storage.exists(blob.fileName):
+            ImageBlob.objects.filter(pk=blob.pk).update(refCount=models.F('refCount') + 1)
+            setattr(instance, fieldName, blob.fileName)
+            return blob
+
+        instance._pendingContentHash = contentHash
+        try:
+            fieldFile.save(os.path.basename(fieldFile.name), upload, save=False)
+        finally:
+            instance._pendingContentHash = None
+
+        if blob is not None:
+            # 實體檔案遺失：以新寫入的檔案取代
+            blob.fileName = fieldFile.name
+            blob.size = fieldFile.size
+            blob.refCount = models.F('refCount') + 1
+            blob.save(update_fields=['fileName', 'size', 'refCount'])
+            return blob
+
+        try:
+            with transaction.atomic():
+                return ImageBlob.objects.create(contentHash=contentHash, fileName=fieldFile.name, size=fieldFile.size, refCount=1)
+        except IntegrityError:
+            # 其他請求同時寫入相同內容：改用對方的檔案並移除剛寫入的副本
+            storage.delete(fieldFile.name)
+            blob = ImageBlob.objects.select_for_update().get(contentHash=contentHash)
+            ImageBlob.objects.filter(pk=blob.pk).update(refCount=models.F('refCount') + 1)
+            setattr(instance, fieldName, blob.fileName)
+            return blob
+
+
+def release_image_blob(fileName):
+    """
+    釋放一個對 fileName 的引用。
+
+    回傳 True 表示已無其他引用、可刪除實體檔案與其縮圖；
+    沒有對應 ImageBlob 的舊資料視為獨占檔案，同樣回傳 True。
+    """
+    if not fileName:
+        return False
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(fileName=fileName).first()
+        if blob is None:
+            return True
+        if blob.refCount > 1:
+            ImageBlob.objects.filter(pk=blob.pk).update(refCount=models.F('refCount') - 1)
+            return False
+        blob.delete()
+        return True
+
+
+def owner_files_to_delete(owner):
+    """
+    回傳刪除 owner（ProductImage 或 Category）後可移除的實體檔案名稱，並釋放其 ImageBlob 引用。
+
+    變體檔案（ImageVariant）由 image_variant_post_delete 排入批次清理。
+    """
+    if not owner.image or not owner.image.name:
+        return []
+    if not release_image_blob(owner.image.name):
+        return []
+    names = [owner.image.name]
+    for field in ('thumbnail150', 'thumbnail800'):
+        f = getattr(owner, field)
+        if f and f.name:
+            names.append(f.name)
+    return names
+
+
+class ProductImage(ImageMetadata):
     """
     商品圖片模型，用於管理商品的多張圖片。
     
     功能：
     - 支援多張圖片上傳（一對多關係）
-    - 自動產生縮圖（150x150 和 800x800）
+    - 自動產生縮圖變體（尺寸與格式由 settings.IMAGE_VARIANTS 設定，存於 ImageVariant）
     - 主圖標記（isPrimary）
     - 圖片排序（displayOrder）
     - 檔案驗證（類型、大小、尺寸）
+    - 圖片中繼資料（尺寸、大小、格式、內容雜湊，見 ImageMetadata）
     - 自動清理檔案（刪除時移除實體檔案）
     """
     product = models.ForeignKey(
@@ -245,6 +765,13 @@ class ProductImage(models.Model):
         verbose_name = '商品圖片'
         verbose_name_plural = '商品圖片'
         ordering = ['displayOrder', 'uploadedAt']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'isPrimary'],
+                condition=models.Q(isPrimary=True),
+                name='uniq_primary_image_per_product',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.product.productName} - 圖片 #{self.id}"
@@ -254,6 +781,19 @@ class ProductImage(models.Model):
         if not self.image:
             return
 
+        # 上傳階段已被 ImageUploadGuardHandler 拒絕的檔案
+        reason = upload_rejection(self.image)
+        if reason:
+            raise ValidationError({'image': reason})
+
+        # 既有檔案已記錄中繼資料時直接以欄位驗證，不重新開啟檔案
+        if self.image._committed and self.has_image_metadata:
+            if (self.imageBytes or 0) > 5242880:
+                raise ValidationError({'image': '圖片檔案大小不可超過 5MB'})
+            if self.imageWidth > 4000 or self.imageHeight > 4000:
+                raise ValidationError({'image': '圖片尺寸不可超過 4000x4000 像素'})
+            return
+
         # 檢查檔案大小（最大 5MB）
         if self.image.size > 5242880:
             raise ValidationError({'image': '圖片檔案大小不可超過 5MB'})
@@ -280,53 +820,90 @@ class ProductImage(models.Model):
             raise ValidationError({'image': f'無效的圖片檔案: {str(e)}'})
 
     def generate_thumbnails(self):
-        """產生 150x150 和 800x800 縮圖"""
+        """依 IMAGE_VARIANTS 設定產生所有縮圖變體檔案，回傳尚未儲存的變體列（失敗時回傳 None）"""
         if not self.image:
-            return
+            return None
 
         try:
             # validate first (may raise ValidationError)
             validate_image_file(self.image)
-
-            name = os.path.splitext(os.path.basename(self.image.name))[0]
-
-            fname150, content150 = make_square_thumbnail(self.image, size=150)
-            self.thumbnail150.save(f"{name}_150x150.jpg", content150, save=False)
-
-            fname800, content800 = make_preview_thumbnail(self.image, max_size=800)
-            self.thumbnail800.save(f"{name}_800x800.jpg", content800, save=False)
+            return render_image_variants(self, 'productImage')
         except Exception:
             # Don't let thumbnail errors block the save flow
-            pass
+            return None
+
+    @classmethod
+    def reorder(cls, product, orderedIds, primaryId=None):
+        """
+        重新排序商品的所有圖片，並可同時切換主圖。
+
+        orderedIds 必須恰好包含該商品所有圖片的 id，依序寫入 displayOrder 0..n-1。
+        所有列的 displayOrder（與主圖清除）以單一 UPDATE ... CASE 完成；
+        因部分唯一索引（每個商品最多一張主圖）在 PostgreSQL/SQLite 上會逐列檢查、
+        無法延遲，新主圖在同一交易中的第二個 UPDATE 才設為 True。
+        id 不符時拋出 ValueError。
+        """
+        orderedIds = [int(pk) for pk in orderedIds]
+        with transaction.atomic():
+            qs = cls.objects.filter(product=product)
+            currentIds = list(qs.select_for_update().values_list('pk', flat=True))
+            if len(set(orderedIds)) != len(orderedIds) or set(orderedIds) != set(currentIds):
+                raise ValueError('orderedIds must list every image of the product exactly once')
+            if primaryId is not None and int(primaryId) not in currentIds:
+                raise ValueError('primaryId is not an image of the product')
+
+            updates = {}
+            if orderedIds:
+                updates['displayOrder'] = models.Case(
+                    *[models.When(pk=pk, then=models.Value(i)) for i, pk in enumerate(orderedIds)],
+                    default=models.F('displayOrder'),
+                    output_field=models.PositiveIntegerField(),
+                )
+            if primaryId is not None:
+                updates['isPrimary'] = models.Case(
+                    models.When(pk=primaryId, then=models.F('isPrimary')),
+                    default=models.Value(False),
+                    output_field=models.BooleanField(),
+                )
+            if updates:
+                qs.update(**updates)
+            if primaryId is not None:
+                cls.objects.filter(pk=primaryId, isPrimary=False).update(isPrimary=True)
 
     def set_as_primary(self):
-        """設定此圖片為主圖，並將同商品的其他圖片主圖狀態取消"""
+        """設定此圖片為主圖，並將同商品的其他圖片主圖狀態取消（同一交易內完成，不重新處理圖片）"""
         if not self.isPrimary:
-            # 取消同商品其他圖片的主圖狀態
-            ProductImage.objects.filter(product=self.product, isPrimary=True).update(isPrimary=False)
+            with transaction.atomic():
+                # 取消同商品其他圖片的主圖狀態
+                ProductImage.objects.filter(product_id=self.product_id, isPrimary=True).update(isPrimary=False)
+                ProductImage.objects.filter(pk=self.pk).update(isPrimary=True)
             self.isPrimary = True
-            self.save()
 
     def save(self, *args, **kwargs):
         """儲存前執行驗證並產生縮圖"""
-        # 如果是新圖片且沒有縮圖，產生縮圖
-        is_new = self.pk is None
-        
-        # 檢查主圖邏輯
-        if self.isPrimary:
-            # 如果設定為主圖，取消同商品其他圖片的主圖狀態
-            ProductImage.objects.filter(product=self.product, isPrimary=True).exclude(pk=self.pk).update(isPrimary=False)
-        
-        super().save(*args, **kwargs)
-        
-        # 在儲存後產生縮圖（需要 pk 存在才能產生路徑）
-        if is_new and self.image and not self.thumbnail150:
-            self.generate_thumbnails()
-            # 再次儲存以更新縮圖欄位（使用 update_fields 避免遞迴）
-            super().save(update_fields=['thumbnail150', 'thumbnail800'])
+        # 只有來源圖片內容改變時才寫入檔案並重新產生縮圖（相同內容共用既有檔案）
+        previous = self.detect_image_change(kwargs.get('update_fields'))
+
+        with transaction.atomic():
+            # 檢查主圖邏輯
+            if self.isPrimary:
+                # 如果設定為主圖，取消同商品其他圖片的主圖狀態（部分唯一索引保證同時只有一張主圖）
+                ProductImage.objects.filter(product=self.product, isPrimary=True).exclude(pk=self.pk).update(isPrimary=False)
+            super().save(*args, **kwargs)
+
+        # 在儲存後、交易外產生縮圖（需要 pk 存在才能產生路徑）
+        variants = self.render_image_change(previous)
+        # 變體列、引用計數與縮圖欄位在同一交易中寫入：舊檔案的清理排在提交之後，
+        # 此時本列已指向新縮圖，引用檢查不會略過舊縮圖（未開啟交易時也是如此）
+        with transaction.atomic():
+            fields = self.apply_image_change(previous, 'productImage', variants)
+            if fields:
+                # 再次儲存以更新縮圖欄位（使用 update_fields 避免遞迴）
+                super().save(update_fields=fields)
+        self._remember_image()
 
     def delete(self, *args, **kwargs):
-        """刪除時移除實體檔案"""
+        """刪除時移除實體檔案（實際移除由 product_image_pre_delete 依引用狀態處理）"""
         # 先關閉檔案
         if self.image:
             self.image.close()
@@ -334,132 +911,26 @@ class ProductImage(models.Model):
             self.thumbnail150.close()
         if self.thumbnail800:
             self.thumbnail800.close()
-        
-        # 記錄檔案路徑
-        image_path = self.image.path if self.image else None
-        thumb150_path = self.thumbnail150.path if self.thumbnail150 else None
-        thumb800_path = self.thumbnail800.path if self.thumbnail800 else None
-        
-        # 先執行資料庫刪除
+
         super().delete(*args, **kwargs)
-        
-        # 刪除實體檔案
-        try:
-            if image_path and os.path.isfile(image_path):
-                os.remove(image_path)
-        except Exception:
-            pass
-        
-        try:
-            if thumb150_path and os.path.isfile(thumb150_path):
-                os.remove(thumb150_path)
-        except Exception:
-            pass
-        
-        try:
-            if thumb800_path and os.path.isfile(thumb800_path):
-                os.remove(thumb800_path)
-        except Exception:
-            pass
 
 
 @receiver(pre_delete, sender=ProductImage)
 def product_image_pre_delete(sender, instance, **kwargs):
     """
-    Signal：在刪除 ProductImage 之前刪除實體檔案
+    Signal：刪除 ProductImage 時，將不再被引用的實體檔案排入交易提交後的批次清理
     """
-    # 收集所有需要刪除的檔案路徑
-    files_to_delete = []
-    
-    try:
-        if instance.image and instance.image.name:
-            files_to_delete.append(instance.image.path)
-    except Exception:
-        pass
-    
-    try:
-        if instance.thumbnail150 and instance.thumbnail150.name:
-            files_to_delete.append(instance.thumbnail150.path)
-    except Exception:
-        pass
-    
-    try:
-        if instance.thumbnail800 and instance.thumbnail800.name:
-            files_to_delete.append(instance.thumbnail800.path)
-    except Exception:
-        pass
-    
-    # 強制關閉所有檔案（包括 Django 內部的 file descriptor）
-    try:
-        if instance.image:
-            if hasattr(instance.image, 'file') and instance.image.file:
-                instance.image.file.close()
-            instance.image.close()
-    except Exception:
-        pass
-    
-    try:
-        if instance.thumbnail150:
-            if hasattr(instance.thumbnail150, 'file') and instance.thumbnail150.file:
-                instance.thumbnail150.file.close()
-            instance.thumbnail150.close()
-    except Exception:
-        pass
-    
-    try:
-        if instance.thumbnail800:
-            if hasattr(instance.thumbnail800, 'file') and instance.thumbnail800.file:
-                instance.thumbnail800.file.close()
-            instance.thumbnail800.close()
-    except Exception:
-        pass
-    
-    # 強制垃圾回收
-    import gc
-    gc.collect()
-    
-    # 記錄需要清理的目錄
-    dirs_to_clean = set()
-    
-    # 刪除檔案
-    for file_path in files_to_delete:
-        try:
-            if os.path.isfile(file_path):
-                # 記錄檔案所在目錄
-                dirs_to_clean.add(os.path.dirname(file_path))
-                os.remove(file_path)
-        except PermissionError:
-            # Windows 上檔案被鎖定，嘗試延遲刪除
-            import time
-            time.sleep(0.1)
-            try:
-                if os.path.isfile(file_path):
-                    dirs_to_clean.add(os.path.dirname(file_path))
-                    os.remove(file_path)
-            except Exception:
-                pass
-        except Exception:
-            pass
-    
-    # 清理空目錄（從最深層開始）
-    for dir_path in sorted(dirs_to_clean, key=lambda x: -len(x)):
-        try:
-            # 只刪除空目錄
-            if os.path.isdir(dir_path) and not os.listdir(dir_path):
-                os.rmdir(dir_path)
-                # 嘗試刪除父目錄（商品目錄）
-                parent_dir = os.path.dirname(dir_path)
-                if os.path.isdir(parent_dir) and not os.listdir(parent_dir):
-                    os.rmdir(parent_dir)
-        except Exception:
-            pass
+    for f in (instance.image, instance.thumbnail150, instance.thumbnail800):
+        f.close()
+    schedule_delete(instance.image.storage, owner_files_to_delete(instance), using=kwargs.get('using'))
 
 
-class Category(MPTTModel):
+class Category(MPTTModel, ImageMetadata):
     """商品分類模型（階層式）
     - categoryName: 分類名稱
     - parent: 自我參照父分類
     - image, thumbnail150, thumbnail800: 圖片與縮圖
+    - imageWidth, imageHeight, imageBytes, imageFormat, contentHash: 圖片中繼資料
     - displayOrder: 同層級排序
     - description, isActive, createdAt, updatedAt
     """
@@ -500,58 +971,280 @@ class Category(MPTTModel):
             if self.products.exists() and self.children.exists():
                 raise ValidationError('此分類已有商品，無法同時擁有子分類')
 
+        reason = upload_rejection(self.image) if self.image else None
+        if reason:
+            raise ValidationError({'image': reason})
+
     def generate_thumbnails(self):
+        """產生縮圖變體檔案，回傳尚未儲存的變體列（失敗時回傳 None）"""
         if not self.image:
-            return
+            return None
 
         try:
             validate_image_file(self.image)
-            name = os.path.splitext(os.path.basename(self.image.name))[0]
-            fname150, content150 = make_square_thumbnail(self.image, size=150)
-            self.thumbnail150.save(f"{name}_150x150.jpg", content150, save=False)
-            fname800, content800 = make_preview_thumbnail(self.image, max_size=800)
-            self.thumbnail800.save(f"{name}_800x800.jpg", content800, save=False)
+            return render_image_variants(self, 'category')
         except Exception:
-            # swallow errors to avoid save failures
-            pass
+            # 縮圖失敗不阻斷儲存
+            return None
 
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
+        # 相同內容共用同一個檔案；只有圖片內容改變時才重新產生縮圖
+        previous = self.detect_image_change(kwargs.get('update_fields'))
         super().save(*args, **kwargs)
-        # ensure thumbnails created after initial save (so path available)
-        if is_new and self.image and (not self.thumbnail150):
-            self.generate_thumbnails()
-            super().save(update_fields=['thumbnail150', 'thumbnail800'])
+        # 儲存後才有 id 可產生路徑；解碼與編碼在交易外進行
+        variants = self.render_image_change(previous)
+        # 資料列在同一交易中寫入，舊檔案於提交後（本列已指向新縮圖）才清理
+        with transaction.atomic():
+            fields = self.apply_image_change(previous, 'category', variants)
+            if fields:
+                super().save(update_fields=fields)
+        self._remember_image()
 
     def delete(self, *args, **kwargs):
-        # close files then delete
-        try:
-            if self.image:
-                self.image.close()
-        except Exception:
-            pass
-        try:
-            if self.thumbnail150:
-                self.thumbnail150.close()
-        except Exception:
-            pass
-        try:
-            if self.thumbnail800:
-                self.thumbnail800.close()
-        except Exception:
-            pass
-
-        # record paths
-        image_path = self.image.path if self.image and hasattr(self.image, 'path') else None
-        t150 = self.thumbnail150.path if self.thumbnail150 and hasattr(self.thumbnail150, 'path') else None
-        t800 = self.thumbnail800.path if self.thumbnail800 and hasattr(self.thumbnail800, 'path') else None
+        # 先關閉檔案再刪除；檔案的移除由 category_pre_delete 處理
+        for f in (self.image, self.thumbnail150, self.thumbnail800):
+            try:
+                if f:
+                    f.close()
+            except Exception:
+                pass
 
         super().delete(*args, **kwargs)
 
-        # remove files
-        for p in (image_path, t150, t800):
-            try:
-                if p and os.path.isfile(p):
-                    os.remove(p)
-            except Exception:
-                pass
\ No newline at end of file
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, instance, **kwargs):
+    """商品或分類變更後讓快取的商品 / 分類 sitemap 失效（提交前後各一次，理由同 blog_post_changed）"""
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version, using=kwargs.get('using'))
+
+
+@receiver(pre_delete, sender=Category)
+def category_pre_delete(sender, instance, **kwargs):
+    """Signal：刪除分類（含級聯刪除的子分類）時，將不再被引用的圖片檔案排入批次清理"""
+    schedule_delete(instance.image.storage, owner_files_to_delete(instance), using=kwargs.get('using'))
+
+
+def image_variant_upload_path(instance, filename):
+    """產生縮圖變體的上傳路徑，與舊縮圖放在同一個 thumbs 目錄。
+    格式: products/<product_id>/thumbs/<uuid>_<filename> 或 categories/<category_id>/thumbs/<uuid>_<filename>
+    """
+    unique_filename = f"{uuid.uuid4().hex[:8]}_{filename}"
+    if instance.productImage_id:
+        return f"products/{instance.productImage.product_id}/thumbs/{unique_filename}"
+    cat_id = instance.category_id or 'tmp'
+    return f"categories/{cat_id}/thumbs/{unique_filename}"
+
+
+class ImageVariant(models.Model):
+    """
+    圖片變體（縮圖）資料表。
+
+    每一列代表一張來源圖片（ProductImage 或 Category）在某個具名尺寸
+    （settings.IMAGE_VARIANTS）與某個輸出格式下的檔案。
+    """
+    productImage = models.ForeignKey(ProductImage, null=True, blank=True, on_delete=models.CASCADE, related_name='variants')
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.CASCADE, related_name='variants')
+    blob = models.ForeignKey(ImageBlob, null=True, blank=True, on_delete=models.SET_NULL, related_name='variants')
+    variantName = models.CharField(max_length=50)
+    format = models.CharField(max_length=10)
+    file = models.ImageField(upload_to=image_variant_upload_path)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    fileSize = models.PositiveBigIntegerField(default=0)
+    contentHash = models.CharField(max_length=64, blank=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = '圖片變體'
+        verbose_name_plural = '圖片變體'
+        ordering = ['variantName', 'width']
+        constraints = [
+            models.UniqueConstraint(fields=['productImage', 'variantName', 'format'], name='uniq_product_image_variant'),
+            models.UniqueConstraint(fields=['category', 'variantName', 'format'], name='uniq_category_variant'),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(productImage__isnull=False, category__isnull=True)
+                    | models.Q(productImage__isnull=True, category__isnull=False)
+                ),
+                name='image_variant_single_owner',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.variantName} ({self.format})"
+
+
+# 舊版固定縮圖欄位對應的變體名稱；這些欄位直接指向變體的 fallback 格式檔案，不另存一份
+LEGACY_THUMBNAIL_FIELDS = {
+    'thumb150': 'thumbnail150',
+    'preview800': 'thumbnail800',
+}
+
+# render_image_variants / store_image_variants 會更新、呼叫端需以 update_fields 儲存的欄位
+GENERATED_IMAGE_FIELDS = ['thumbnail150', 'thumbnail800', 'placeholder', 'dominantColor']
+
+
+def _placeholder_source(owner):
+    """回傳共用同一檔案的其他圖片已算好的 (placeholder, dominantColor)"""
+    for model in (ProductImage, Category):
+        qs = model.objects.filter(image=owner.image.name).exclude(placeholder='')
+        if isinstance(owner, model) and owner.pk:
+            qs = qs.exclude(pk=owner.pk)
+        found = qs.values_list('placeholder', 'dominantColor').first()
+        if found:
+            return found
+    return None
+
+
+def render_image_variants(owner, ownerField):
+    """
+    為 owner（ProductImage 或 Category）產生所有 eager 變體的檔案，回傳尚未儲存的 ImageVariant 列；
+    非 eager 變體改由 /media/thumb/ 於第一次請求時產生（見 thumb_cache）。
+
+    來源圖片只解碼一次，所有尺寸與格式都由同一份解碼結果產生；
+    若相同內容（ImageBlob）已有其他圖片產生過變體，直接共用那些檔案而不重新產生。
+    同一次解碼也產生預覽佔位圖與主色（共用變體時沿用其他圖片已算好的值）。
+    只讀取資料庫、不寫入，應在交易外呼叫；之後以 store_image_variants 寫入變體列。
+    """
+    specs = [spec for spec in get_variant_specs().values() if spec.eager]
+    blob = ImageBlob.objects.filter(fileName=owner.image.name).first()
+
+    wanted = {(spec.name, fmt) for spec in specs for fmt in spec.formats}
+    shared = {}
+    if blob is not None:
+        for v in ImageVariant.objects.filter(blob=blob).order_by('pk'):
+            shared.setdefault((v.variantName, v.format), v)
+
+    variants = []
+    if blob is not None and wanted <= set(shared):
+        owner.placeholder, owner.dominantColor = _placeholder_source(owner) or compute_placeholder(owner.image)
+        for key in sorted(wanted):
+            source = shared[key]
+            variant = ImageVariant(
+                blob=blob, variantName=source.variantName, format=source.format,
+                file=source.file.name, width=source.width, height=source.height,
+                fileSize=source.fileSize, contentHash=source.contentHash,
+            )
+            setattr(variant, ownerField, owner)
+            variants.append(variant)
+    else:
+        baseName = os.path.splitext(os.path.basename(owner.image.name))[0]
+        rendered, (owner.placeholder, owner.dominantColor) = render_variants_and_placeholder(owner.image, specs)
+        for spec, fmt, content, width, height in rendered:
+            variant = ImageVariant(
+                blob=blob, variantName=spec.name, format=fmt, width=width, height=height,
+                fileSize=content.size, contentHash=hash_file(content),
+            )
+            setattr(variant, ownerField, owner)
+            variant.file.save(f"{baseName}_{spec.name}.{FORMAT_EXTENSIONS[fmt]}", content, save=False)
+            variants.append(variant)
+    return variants
+
+
+def store_image_variants(owner, ownerField, variants):
+    """
+    以 render_image_variants 產生的 variants 取代 owner 的舊變體列，並回填 thumbnail150 / thumbnail800 欄位。
+    舊變體的檔案排入交易提交後的批次清理；呼叫端需在同一交易中以 update_fields=GENERATED_IMAGE_FIELDS 儲存。
+    """
+    ImageVariant.objects.filter(**{ownerField: owner}).delete()
+
+    fallbacks = {spec.name: spec.fallback_format for spec in get_variant_specs().values() if spec.eager}
+    for variant in variants:
+        legacyField = LEGACY_THUMBNAIL_FIELDS.get(variant.variantName)
+        if legacyField and variant.format == fallbacks.get(variant.variantName):
+            setattr(owner, legacyField, variant.file.name)
+
+    ImageVariant.objects.bulk_create(variants)
+    return variants
+
+
+@receiver(post_delete, sender=ImageVariant)
+def image_variant_post_delete(sender, instance, **kwargs):
+    """Signal：刪除變體列後將檔案排入批次清理（仍被其他列引用的檔案會在提交時略過）"""
+    if instance.file and instance.file.name:
+        schedule_delete(instance.file.storage, [instance.file.name], using=kwargs.get('using'))
+
+
+def clone_product(product, productName=None):
+    """
+    複製商品、分類指派與所有商品圖片（含縮圖變體），不重新上傳、不重新產生縮圖。
+
+    - 有 ImageBlob 的圖片直接引用同一個檔案並增加 refCount，不佔額外空間
+    - 沒有 ImageBlob 的舊資料連同縮圖與變體檔案在新商品目錄下建立副本（本機為硬連結，物件儲存為串流複製），
+      之後刪除或替換原圖不影響複本
+    - 有 ImageBlob 的縮圖變體列沿用相同檔案（刪除時的批次清理會略過仍被引用的檔案）
+    所有資料列皆以 bulk_create 寫入。回傳新商品。
+    """
+    with transaction.atomic():
+        clone = Product.objects.create(
+            productName=productName or f'{product.productName} (複本)',
+            description=product.description,
+            price=product.price,
+            stockQuantity=product.stockQuantity,
+            isActive=product.isActive,
+        )
+
+        Through = Product.categories.through
+        Through.objects.bulk_create([
+            Through(product_id=clone.pk, category_id=categoryId)
+            for categoryId in product.categories.values_list('pk', flat=True)
+        ])
+
+        sources = list(product.images.prefetch_related('variants').order_by('pk'))
+        blobs = dict(ImageBlob.objects.filter(fileName__in=[src.image.name for src in sources]).values_list('fileName', 'pk'))
+        skipped = {'id', 'product', 'uploadedAt'}
+        thumbsDir = f'products/{clone.pk}/thumbs'
+        legacyCopies = {}
+
+        def copy_legacy(storage, name, targetName):
+            # 同一個來源檔案（例如 thumbnail150 與其 JPEG 變體）只複製一次
+            if name and name not in legacyCopies:
+                try:
+                    legacyCopies[name] = copy_file(storage, name, targetName)
+                except OSError:
+                    # 來源檔案遺失：沿用原檔名
+                    legacyCopies[name] = name
+            return legacyCopies.get(name, name)
+
+        copies = []
+        blobRefs = {}
+        for src in sources:
+            values = {}
+            for field in ProductImage._meta.concrete_fields:
+                if field.name in skipped:
+                    continue
+                value = getattr(src, field.attname)
+                values[field.attname] = value.name if isinstance(field, models.FileField) else value
+            copy = ProductImage(product=clone, **values)
+            name = src.image.name
+            if name in blobs:
+                blobRefs[blobs[name]] = blobRefs.get(blobs[name], 0) + 1
+            elif name:
+                storage = src.image.storage
+                copy.image = copy_legacy(storage, name, product_image_upload_path(copy, os.path.basename(name)))
+                for fieldName in ('thumbnail150', 'thumbnail800'):
+                    thumb = getattr(src, fieldName).name
+                    setattr(copy, fieldName, copy_legacy(storage, thumb, f'{thumbsDir}/{os.path.basename(thumb or "")}'))
+            copies.append(copy)
+
+        ProductImage.objects.bulk_create(copies)
+        for blobId, count in blobRefs.items():
+            ImageBlob.objects.filter(pk=blobId).update(refCount=models.F('refCount') + count)
+
+        variants = []
+        for src, copy in zip(sources, copies):
+            legacy = src.image.name and src.image.name not in blobs
+            for v in src.variants.all():
+                fileName = v.file.name
+                if legacy:
+                    fileName = copy_legacy(v.file.storage, fileName, f'{thumbsDir}/{os.path.basename(fileName)}')
+                variants.append(ImageVariant(
+                    productImage=copy, blob_id=v.blob_id, variantName=v.variantName, format=v.format,
+                    file=fileName, width=v.width, height=v.height, fileSize=v.fileSize, contentHash=v.contentHash,
+                ))
+        ImageVariant.objects.bulk_create(variants)
+    return clone
@@ -0,0 +1,100 @@
+"""
+訂閱與 sitemap 的快取與串流輸出
+
+文件以 StreamingHttpResponse 分段輸出，同時每段各自寫入快取（不超過 memcached 單筆 1 MB 上限），
+最後寫入段數標記完成；之後的請求直接由快取串流。快取鍵與 ETag 帶有版本，版本遞增後舊文件自然失效。
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+import itertools
+import time
+
+from .blog_cache import blog_cache
+
+
+CATALOG_VERSION_KEY = 'syndication:catalog:version'
+DOC_KEY_PREFIX = 'syndication:doc'
+DEFAULT_SITEMAP_MAX_URLS = 50000
+DEFAULT_CACHE_TIMEOUT = 3600
+DEFAULT_MAX_AGE = 900
+# rows rendered (and cached) per chunk
+CHUNK_ROWS = 2000
+
+
+def sitemap_max_urls():
+    return getattr(settings, 'SITEMAP_MAX_URLS', DEFAULT_SITEMAP_MAX_URLS)
+
+
+def cache_timeout():
+    return getattr(settings, 'SYNDICATION_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT)
+
+
+def catalog_version():
+    """Current version of the product/category sitemaps."""
+    cache = blog_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog sitemap."""
+    cache = blog_cache()
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def chunked(rows, render, size=CHUNK_ROWS):
+    """Render `rows` (an iterator) into one string per `size` rows."""
+    for batch in itertools.batched(rows, size):
+        yield ''.join(render(row) for row in batch)
+
+
+def cached_chunks(key, generate):
+    """Yield the chunks of the document cached under `key`, generating it on a miss.
+
+    `generate()` must return an iterator of str chunks and produce the same
+    chunks for the same key. If a chunk is evicted while a cached document is
+    streaming, the document is regenerated and its first chunks are skipped.
+    """
+    cache = blog_cache()
+    count = cache.get(key)
+    if count is not None:
+        for index in range(count):
+            chunk = cache.get(f'{key}:{index}')
+            if chunk is None:
+                yield from itertools.islice(_store_chunks(key, generate()), index, None)
+                return
+            yield chunk
+        return
+    yield from _store_chunks(key, generate())
+
+
+def _store_chunks(key, chunks):
+    cache, timeout = blog_cache(), cache_timeout()
+    count = 0
+    for chunk in chunks:
+        cache.set(f'{key}:{count}', chunk, timeout)
+        count += 1
+        yield chunk
+    # written last: a document that failed halfway is never served from the cache
+    cache.set(key, count, timeout)
+
+
+def document_response(request, key, etag, contentType, generate):
+    """Stream a cached document, answering conditional requests from `etag` alone."""
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = StreamingHttpResponse(
+            (chunk.encode('utf-8') for chunk in cached_chunks(key, generate)), content_type=contentType,
+        )
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'SYNDICATION_MAX_AGE', DEFAULT_MAX_AGE))
+    return response
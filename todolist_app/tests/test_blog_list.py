@@ -0,0 +1,76 @@
+"""
+文章列表 keyset 分頁與片段快取測試
+"""
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from todolist_app.models import BlogPost
+
+
+@override_settings(BLOG_LIST_PAGE_SIZE=20)
+class BlogListPaginationTest(TestCase):
+    """blog_list 分頁"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='lister', password='pw')
+        base = timezone.now() - timedelta(days=1)
+        posts = []
+        for i in range(45):
+            # 每 3 篇共用同一個發佈時間，驗證 id 作為次要排序鍵
+            posts.append(BlogPost(
+                author=self.author, title=f'Post {i}', slug=f'post-{i}', markdownContent='x' * 1000,
+                status=BlogPost.STATUS_PUBLISHED, publishedAt=base + timedelta(minutes=i // 3),
+            ))
+        posts.append(BlogPost(author=self.author, title='Draft', slug='draft', markdownContent='x'))
+        self.posts = BlogPost.objects.bulk_create(posts)
+
+    def fetch_all_pages(self):
+        slugs, url, pages = [], reverse('blog_list'), 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page']
+            slugs += [p.slug for p in page.posts]
+            pages += 1
+            url = f"{reverse('blog_list')}?cursor={page.nextCursor}" if page.nextCursor else None
+        return slugs, pages
+
+    def test_keyset_pages_cover_every_post_once(self):
+        slugs, pages = self.fetch_all_pages()
+        self.assertEqual(pages, 3)
+        expected = [p.slug for p in sorted(self.posts[:45], key=lambda p: (p.publishedAt, p.pk), reverse=True)]
+        self.assertEqual(slugs, expected)
+
+    def test_list_defers_heavy_columns_and_uses_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('blog_list'))
+        post = response.context['page'].posts[0]
+        self.assertTrue({'markdownContent', 'htmlContent', 'tocHtml', 'tocJson'} <= post.get_deferred_fields())
+        self.assertContains(response, 'Post 44')
+        self.assertNotContains(response, 'Draft')
+
+    def test_fragment_cache_hit_skips_query_and_is_invalidated_on_save(self):
+        self.client.get(reverse('blog_list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('blog_list'))
+        self.assertContains(response, 'Post 44')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(author=self.author, title='Brand New', markdownContent='新文章', status=BlogPost.STATUS_PUBLISHED)
+        self.assertContains(self.client.get(reverse('blog_list')), 'Brand New')
+
+    def test_signed_in_fragment_cache_hit_skips_list_query(self):
+        self.client.force_login(self.author)
+        self.client.get(reverse('blog_list'))
+        # 只剩 session 與使用者的查詢
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('blog_list'))
+        self.assertContains(response, 'Post 44')
+        self.assertNotIn('ETag', response)
+
+    def test_invalid_cursor_returns_404(self):
+        self.assertEqual(self.client.get(reverse('blog_list'), {'cursor': 'abc'}).status_code, 404)
@@ -0,0 +1,95 @@
+"""
+部落格頁面整頁快取、失效與條件請求（ETag / Last-Modified）測試
+"""
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from todolist_app.models import BlogPost
+
+
+class BlogPageCacheTest(TestCase):
+    """匿名訪客的 blog_detail / blog_list 快取"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='cacher', password='pw')
+        self.post = BlogPost.objects.create(
+            author=self.author, title='Cached Post', markdownContent='第一版內容', status=BlogPost.STATUS_PUBLISHED,
+        )
+        self.url = reverse('blog_detail', kwargs={'slug': self.post.slug})
+
+    def test_detail_is_cached_with_validators(self):
+        first = self.client.get(self.url)
+        self.assertContains(first, '第一版內容')
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        self.assertIn('Cookie', first['Vary'])
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        with self.assertNumQueries(0):
+            notModified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(notModified.status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+    def test_save_and_delete_invalidate_detail_page(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.post.markdownContent = '第二版內容'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '第二版內容')
+        self.assertNotEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_slug_change_invalidates_old_url(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        # 以查詢取得的 instance 與剛建立的 instance 都能得知原本的 slug
+        for post, newSlug in ((BlogPost.objects.get(pk=self.post.pk), 'renamed-post'), (self.post, 'renamed-again')):
+            oldUrl = reverse('blog_detail', kwargs={'slug': post.slug})
+            self.assertEqual(self.client.get(oldUrl).status_code, 200)
+            post.slug = newSlug
+            with self.captureOnCommitCallbacks(execute=True):
+                post.save()
+            self.assertEqual(self.client.get(oldUrl).status_code, 404)
+            self.assertContains(self.client.get(reverse('blog_detail', kwargs={'slug': newSlug})), '第一版內容')
+            self.post.refresh_from_db()
+
+    def test_unpublished_post_is_not_served_from_cache(self):
+        self.client.get(self.url)
+        self.post.status = BlogPost.STATUS_DRAFT
+        self.post.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_signed_in_users_are_not_served_cached_pages(self):
+        self.client.get(self.url)
+        self.client.force_login(self.author)
+        response = self.client.get(self.url)
+        self.assertContains(response, '登出 (cacher)')
+        self.assertNotIn('ETag', response)
+
+        # 登入使用者的頁面不會寫入共用快取
+        self.client.logout()
+        self.assertNotContains(self.client.get(self.url), '登出')
+
+    def test_list_is_cached_and_revalidated(self):
+        listUrl = reverse('blog_list')
+        first = self.client.get(listUrl)
+        self.assertContains(first, 'Cached Post')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(listUrl, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        BlogPost.objects.create(author=self.author, title='Another Post', markdownContent='x', status=BlogPost.STATUS_PUBLISHED)
+        response = self.client.get(listUrl, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Another Post')
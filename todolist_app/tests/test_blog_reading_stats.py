@@ -0,0 +1,114 @@
+"""
+渲染時預先計算的目錄、字數、閱讀時間與摘錄測試
+"""
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from todolist_app.models import BlogPost
+from todolist_app.utils import markdown_renderer
+from todolist_app.utils.markdown_renderer import make_excerpt, render_document, text_stats
+
+
+ARTICLE = """# 效能 & 快取
+
+前言段落，說明 **快取** 的用途。
+
+## Setup <em>steps</em>
+
+Install the package and run the server.
+
+## 效能 & 快取
+"""
+
+
+class RenderDocumentTest(SimpleTestCase):
+    """render_document 的衍生資料"""
+
+    def test_toc_and_heading_ids(self):
+        document = render_document(ARTICLE)
+        self.assertEqual(document['toc'], [{
+            'level': 1, 'id': 'toc-效能-快取', 'name': '效能 & 快取', 'children': [
+                {'level': 2, 'id': 'toc-setup-steps', 'name': 'Setup steps', 'children': []},
+                {'level': 2, 'id': 'toc-效能-快取_1', 'name': '效能 & 快取', 'children': []},
+            ],
+        }])
+        self.assertIn('<a href="#toc-效能-快取">效能 &amp; 快取</a>', document['tocHtml'])
+        # 內文標題保留 id，目錄連結才有對應的錨點
+        self.assertIn('<h2 id="toc-setup-steps">', document['html'])
+        self.assertEqual(render_document('沒有標題')['tocHtml'], '')
+
+    def test_only_generated_heading_ids_are_kept(self):
+        document = render_document('<h2 id="csrftoken">Raw</h2>\n\n<h3 id="toc-own" class="x">Own</h3>\n\n## Clash {#csrftoken}')
+        self.assertNotIn('csrftoken', document['html'])
+        self.assertEqual(document['toc'][0]['id'], '')
+        self.assertIn('<li>Clash</li>', document['tocHtml'])
+        # 前綴命名空間內的 id 不會與頁面上的元素衝突，可以保留
+        self.assertIn('<h3 id="toc-own">', document['html'])
+
+    def test_stats_and_excerpt(self):
+        document = render_document(ARTICLE)
+        # 中文 19 字（含標題）加上 9 個英文單字
+        self.assertEqual(document['wordCount'], 28)
+        self.assertEqual(document['readingMinutes'], 1)
+        self.assertTrue(document['excerpt'].startswith('前言段落，說明 快取 的用途。'))
+        self.assertNotIn('Setup', document['excerpt'].split('Install')[0])
+
+    def test_text_stats(self):
+        self.assertEqual(text_stats(''), (0, 0))
+        self.assertEqual(text_stats('中文字 and two words'), (6, 1))
+        self.assertEqual(text_stats('word ' * 450), (450, 3))
+        self.assertEqual(text_stats('字' * 1000), (1000, 3))
+
+    def test_excerpt_cuts_on_word_boundary(self):
+        self.assertEqual(make_excerpt('short text'), 'short text')
+        self.assertEqual(make_excerpt('alpha beta gamma delta', 13), 'alpha beta…')
+        self.assertEqual(make_excerpt('一二三四五六七八', 4), '一二三四…')
+
+
+class BlogPostReadingStatsTest(TestCase):
+    """文章儲存時保存衍生資料，頁面直接顯示"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='reader', password='pw')
+        self.post = BlogPost.objects.create(
+            author=self.author, title='統計文章', markdownContent=ARTICLE, status=BlogPost.STATUS_PUBLISHED,
+        )
+
+    def test_fields_are_stored_on_save(self):
+        stored = BlogPost.objects.get(pk=self.post.pk)
+        document = render_document(ARTICLE)
+        self.assertEqual(stored.tocJson, document['toc'])
+        self.assertEqual(stored.tocHtml, document['tocHtml'])
+        self.assertEqual(stored.wordCount, document['wordCount'])
+        self.assertEqual(stored.readingMinutes, 1)
+        self.assertEqual(stored.excerpt, document['excerpt'])
+
+        stored.markdownContent = '只剩一句。'
+        stored.save(update_fields=['markdownContent'])
+        stored = BlogPost.objects.get(pk=self.post.pk)
+        self.assertEqual((stored.tocJson, stored.excerpt), ([], '只剩一句。'))
+
+    def test_pages_show_stats_without_rendering(self):
+        with mock.patch.object(markdown_renderer, 'render_document') as renderMock:
+            detail = self.client.get(reverse('blog_detail', kwargs={'slug': self.post.slug}))
+            listing = self.client.get(reverse('blog_list'))
+        renderMock.assert_not_called()
+        self.assertContains(detail, '<nav class="toc">')
+        self.assertContains(detail, f'{self.post.wordCount} 字，約 1 分鐘')
+        self.assertContains(listing, '約 1 分鐘')
+        self.assertContains(listing, '前言段落')
+
+    def test_rerender_fills_fields_for_old_posts(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(
+            rendererVersion='3', tocHtml='', tocJson=[], wordCount=0, readingMinutes=0, excerpt='',
+        )
+        call_command('rerender_posts', '--workers', '1', stdout=StringIO())
+        stored = BlogPost.objects.get(pk=self.post.pk)
+        self.assertEqual(stored.readingMinutes, 1)
+        self.assertEqual(stored.tocJson[0]['id'], 'toc-效能-快取')
+        self.assertTrue(stored.excerpt)
@@ -0,0 +1,66 @@
+"""
+BlogPost Markdown 渲染快取測試
+
+- 內容未變（狀態切換、摘要修改）時不重新渲染
+- 相同內容的不同文章只渲染一次
+- 渲染器版本改變時重新渲染
+"""
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from todolist_app.models import BlogPost
+from todolist_app.utils import markdown_renderer
+
+
+class BlogRenderCacheTest(TestCase):
+    """內容雜湊與共用渲染快取"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='writer', password='pw')
+        patcher = mock.patch.object(markdown_renderer, 'render_document', wraps=markdown_renderer.render_document)
+        self.renderMock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, content='# 標題\n\n內容', **kwargs):
+        return BlogPost.objects.create(author=self.author, title=kwargs.pop('title', '快取文章'), markdownContent=content, **kwargs)
+
+    def test_unchanged_content_is_not_rerendered(self):
+        post = self.create_post()
+        self.assertEqual(self.renderMock.call_count, 1)
+        self.assertEqual(post.contentHash, markdown_renderer.markdown_content_hash(post.markdownContent))
+        self.assertEqual(post.rendererVersion, markdown_renderer.RENDERER_VERSION)
+
+        post = BlogPost.objects.get(pk=post.pk)
+        post.status = BlogPost.STATUS_PUBLISHED
+        post.summary = '新摘要'
+        post.save()
+        self.assertEqual(self.renderMock.call_count, 1)
+
+        post.markdownContent = '# 標題\n\n新的內容'
+        post.save()
+        self.assertEqual(self.renderMock.call_count, 2)
+        self.assertIn('新的內容', BlogPost.objects.get(pk=post.pk).htmlContent)
+
+    def test_identical_content_across_posts_renders_once(self):
+        first = self.create_post(title='第一篇')
+        second = self.create_post(title='第二篇')
+        self.assertEqual(self.renderMock.call_count, 1)
+        self.assertEqual(first.htmlContent, second.htmlContent)
+        self.assertEqual(first.contentHash, second.contentHash)
+
+    def test_update_fields_include_rendered_html(self):
+        post = self.create_post()
+        post.markdownContent = '只更新內容'
+        post.save(update_fields=['markdownContent'])
+        stored = BlogPost.objects.get(pk=post.pk)
+        self.assertIn('只更新內容', stored.htmlContent)
+        self.assertEqual(stored.contentHash, post.contentHash)
+
+    def test_renderer_version_change_rerenders(self):
+        post = self.create_post()
+        with mock.patch('todolist_app.models.RENDERER_VERSION', '999'), mock.patch.object(markdown_renderer, 'RENDERER_VERSION', '999'):
+            post.save()
+        self.assertEqual(self.renderMock.call_count, 2)
+        self.assertEqual(BlogPost.objects.get(pk=post.pk).rendererVersion, '999')
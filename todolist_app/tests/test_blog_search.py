@@ -0,0 +1,108 @@
+"""
+文章全文搜尋（blog_search 與 /app/api/blog/search/）測試
+
+測試資料庫為 SQLite，走 icontains 備援查詢；PostgreSQL 的 tsvector 路徑只驗證欄位型別。
+"""
+from io import StringIO
+from types import SimpleNamespace
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from todolist_app.blog_search import body_text, normalize_query, search_posts
+from todolist_app.models import BlogPost, SearchVectorIndex
+
+
+class NormalizeQueryTest(TestCase):
+    """查詢字串正規化"""
+
+    def test_normalize(self):
+        self.assertEqual(normalize_query('  Ｄｊａｎｇｏ   Cache\tTips '), 'django cache tips')
+        self.assertEqual(normalize_query('   '), '')
+        self.assertEqual(len(normalize_query('x' * 500)), 100)
+        self.assertEqual(len(normalize_query(' '.join('abcdefghij')).split()), 8)
+
+    def test_search_vector_column_type(self):
+        field = BlogPost._meta.get_field('searchVector')
+        self.assertEqual(field.db_type(SimpleNamespace(vendor='postgresql')), 'tsvector')
+        self.assertEqual(field.db_type(SimpleNamespace(vendor='sqlite')), 'text')
+
+    def test_gin_index_is_declared_on_the_model(self):
+        index = next(i for i in BlogPost._meta.indexes if i.name == 'blogpost_search_gin_idx')
+        self.assertIsInstance(index, SearchVectorIndex)
+        self.assertEqual(index.fields, ['searchVector'])
+        # 非 PostgreSQL 建立一般索引，不會產生 USING gin
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        self.assertNotIn('USING', str(index.create_sql(BlogPost, editor)))
+        self.assertEqual(index.check(BlogPost, connection), [])
+        call_command('makemigrations', 'todolist_app', check=True, dry_run=True, stdout=StringIO())
+
+    def test_vector_and_headline_share_the_plain_text_source(self):
+        # 標籤移除、實體解碼後的 htmlContent，不是原始 Markdown
+        sql = str(BlogPost.objects.annotate(body=body_text()).values('body').query)
+        self.assertIn('regexp_replace', sql)
+        self.assertIn('htmlContent', sql)
+        self.assertNotIn('markdownContent', sql)
+
+
+class BlogSearchTest(TestCase):
+    """排名、摘錄與快取"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='searcher', password='pw')
+        self.titleHit = self.create_post('Caching in Django', '介紹 Django 的 cache framework。')
+        self.bodyHit = self.create_post('Misc notes', '前言。\n\n' + '填充文字 ' * 40 + '\n\n這段談到 caching 與 <b>HTML</b> 跳脫。')
+        self.create_post('Draft caching', 'caching draft', status=BlogPost.STATUS_DRAFT)
+        self.create_post('Unrelated', '完全無關')
+
+    def create_post(self, title, body, status=BlogPost.STATUS_PUBLISHED):
+        return BlogPost.objects.create(author=self.author, title=title, markdownContent=body, status=status)
+
+    def test_ranked_results_with_highlighted_snippets(self):
+        results = search_posts('  CACHING ')
+        self.assertEqual([r['slug'] for r in results], [self.titleHit.slug, self.bodyHit.slug])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+        snippet = results[1]['snippet']
+        self.assertIn('<mark>caching</mark>', snippet)
+        self.assertTrue(snippet.startswith('… '))
+        # 內容中的 HTML 一律跳脫，只有 <mark> 是標記
+        self.assertNotIn('<b>', snippet)
+
+    def test_all_terms_must_match(self):
+        self.assertEqual([r['slug'] for r in search_posts('django framework')], [self.titleHit.slug])
+        self.assertEqual(search_posts('django 無關'), [])
+
+    def test_only_rendered_text_is_matched(self):
+        post = self.create_post('Links', '參考 [官方文件](https://docs.example.org/guide) 與 **重點**。')
+        # 網址與 Markdown 語法不是文章可見的文字，不列入比對
+        self.assertEqual(search_posts('example'), [])
+        self.assertEqual(search_posts('**'), [])
+        results = search_posts('官方文件')
+        self.assertEqual([r['slug'] for r in results], [post.slug])
+        self.assertIn('<mark>官方文件</mark>', results[0]['snippet'])
+
+    def test_results_are_cached_until_a_post_changes(self):
+        search_posts('caching')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(search_posts('Caching')), 2)
+
+        self.create_post('More caching', 'caching again')
+        self.assertEqual(len(search_posts('caching')), 3)
+
+    def test_api(self):
+        url = reverse('api_blog_search')
+        response = self.client.get(url, {'q': 'Caching', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['query'], 'caching')
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['results'][0]['url'], reverse('blog_detail', kwargs={'slug': self.titleHit.slug}))
+
+        self.assertEqual(self.client.get(url, {'q': '  '}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'x', 'limit': 'a'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'x', 'limit': 500}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'q': 'x'}).status_code, 405)
@@ -0,0 +1,55 @@
+"""
+BlogPost slug 分配測試（單一查詢、並行衝突重試、中文標題）
+"""
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from todolist_app.models import BlogPost
+
+
+class BlogSlugAllocationTest(TestCase):
+    """slug 分配"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='slugger', password='pw')
+
+    def create_post(self, title, **kwargs):
+        return BlogPost.objects.create(author=self.author, title=title, markdownContent='內容', **kwargs)
+
+    def test_next_suffix_from_one_query(self):
+        BlogPost.objects.bulk_create([
+            BlogPost(author=self.author, title='Popular', slug=slug, markdownContent='x')
+            for slug in ['popular'] + [f'popular-{n}' for n in range(1, 501)] + ['popular-post', 'popular-3x']
+        ])
+        post = BlogPost(author=self.author, title='Popular', markdownContent='x')
+        with self.assertNumQueries(1):
+            self.assertEqual(post.allocate_slug(), 'popular-501')
+
+    def test_base_slug_and_gaps(self):
+        self.assertEqual(self.create_post('Fresh Title').slug, 'fresh-title')
+        self.assertEqual(self.create_post('Fresh Title').slug, 'fresh-title-1')
+        BlogPost.objects.filter(slug='fresh-title').delete()
+        # base 空出來時優先使用 base
+        self.assertEqual(self.create_post('Fresh Title').slug, 'fresh-title')
+
+    def test_existing_slug_is_kept_on_update(self):
+        post = self.create_post('Keep Me')
+        post.title = 'Renamed'
+        post.save()
+        self.assertEqual(BlogPost.objects.get(pk=post.pk).slug, 'keep-me')
+
+    def test_cjk_title_gets_random_slug_without_queries(self):
+        post = BlogPost(author=self.author, title='中文標題', markdownContent='x')
+        with self.assertNumQueries(0):
+            slug = post.allocate_slug()
+        self.assertRegex(slug, r'^post-[0-9a-f]{16}$')
+        self.assertNotEqual(self.create_post('中文標題').slug, self.create_post('中文標題').slug)
+
+    def test_retries_when_slug_is_taken_concurrently(self):
+        self.create_post('Race')
+        # 第一次分配模擬另一個請求在查詢後、INSERT 前搶先使用了相同 slug
+        with mock.patch.object(BlogPost, 'allocate_slug', side_effect=['race', 'race-1']) as allocate:
+            post = self.create_post('Race')
+        self.assertEqual(post.slug, 'race-1')
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual(BlogPost.objects.filter(slug__startswith='race').count(), 2)
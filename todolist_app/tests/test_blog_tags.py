@@ -0,0 +1,123 @@
+"""
+文章標籤（Tag 模型、tagSet 同步、反正規化計數與標籤頁）測試
+"""
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from todolist_app.models import BlogPost, Tag, parse_tag_names
+import importlib
+
+
+class ParseTagNamesTest(TestCase):
+    """標籤字串拆解"""
+
+    def test_split_normalize_and_dedupe(self):
+        parsed = parse_tag_names(' Django ,python，django,  Web   Dev ,, ,中文 ')
+        self.assertEqual(parsed, [('django', 'Django'), ('python', 'python'), ('web-dev', 'Web Dev'), ('中文', '中文')])
+        self.assertEqual(parse_tag_names(''), [])
+
+
+class BlogPostTagSyncTest(TestCase):
+    """儲存文章時同步 tagSet 與 postCount"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='tagger', password='pw')
+
+    def create_post(self, title, tags, status=BlogPost.STATUS_PUBLISHED):
+        return BlogPost.objects.create(author=self.author, title=title, markdownContent='x', tags=tags, status=status)
+
+    def counts(self):
+        return dict(Tag.objects.values_list('slug', 'postCount'))
+
+    def test_tags_are_linked_and_counted(self):
+        first = self.create_post('One', 'django, python')
+        self.create_post('Two', 'Django')
+        self.create_post('Draft', 'django, drafts', status=BlogPost.STATUS_DRAFT)
+
+        self.assertEqual(set(first.tagSet.values_list('slug', flat=True)), {'django', 'python'})
+        # 草稿也建立關聯，但不計入已發佈文章數
+        self.assertEqual(self.counts(), {'django': 2, 'python': 1, 'drafts': 0})
+        self.assertEqual(Tag.objects.get(slug='django').name, 'django')
+
+    def test_edit_publish_and_delete_update_counts(self):
+        post = self.create_post('Edit', 'a, b')
+        draft = self.create_post('Later', 'b', status=BlogPost.STATUS_DRAFT)
+
+        post.tags = 'b, c'
+        post.save()
+        self.assertEqual(self.counts(), {'a': 0, 'b': 1, 'c': 1})
+
+        draft.status = BlogPost.STATUS_PUBLISHED
+        draft.save(update_fields=['status'])
+        self.assertEqual(self.counts()['b'], 2)
+
+        # 只更新其他欄位時不重新同步
+        with self.assertNumQueries(1):
+            post.summary = 'new summary'
+            post.save(update_fields=['summary'])
+
+        post.delete()
+        self.assertEqual(self.counts(), {'a': 0, 'b': 1, 'c': 0})
+
+    def test_backfill_migration(self):
+        posts = [
+            BlogPost(author=self.author, title='Old 1', slug='old-1', markdownContent='x', tags='legacy, Python', status=BlogPost.STATUS_PUBLISHED),
+            BlogPost(author=self.author, title='Old 2', slug='old-2', markdownContent='x', tags='python，舊標籤', status=BlogPost.STATUS_DRAFT),
+            BlogPost(author=self.author, title='Old 3', slug='old-3', markdownContent='x', tags=''),
+        ]
+        # bulk_create 不觸發 save，模擬遷移前只有 tags 字串的資料
+        old = BlogPost.objects.bulk_create(posts)
+        self.assertFalse(Tag.objects.exists())
+
+        migration = importlib.import_module('todolist_app.migrations.0017_backfill_blogpost_tags')
+        migration.backfill_tags(apps, None)
+
+        self.assertEqual(self.counts(), {'legacy': 1, 'python': 1, '舊標籤': 0})
+        self.assertEqual(set(old[1].tagSet.values_list('slug', flat=True)), {'python', '舊標籤'})
+        self.assertFalse(old[2].tagSet.exists())
+
+
+class BlogTagPageTest(TestCase):
+    """/app/blog/tag/<slug>/ 標籤頁"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='tagpage', password='pw')
+        for i in range(3):
+            BlogPost.objects.create(
+                author=self.author, title=f'Tagged {i}', markdownContent='x', tags='效能, django', status=BlogPost.STATUS_PUBLISHED,
+            )
+        BlogPost.objects.create(author=self.author, title='Other', markdownContent='x', tags='other', status=BlogPost.STATUS_PUBLISHED)
+        BlogPost.objects.create(author=self.author, title='Hidden', markdownContent='x', tags='效能', status=BlogPost.STATUS_DRAFT)
+        self.url = reverse('blog_tag', kwargs={'slug': '效能'})
+
+    def test_lists_only_tagged_published_posts(self):
+        # 標籤查詢 + 一次列表查詢
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.title for p in response.context['page'].posts], ['Tagged 2', 'Tagged 1', 'Tagged 0'])
+        self.assertContains(response, '標籤：效能（3 篇）')
+        self.assertNotContains(response, 'Other')
+        self.assertNotContains(response, 'Hidden')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_pagination_and_invalidation(self):
+        with self.settings(BLOG_LIST_PAGE_SIZE=2):
+            first = self.client.get(self.url).context['page']
+            self.assertEqual(len(first.posts), 2)
+            response = self.client.get(f'{self.url}?cursor={first.nextCursor}')
+        self.assertEqual([p.title for p in response.context['page'].posts], ['Tagged 0'])
+
+        BlogPost.objects.create(author=self.author, title='Newest', markdownContent='x', tags='效能', status=BlogPost.STATUS_PUBLISHED)
+        self.assertContains(self.client.get(self.url), 'Newest')
+
+    def test_unknown_tag_and_detail_links(self):
+        self.assertEqual(self.client.get(reverse('blog_tag', kwargs={'slug': 'missing'})).status_code, 404)
+        post = BlogPost.objects.get(title='Tagged 0')
+        self.assertContains(self.client.get(reverse('blog_detail', kwargs={'slug': post.slug})), f'href="{self.url}"')
@@ -0,0 +1,142 @@
+"""
+商品圖片批次上傳 API 測試
+"""
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from todolist_app.image_utils import render_variants_and_placeholder
+from todolist_app.models import ImageBlob, ImageVariant, Product, ProductImage
+from PIL import Image
+import io
+import shutil
+import tempfile
+import zipfile
+
+
+def make_image_bytes(color, fmt='JPEG'):
+    image = Image.new('RGB', (300, 200), color=color)
+    image_io = io.BytesIO()
+    image.save(image_io, format=fmt)
+    return image_io.getvalue()
+
+
+def make_upload(name, color):
+    return SimpleUploadedFile(name, make_image_bytes(color), content_type='image/jpeg')
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=False)
+class BulkImageUploadTest(TestCase):
+    """批次上傳測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        self.mediaOverride.enable()
+        self.product = Product.objects.create(productName='批次商品', price=Decimal('9.00'))
+        self.url = reverse('api_product_images_bulk', args=[self.product.pk])
+        staff = User.objects.create_user(username='staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def post(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, data)
+
+    def test_multipart_batch_creates_rows_in_one_insert(self):
+        files = [make_upload(f'{c}.jpg', c) for c in ('red', 'green', 'blue')]
+        with mock.patch.object(ProductImage.objects, 'bulk_create', wraps=ProductImage.objects.bulk_create) as bulkCreate:
+            response = self.post({'images': files, 'primary': '1'})
+        self.assertEqual(response.status_code, 201)
+        bulkCreate.assert_called_once()
+
+        images = list(ProductImage.objects.filter(product=self.product).order_by('displayOrder'))
+        self.assertEqual([img.displayOrder for img in images], [0, 1, 2])
+        self.assertEqual([img.isPrimary for img in images], [False, True, False])
+        # 縮圖於交易提交後產生
+        for img in images:
+            self.assertTrue(img.thumbnail150)
+            self.assertTrue(img.variants.exists())
+
+    def test_zip_archive_appends_after_existing_images(self):
+        ProductImage.objects.create(product=self.product, image=make_upload('old.jpg', 'white'), isPrimary=True)
+        archiveIo = io.BytesIO()
+        with zipfile.ZipFile(archiveIo, 'w') as archive:
+            archive.writestr('photos/a.jpg', make_image_bytes('red'))
+            archive.writestr('photos/b.png', make_image_bytes('blue', 'PNG'))
+            archive.writestr('photos/readme.txt', 'ignored')
+            archive.writestr('__MACOSX/photos/._a.jpg', 'ignored')
+        upload = SimpleUploadedFile('photos.zip', archiveIo.getvalue(), content_type='application/zip')
+
+        response = self.post({'images': upload})
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual([r['displayOrder'] for r in results], [1, 2])
+        self.assertEqual([r['isPrimary'] for r in results], [False, False])
+        self.assertEqual(ProductImage.objects.filter(product=self.product, isPrimary=True).count(), 1)
+
+    def test_duplicate_images_render_variants_once(self):
+        data = make_image_bytes('purple')
+        files = [SimpleUploadedFile(n, data, content_type='image/jpeg') for n in ('a.jpg', 'b.jpg')]
+        with mock.patch('todolist_app.models.render_variants_and_placeholder', side_effect=render_variants_and_placeholder) as spy:
+            response = self.post({'images': files})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(ImageBlob.objects.get().refCount, 2)
+        self.assertEqual(ImageVariant.objects.values('file').distinct().count(), ImageVariant.objects.count() // 2)
+
+    def test_invalid_image_rejects_whole_batch(self):
+        files = [make_upload('ok.jpg', 'red'), SimpleUploadedFile('bad.jpg', b'nope', content_type='image/jpeg')]
+        response = self.post({'images': files})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['file'] for e in response.json()['errors']], ['bad.jpg'])
+        self.assertFalse(ProductImage.objects.exists())
+
+    @override_settings(BULK_UPLOAD_MAX_FILES=2)
+    def test_file_count_limit(self):
+        files = [make_upload(f'{i}.jpg', 'red') for i in range(3)]
+        response = self.post({'images': files})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(BULK_UPLOAD_MAX_FILES=2)
+    def test_archive_stops_reading_at_file_count_limit(self):
+        archiveIo = io.BytesIO()
+        with zipfile.ZipFile(archiveIo, 'w') as archive:
+            for i in range(20):
+                archive.writestr(f'{i}.jpg', make_image_bytes('red'))
+        upload = SimpleUploadedFile('many.zip', archiveIo.getvalue(), content_type='application/zip')
+
+        with mock.patch.object(zipfile.ZipFile, 'open', autospec=True, side_effect=zipfile.ZipFile.open) as opened:
+            response = self.post({'images': upload})
+        self.assertEqual(response.status_code, 400)
+        # 第 3 個項目在讀取前即被拒絕
+        self.assertEqual(opened.call_count, 2)
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_total_size_limit_counts_decompressed_bytes(self):
+        data = make_image_bytes('green')
+        archiveIo = io.BytesIO()
+        with zipfile.ZipFile(archiveIo, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for i in range(3):
+                archive.writestr(f'{i}.jpg', data)
+
+        def upload():
+            return SimpleUploadedFile('big.zip', archiveIo.getvalue(), content_type='application/zip')
+
+        with override_settings(BULK_UPLOAD_MAX_BYTES=len(data) * 2):
+            response = self.post({'images': upload()})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('總大小', response.json()['error'])
+
+        with override_settings(BULK_UPLOAD_MAX_BYTES=len(data) * 3):
+            self.assertEqual(self.post({'images': upload()}).status_code, 201)
+
+    def test_requires_staff(self):
+        self.client.logout()
+        response = self.client.post(self.url, {'images': make_upload('a.jpg', 'red')})
+        self.assertEqual(response.status_code, 403)
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib import admin
 from django.core.files.uploadedfile import SimpleUploadedFile
 from todolist_app import admin as todolist_admin
@@ -6,6 +6,8 @@ from todolist_app.models import Category, Product
 from PIL import Image
 from io import BytesIO
 import os
+import shutil
+import tempfile
 
 
 def make_test_image_bytes(format='PNG', size=(200, 200), color=(0, 255, 0)):
@@ -15,6 +17,23 @@ def make_test_image_bytes(format='PNG', size=(200, 200), color=(0, 255, 0)):
     return buf.getvalue()
 
 
+# 測試上傳的圖片與縮圖寫入暫存目錄，不寫入專案的 media/
+_mediaRoot = None
+_mediaOverride = None
+
+
+def setUpModule():
+    global _mediaRoot, _mediaOverride
+    _mediaRoot = tempfile.mkdtemp()
+    _mediaOverride = override_settings(MEDIA_ROOT=_mediaRoot)
+    _mediaOverride.enable()
+
+
+def tearDownModule():
+    _mediaOverride.disable()
+    shutil.rmtree(_mediaRoot, ignore_errors=True)
+
+
 class CategoryAdminTests(TestCase):
     def tearDown(self):
         for c in Category.objects.all():
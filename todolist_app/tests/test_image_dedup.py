@@ -0,0 +1,125 @@
+"""
+相同內容圖片去重（ImageBlob）測試
+"""
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from todolist_app.image_utils import hash_file, render_variants_and_placeholder
+from todolist_app.media_cleanup import wait_for_pending
+from todolist_app.models import Category, ImageBlob, ImageVariant, Product, ProductImage
+from todolist_app.upload_handlers import HashingTemporaryFileUploadHandler
+from PIL import Image
+import io
+import os
+import shutil
+import tempfile
+
+
+def make_image_bytes(color='green'):
+    image = Image.new('RGB', (400, 300), color=color)
+    image_io = io.BytesIO()
+    image.save(image_io, format='JPEG')
+    return image_io.getvalue()
+
+
+def make_upload(data, name='supplier.jpg'):
+    return SimpleUploadedFile(name, data, content_type='image/jpeg')
+
+
+class ImageDedupTest(TestCase):
+    """內容定址去重測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        self.mediaOverride.enable()
+        self.productA = Product.objects.create(productName='商品 A', price=Decimal('1.00'))
+        self.productB = Product.objects.create(productName='商品 B', price=Decimal('1.00'))
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def test_identical_uploads_share_file_and_thumbnails(self):
+        data = make_image_bytes()
+        with mock.patch('todolist_app.models.render_variants_and_placeholder', side_effect=render_variants_and_placeholder) as spy:
+            first = ProductImage.objects.create(product=self.productA, image=make_upload(data))
+            second = ProductImage.objects.create(product=self.productB, image=make_upload(data, 'copy.jpg'))
+        self.assertEqual(spy.call_count, 1)
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.thumbnail150.name, second.thumbnail150.name)
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.refCount, 2)
+        self.assertEqual(blob.contentHash, hash_file(io.BytesIO(data)))
+        self.assertTrue(first.image.name.startswith(f'products/{self.productA.pk}/{blob.contentHash[:16]}_'))
+        self.assertEqual(
+            set(first.variants.values_list('file', flat=True)),
+            set(second.variants.values_list('file', flat=True)),
+        )
+
+    def test_category_reuses_product_blob(self):
+        data = make_image_bytes('purple')
+        pi = ProductImage.objects.create(product=self.productA, image=make_upload(data))
+        cat = Category.objects.create(categoryName='共用分類', image=make_upload(data, 'cat.jpg'))
+        self.assertEqual(cat.image.name, pi.image.name)
+        self.assertEqual(ImageBlob.objects.get().refCount, 2)
+
+    def test_files_removed_only_after_last_reference(self):
+        data = make_image_bytes()
+        first = ProductImage.objects.create(product=self.productA, image=make_upload(data))
+        second = ProductImage.objects.create(product=self.productB, image=make_upload(data))
+        imagePath = first.image.path
+        thumbPaths = [os.path.join(self.mediaRoot, name) for name in first.variants.values_list('file', flat=True)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        wait_for_pending()
+        self.assertTrue(os.path.exists(imagePath))
+        for path in thumbPaths:
+            self.assertTrue(os.path.exists(path))
+        self.assertEqual(ImageBlob.objects.get().refCount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        wait_for_pending()
+        self.assertFalse(os.path.exists(imagePath))
+        for path in thumbPaths:
+            self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(ImageVariant.objects.exists())
+
+    def test_different_content_gets_separate_blobs(self):
+        ProductImage.objects.create(product=self.productA, image=make_upload(make_image_bytes('red')))
+        ProductImage.objects.create(product=self.productA, image=make_upload(make_image_bytes('blue')))
+        self.assertEqual(ImageBlob.objects.count(), 2)
+
+    def test_missing_blob_file_is_rewritten(self):
+        data = make_image_bytes()
+        first = ProductImage.objects.create(product=self.productA, image=make_upload(data))
+        os.remove(first.image.path)
+
+        second = ProductImage.objects.create(product=self.productB, image=make_upload(data))
+        self.assertTrue(os.path.exists(second.image.path))
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.fileName, second.image.name)
+        self.assertEqual(blob.refCount, 2)
+
+
+class HashingUploadHandlerTest(TestCase):
+    """上傳時串流計算雜湊"""
+
+    def test_hash_computed_while_streaming(self):
+        data = make_image_bytes()
+        handler = HashingTemporaryFileUploadHandler()
+        handler.new_file('image', 'a.jpg', 'image/jpeg', len(data))
+        handler.receive_data_chunk(data[:100], 0)
+        handler.receive_data_chunk(data[100:], 100)
+        uploaded = handler.file_complete(len(data))
+        try:
+            self.assertEqual(uploaded.contentHash, hash_file(io.BytesIO(data)))
+            # hash_file 直接採用預先計算的結果
+            self.assertEqual(hash_file(uploaded), uploaded.contentHash)
+        finally:
+            uploaded.close()
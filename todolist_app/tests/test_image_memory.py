@@ -0,0 +1,127 @@
+"""
+圖片處理記憶體上限與同時解碼數限制測試
+
+tracemalloc 只追蹤 Python heap（編碼緩衝區、檔案讀取等）；Pillow 的像素緩衝區
+由 C 直接配置，改為檢查實際解碼出的影像（im.size / mode）與之後處理用的影像尺寸。
+"""
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from todolist_app import image_utils
+from todolist_app.image_utils import DecodeLimiter, estimate_decode_bytes, get_variant_specs, render_variants_and_placeholder
+from PIL import Image, ImageDraw
+import io
+import threading
+import time
+import tracemalloc
+
+
+def make_large_image(fmt, mode):
+    image = Image.new(mode, (4000, 4000), (40, 120, 200, 0) if mode == 'RGBA' else (40, 120, 200))
+    ImageDraw.Draw(image).rectangle((1000, 1000, 3000, 3000), fill=(200, 40, 40, 255) if mode == 'RGBA' else (200, 40, 40))
+    image_io = io.BytesIO()
+    image.save(image_io, format=fmt)
+    image_io.seek(0)
+    return image_io
+
+
+@override_settings(IMAGE_MEMORY_BUDGET=256 * 1024 * 1024, IMAGE_DECODE_CONCURRENCY=2)
+class BoundedMemoryRenderTest(SimpleTestCase):
+    """大圖處理的記憶體峰值"""
+
+    def render(self, source):
+        decoded, resized = [], []
+        thumbnail = Image.Image.thumbnail
+        resize = image_utils._resize
+
+        # 記錄縮小前實際解碼出的像素緩衝區（C 端配置，tracemalloc 看不到）
+        def spy_thumbnail(img, *args, **kwargs):
+            img.load()
+            decoded.append((img.im.size, img.im.mode))
+            return thumbnail(img, *args, **kwargs)
+
+        def spy_resize(img, size, crop):
+            resized.append(img.size)
+            return resize(img, size, crop)
+
+        tracemalloc.start()
+        try:
+            with mock.patch.object(Image.Image, 'thumbnail', autospec=True, side_effect=spy_thumbnail), \
+                    mock.patch.object(image_utils, '_resize', side_effect=spy_resize):
+                result = render_variants_and_placeholder(source, [s for s in get_variant_specs().values() if s.eager])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, peak, decoded, resized
+
+    def test_rgba_upload_is_decoded_once_and_shrunk_before_processing(self):
+        source = make_large_image('PNG', 'RGBA')
+        (rendered, (placeholder, color)), peak, decoded, resized = self.render(source)
+
+        # Python heap：只有小圖的編碼緩衝區，不會有原尺寸的副本
+        self.assertLess(peak, 8 * 1024 * 1024)
+        # PNG 無法縮小解碼：只有一次原尺寸解碼，裁切與編碼都在 800px 的工作影像上進行
+        self.assertEqual(decoded, [((4000, 4000), 'RGBA')])
+        self.assertEqual(set(resized), {(800, 800)})
+        self.assertTrue(placeholder.startswith('data:image/'))
+
+        # 透明區域仍合成在白底上
+        spec, fmt, content, width, height = next(r for r in rendered if r[1] == 'JPEG' and r[0].crop == 'fit')
+        self.assertEqual((width, height), (spec.size, spec.size))
+        with Image.open(content) as thumb:
+            self.assertGreater(min(thumb.convert('RGB').getpixel((5, 5))), 245)
+
+    def test_jpeg_upload_is_decoded_at_reduced_scale(self):
+        source = make_large_image('JPEG', 'RGB')
+        (rendered, _), peak, decoded, resized = self.render(source)
+
+        self.assertLess(peak, 8 * 1024 * 1024)
+        # 最大輸出 800px，libjpeg 以 1/2 比例解碼：像素緩衝區只有原尺寸的 1/4
+        self.assertEqual(decoded, [((2000, 2000), 'RGB')])
+        self.assertLessEqual(estimate_decode_bytes(decoded[0][0]), estimate_decode_bytes((4000, 4000)) // 4)
+        self.assertEqual(set(resized), {(800, 800)})
+        self.assertEqual({(w, h) for _, _, _, w, h in rendered}, {(150, 150), (800, 800)})
+
+
+class DecodeLimiterTest(SimpleTestCase):
+    """DecodeLimiter 同時解碼數與記憶體預算"""
+
+    def run_jobs(self, limiter, sizes, hold=0.05):
+        state = {'active': 0, 'maxActive': 0, 'maxReserved': 0}
+        lock = threading.Lock()
+
+        def job(nbytes):
+            with limiter.reserve(nbytes):
+                with lock:
+                    state['active'] += 1
+                    state['maxActive'] = max(state['maxActive'], state['active'])
+                    state['maxReserved'] = max(state['maxReserved'], limiter.reserved)
+                time.sleep(hold)
+                with lock:
+                    state['active'] -= 1
+
+        threads = [threading.Thread(target=job, args=(n,)) for n in sizes]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        return state
+
+    def test_concurrency_is_limited(self):
+        limiter = DecodeLimiter(budget=10_000, concurrency=2)
+        state = self.run_jobs(limiter, [10] * 8)
+        self.assertEqual(state['maxActive'], 2)
+        self.assertEqual(limiter.active, 0)
+        self.assertEqual(limiter.reserved, 0)
+
+    def test_budget_is_respected(self):
+        limiter = DecodeLimiter(budget=100, concurrency=4)
+        state = self.run_jobs(limiter, [60] * 4)
+        self.assertEqual(state['maxActive'], 1)
+        self.assertLessEqual(state['maxReserved'], 100)
+
+    def test_oversized_decode_runs_alone(self):
+        limiter = DecodeLimiter(budget=100, concurrency=4)
+        state = self.run_jobs(limiter, [500, 10, 10])
+        self.assertEqual(limiter.peakReserved, 500)
+        self.assertLessEqual(state['maxReserved'], 500)
+        self.assertEqual(limiter.active, 0)
@@ -0,0 +1,135 @@
+"""
+圖片中繼資料（尺寸、大小、格式、雜湊、預覽佔位圖）與 backfill_image_metadata 指令測試
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from todolist_app.image_utils import compute_placeholder, hash_file
+from todolist_app.models import Category, ImageVariant, Product, ProductImage
+from PIL import Image
+import base64
+import io
+import shutil
+import tempfile
+
+
+def make_image_bytes(size=(640, 480), fmt='PNG'):
+    image = Image.new('RGB', size, color='teal')
+    image_io = io.BytesIO()
+    image.save(image_io, format=fmt)
+    return image_io.getvalue()
+
+
+class ImageMetadataTest(TestCase):
+    """中繼資料於處理時寫入一次"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        self.mediaOverride.enable()
+        self.product = Product.objects.create(productName='中繼資料商品', price=Decimal('5.00'))
+        self.data = make_image_bytes()
+        self.productImage = ProductImage.objects.create(
+            product=self.product,
+            image=SimpleUploadedFile('meta.png', self.data, content_type='image/png'),
+        )
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def test_metadata_stored_on_upload(self):
+        pi = ProductImage.objects.get(pk=self.productImage.pk)
+        self.assertEqual((pi.imageWidth, pi.imageHeight), (640, 480))
+        self.assertEqual(pi.imageFormat, 'PNG')
+        self.assertEqual(pi.imageBytes, len(self.data))
+        self.assertEqual(pi.contentHash, hash_file(io.BytesIO(self.data)))
+        self.assertTrue(pi.placeholder.startswith('data:image/'))
+        self.assertEqual(pi.dominantColor, '#008080')
+
+        for variant in pi.variants.all():
+            self.assertGreater(variant.fileSize, 0)
+            with variant.file.open('rb') as fh:
+                self.assertEqual(variant.contentHash, hash_file(fh))
+
+    def test_category_metadata(self):
+        cat = Category.objects.create(
+            categoryName='中繼資料分類',
+            image=SimpleUploadedFile('c.jpg', make_image_bytes((300, 200), 'JPEG'), content_type='image/jpeg'),
+        )
+        cat.refresh_from_db()
+        self.assertEqual((cat.imageWidth, cat.imageHeight, cat.imageFormat), (300, 200, 'JPEG'))
+
+    def test_api_and_clean_do_not_touch_files(self):
+        pi = ProductImage.objects.get(pk=self.productImage.pk)
+        with mock.patch.object(FileSystemStorage, 'open', side_effect=AssertionError('file opened')), \
+                mock.patch.object(FileSystemStorage, 'size', side_effect=AssertionError('file stat')):
+            pi.full_clean()
+            response = self.client.get(reverse('api_product_images', args=[self.product.pk]))
+
+        result = response.json()['results'][0]
+        self.assertEqual(result['metadata']['width'], 640)
+        self.assertEqual(result['placeholder'], pi.placeholder)
+        self.assertEqual(result['dominantColor'], '#008080')
+        self.assertEqual(result['metadata']['format'], 'PNG')
+        for name, entry in result['variants'].items():
+            self.assertTrue(all(size > 0 for size in entry['bytes'].values()), name)
+
+    def test_backfill_command(self):
+        ProductImage.objects.update(imageWidth=None, imageHeight=None, imageBytes=None, imageFormat='', contentHash='', placeholder='', dominantColor='')
+        ImageVariant.objects.update(fileSize=0, contentHash='')
+
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        self.assertIn('ProductImage: updated 1', out.getvalue())
+
+        pi = ProductImage.objects.get(pk=self.productImage.pk)
+        self.assertEqual((pi.imageWidth, pi.imageHeight, pi.imageBytes), (640, 480, len(self.data)))
+        self.assertEqual(pi.contentHash, hash_file(io.BytesIO(self.data)))
+        self.assertEqual(pi.dominantColor, '#008080')
+        self.assertFalse(ImageVariant.objects.filter(fileSize=0).exists())
+
+        # 已有資料的列不再處理
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        self.assertIn('ProductImage: updated 0', out.getvalue())
+
+
+class PlaceholderTest(TestCase):
+    """LQIP 佔位圖與主色計算"""
+
+    def test_placeholder_is_tiny_and_keeps_aspect_ratio(self):
+        image = Image.new('RGB', (1000, 500), color=(200, 30, 30))
+        image.paste((20, 20, 200), (0, 0, 200, 500))
+        image_io = io.BytesIO()
+        image.save(image_io, format='PNG')
+
+        dataUri, color = compute_placeholder(image_io)
+        self.assertLess(len(dataUri), 1024)
+        mime, encoded = dataUri[len('data:'):].split(';base64,')
+        with Image.open(io.BytesIO(base64.b64decode(encoded))) as thumb:
+            self.assertEqual(thumb.size, (20, 10))
+            self.assertEqual(Image.MIME[thumb.format], mime)
+        # 面積較大的紅色為主色
+        r, g, b = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertGreater(r, 150)
+        self.assertLess(b, 100)
+
+    def test_shared_blob_reuses_placeholder(self):
+        mediaRoot = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=mediaRoot):
+                product = Product.objects.create(productName='共用', price=Decimal('1.00'))
+                data = make_image_bytes()
+                first = ProductImage.objects.create(product=product, image=SimpleUploadedFile('a.png', data, content_type='image/png'))
+                with mock.patch('todolist_app.models.compute_placeholder') as computed:
+                    second = ProductImage.objects.create(product=product, image=SimpleUploadedFile('b.png', data, content_type='image/png'))
+                computed.assert_not_called()
+                self.assertEqual(second.placeholder, first.placeholder)
+        finally:
+            shutil.rmtree(mediaRoot, ignore_errors=True)
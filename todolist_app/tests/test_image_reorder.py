@@ -0,0 +1,72 @@
+"""
+商品圖片批次排序與主圖切換測試
+"""
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+from todolist_app.models import Product, ProductImage
+import json
+
+
+class ProductImageReorderTest(TestCase):
+    """排序 API 與主圖唯一索引測試"""
+
+    def setUp(self):
+        self.product = Product.objects.create(productName='排序商品', price=Decimal('1.00'))
+        # 只測試排序欄位，直接建立資料列以略過圖片處理
+        self.images = ProductImage.objects.bulk_create([
+            ProductImage(product=self.product, image=f'products/x/{i}.jpg', displayOrder=i, isPrimary=(i == 0))
+            for i in range(4)
+        ])
+        self.ids = [img.pk for img in self.images]
+        staff = User.objects.create_user(username='staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.url = reverse('api_product_images_reorder', args=[self.product.pk])
+
+    def state(self):
+        return list(ProductImage.objects.filter(product=self.product).order_by('displayOrder').values_list('pk', 'isPrimary'))
+
+    def test_reorder_and_switch_primary(self):
+        newOrder = [self.ids[2], self.ids[0], self.ids[3], self.ids[1]]
+        with self.assertNumQueries(5):
+            # savepoint、鎖定、UPDATE ... CASE、設定主圖、釋放 savepoint
+            ProductImage.reorder(self.product, newOrder, primaryId=self.ids[3])
+        self.assertEqual(self.state(), [
+            (self.ids[2], False), (self.ids[0], False), (self.ids[3], True), (self.ids[1], False),
+        ])
+
+    def test_reorder_keeping_primary(self):
+        ProductImage.reorder(self.product, list(reversed(self.ids)), primaryId=self.ids[0])
+        self.assertEqual(self.state()[-1], (self.ids[0], True))
+        self.assertEqual(sum(p for _, p in self.state()), 1)
+
+    def test_api(self):
+        response = self.client.post(
+            self.url,
+            data=json.dumps({'order': list(reversed(self.ids)), 'primary': self.ids[1]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['id'] for r in results], list(reversed(self.ids)))
+        self.assertEqual([r['id'] for r in results if r['isPrimary']], [self.ids[1]])
+
+    def test_api_rejects_incomplete_order(self):
+        response = self.client.post(self.url, data=json.dumps({'order': self.ids[:2]}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        other = Product.objects.create(productName='其他', price=Decimal('1.00'))
+        foreign = ProductImage.objects.bulk_create([ProductImage(product=other, image='products/y/a.jpg')])[0]
+        response = self.client.post(self.url, data=json.dumps({'order': self.ids, 'primary': foreign.pk}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_partial_unique_index_rejects_second_primary(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                ProductImage.objects.filter(pk=self.ids[1]).update(isPrimary=True)
+
+    def test_set_as_primary(self):
+        img = ProductImage.objects.get(pk=self.ids[2])
+        img.set_as_primary()
+        self.assertEqual([pk for pk, primary in self.state() if primary], [self.ids[2]])
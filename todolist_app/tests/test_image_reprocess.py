@@ -0,0 +1,117 @@
+"""
+僅在圖片內容改變時重新處理（ProductImage / Category save）測試
+"""
+from decimal import Decimal
+from unittest import mock
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from todolist_app.media_cleanup import wait_for_pending
+from todolist_app.models import Category, ImageBlob, ImageVariant, Product, ProductImage
+from PIL import Image
+import io
+import os
+import shutil
+import tempfile
+
+
+def make_upload(color, name='img.jpg'):
+    image = Image.new('RGB', (240, 160), color=color)
+    image_io = io.BytesIO()
+    image.save(image_io, format='JPEG')
+    return SimpleUploadedFile(name, image_io.getvalue(), content_type='image/jpeg')
+
+
+class ImageReprocessTest(TestCase):
+    """內容變更偵測測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        self.mediaOverride.enable()
+        self.category = Category.objects.create(categoryName='重新處理分類', image=make_upload('red'))
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def paths(self, owner):
+        names = [owner.image.name] + list(owner.variants.values_list('file', flat=True))
+        return [os.path.join(self.mediaRoot, n) for n in names]
+
+    def test_replacing_category_image_regenerates_and_removes_old_files(self):
+        cat = Category.objects.get(pk=self.category.pk)
+        oldPaths = self.paths(cat)
+        oldThumb = cat.thumbnail150.name
+
+        cat.image = make_upload('blue', 'new.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            cat.save()
+        wait_for_pending()
+
+        cat.refresh_from_db()
+        self.assertNotEqual(cat.thumbnail150.name, oldThumb)
+        self.assertEqual(cat.dominantColor[:3], '#00')
+        for path in oldPaths:
+            self.assertFalse(os.path.exists(path), path)
+        for path in self.paths(cat):
+            self.assertTrue(os.path.exists(path), path)
+        self.assertEqual(list(ImageBlob.objects.values_list('fileName', flat=True)), [cat.image.name])
+
+    def test_unrelated_save_does_no_image_io(self):
+        cat = Category.objects.get(pk=self.category.pk)
+        cat.description = '只改描述'
+        with mock.patch.object(FileSystemStorage, 'open', side_effect=AssertionError('open')), \
+                mock.patch.object(FileSystemStorage, 'save', side_effect=AssertionError('save')), \
+                mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError('exists')), \
+                mock.patch('todolist_app.models.render_variants_and_placeholder', side_effect=AssertionError('render')):
+            cat.save()
+            Category.objects.only('id', 'categoryName').get(pk=cat.pk).save()
+
+    def test_identical_upload_keeps_existing_files(self):
+        cat = Category.objects.get(pk=self.category.pk)
+        name = cat.image.name
+        variantIds = set(cat.variants.values_list('pk', flat=True))
+
+        cat.image = make_upload('red', 'again.jpg')
+        with mock.patch('todolist_app.models.render_variants_and_placeholder', side_effect=AssertionError('render')):
+            cat.save()
+
+        self.assertEqual(cat.image.name, name)
+        self.assertEqual(set(cat.variants.values_list('pk', flat=True)), variantIds)
+        self.assertEqual(ImageBlob.objects.get().refCount, 1)
+
+    def test_clearing_image_removes_variants(self):
+        cat = Category.objects.get(pk=self.category.pk)
+        oldPaths = self.paths(cat)
+        cat.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            cat.save()
+        wait_for_pending()
+
+        cat.refresh_from_db()
+        self.assertFalse(cat.thumbnail150)
+        self.assertEqual(cat.placeholder, '')
+        self.assertIsNone(cat.imageWidth)
+        self.assertFalse(ImageVariant.objects.filter(category=cat).exists())
+        for path in oldPaths:
+            self.assertFalse(os.path.exists(path), path)
+
+    def test_replacing_product_image_keeps_shared_files(self):
+        product = Product.objects.create(productName='重新處理商品', price=Decimal('1.00'))
+        first = ProductImage.objects.create(product=product, image=make_upload('green'))
+        second = ProductImage.objects.create(product=product, image=make_upload('green'))
+        sharedPaths = self.paths(first)
+
+        second = ProductImage.objects.get(pk=second.pk)
+        second.image = make_upload('yellow')
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        wait_for_pending()
+
+        # 仍被 first 引用的檔案不會被刪除
+        for path in sharedPaths:
+            self.assertTrue(os.path.exists(path), path)
+        self.assertNotEqual(second.image.name, first.image.name)
+        self.assertTrue(second.variants.exists())
+        self.assertEqual(ImageBlob.objects.get(fileName=first.image.name).refCount, 1)
@@ -0,0 +1,176 @@
+"""
+圖片變體（IMAGE_VARIANTS registry）與格式協商測試
+"""
+from decimal import Decimal
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from todolist_app import thumb_cache
+from todolist_app.image_utils import get_variant_specs, negotiate_format
+from todolist_app.models import LEGACY_THUMBNAIL_FIELDS, Category, ImageVariant, Product, ProductImage
+from PIL import Image
+from io import StringIO
+import io
+import os
+import shutil
+import tempfile
+
+
+TEST_VARIANTS = {
+    'thumb150': {'size': 150, 'crop': 'square', 'formats': ['WEBP', 'JPEG'], 'quality': 80},
+    'preview800': {'size': 800, 'crop': 'fit', 'formats': ['WEBP', 'JPEG'], 'quality': 80},
+}
+
+
+def create_test_image(name='variant.jpg', width=1000, height=500, format='JPEG'):
+    image = Image.new('RGB', (width, height), color='blue')
+    image_io = io.BytesIO()
+    image.save(image_io, format=format)
+    return SimpleUploadedFile(name, image_io.getvalue(), content_type='image/jpeg')
+
+
+class VariantRegistryTest(TestCase):
+    """variant registry 與 Accept 協商單元測試"""
+
+    @override_settings(IMAGE_VARIANTS={'tiny': {'size': 32, 'crop': 'cover', 'formats': ['webp', 'jpeg'], 'quality': 70}})
+    def test_specs_are_built_from_settings(self):
+        specs = get_variant_specs()
+        self.assertEqual(list(specs), ['tiny'])
+        self.assertEqual(specs['tiny'].size, 32)
+        self.assertEqual(specs['tiny'].crop, 'cover')
+        self.assertEqual(specs['tiny'].formats, ('WEBP', 'JPEG'))
+        self.assertEqual(specs['tiny'].fallback_format, 'JPEG')
+
+    def test_default_registry_keeps_legacy_variants_eager(self):
+        specs = get_variant_specs()
+        eager = {name for name, spec in specs.items() if spec.eager}
+        # thumbnail150 / thumbnail800 欄位由上傳時產生的變體回填，其餘尺寸依需求產生
+        self.assertEqual(eager, set(LEGACY_THUMBNAIL_FIELDS))
+        self.assertLess(eager, set(specs))
+
+    def test_thumb_cache_is_outside_media_root(self):
+        relative = os.path.relpath(thumb_cache.cache_dir(), settings.MEDIA_ROOT)
+        self.assertTrue(relative.startswith('..'))
+
+    @override_settings(IMAGE_VARIANTS={'bad': {'size': 32, 'crop': 'stretch'}})
+    def test_unknown_crop_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            get_variant_specs()
+
+    @override_settings(IMAGE_VARIANTS={'odd': {'size': 32, 'formats': ['BMP3000', 'JPEG']}})
+    def test_unsupported_formats_are_dropped(self):
+        self.assertEqual(get_variant_specs()['odd'].formats, ('JPEG',))
+
+    def test_negotiate_prefers_explicitly_accepted_format(self):
+        formats = ('AVIF', 'WEBP', 'JPEG')
+        self.assertEqual(negotiate_format('image/avif,image/webp,*/*;q=0.8', formats), 'AVIF')
+        self.assertEqual(negotiate_format('image/webp,*/*', formats), 'WEBP')
+        self.assertEqual(negotiate_format('image/avif;q=0,image/webp', formats), 'WEBP')
+
+    def test_negotiate_wildcard_falls_back(self):
+        self.assertEqual(negotiate_format('*/*', ('WEBP', 'JPEG')), 'JPEG')
+        self.assertEqual(negotiate_format('', ('WEBP', 'JPEG')), 'JPEG')
+
+
+@override_settings(IMAGE_VARIANTS=TEST_VARIANTS)
+class ImageVariantModelTest(TestCase):
+    """ProductImage / Category 變體產生與 API 測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        self.mediaOverride.enable()
+        self.product = Product.objects.create(productName='變體商品', price=Decimal('10.00'))
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def test_variants_created_for_every_size_and_format(self):
+        pi = ProductImage.objects.create(product=self.product, image=create_test_image())
+        rows = {(v.variantName, v.format): v for v in pi.variants.all()}
+        self.assertEqual(set(rows), {
+            ('thumb150', 'WEBP'), ('thumb150', 'JPEG'),
+            ('preview800', 'WEBP'), ('preview800', 'JPEG'),
+        })
+        self.assertEqual((rows[('thumb150', 'WEBP')].width, rows[('thumb150', 'WEBP')].height), (150, 150))
+        self.assertEqual((rows[('preview800', 'JPEG')].width, rows[('preview800', 'JPEG')].height), (800, 400))
+
+        # 舊欄位直接指向 JPEG 變體檔案，不另存副本
+        self.assertEqual(pi.thumbnail150.name, rows[('thumb150', 'JPEG')].file.name)
+        self.assertEqual(pi.thumbnail800.name, rows[('preview800', 'JPEG')].file.name)
+
+    def test_category_variants(self):
+        cat = Category.objects.create(categoryName='變體分類', image=create_test_image('cat.jpg'))
+        self.assertEqual(cat.variants.count(), 4)
+        self.assertTrue(cat.thumbnail150.name)
+
+    def test_variants_removed_with_owner(self):
+        pi = ProductImage.objects.create(product=self.product, image=create_test_image())
+        pi.delete()
+        self.assertFalse(ImageVariant.objects.exists())
+
+    def test_media_view_negotiates_format(self):
+        pi = ProductImage.objects.create(product=self.product, image=create_test_image())
+        url = f'/media/variant/product/{pi.pk}/thumb150/'
+
+        response = self.client.get(url, HTTP_ACCEPT='image/avif,image/webp,*/*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Vary'], 'Accept')
+        response.close()
+
+        response = self.client.get(url, HTTP_ACCEPT='*/*')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        response.close()
+
+        self.assertEqual(self.client.get(f'/media/variant/product/{pi.pk}/missing/').status_code, 404)
+        self.assertEqual(self.client.get(f'/media/variant/other/{pi.pk}/thumb150/').status_code, 404)
+
+    def test_backfill_command_creates_missing_variants(self):
+        pi = ProductImage.objects.create(product=self.product, image=create_test_image())
+        cat = Category.objects.create(categoryName='舊分類', image=create_test_image('cat.jpg'))
+        # 模擬變體表建立前上傳的圖片：沒有任何變體列
+        ImageVariant.objects.all().delete()
+        self.assertEqual(self.client.get(f'/media/variant/product/{pi.pk}/thumb150/').status_code, 404)
+
+        out = StringIO()
+        call_command('backfill_image_variants', stdout=out)
+        self.assertIn('ProductImage: generated 1, failed 0', out.getvalue())
+        self.assertIn('Category: generated 1, failed 0', out.getvalue())
+
+        response = self.client.get(f'/media/variant/product/{pi.pk}/thumb150/', HTTP_ACCEPT='image/webp')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertEqual(set(cat.variants.values_list('variantName', flat=True)), set(TEST_VARIANTS))
+        pi.refresh_from_db()
+        self.assertEqual(pi.thumbnail150.name, pi.variants.get(variantName='thumb150', format='JPEG').file.name)
+
+        # 已有完整變體的圖片不再處理
+        out = StringIO()
+        call_command('backfill_image_variants', stdout=out)
+        self.assertIn('ProductImage: generated 0, failed 0', out.getvalue())
+
+    def test_media_view_ignores_formats_removed_from_settings(self):
+        pi = ProductImage.objects.create(product=self.product, image=create_test_image())
+        url = f'/media/variant/product/{pi.pk}/thumb150/'
+
+        # 既有的 WEBP 變體仍在，但設定只剩 JPEG：即使用戶端優先接受 WEBP 也回傳 JPEG
+        with override_settings(IMAGE_VARIANTS={'thumb150': {'size': 150, 'crop': 'square', 'formats': ['JPEG']}}):
+            response = self.client.get(url, HTTP_ACCEPT='image/webp,image/jpeg,*/*')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        response.close()
+
+    def test_product_images_api_returns_srcset(self):
+        variants = {**TEST_VARIANTS, 'preview400': {'size': 400, 'crop': 'fit', 'formats': ['WEBP', 'JPEG']}}
+        with override_settings(IMAGE_VARIANTS=variants):
+            pi = ProductImage.objects.create(product=self.product, image=create_test_image(), isPrimary=True)
+            response = self.client.get(f'/app/api/products/{self.product.pk}/images/')
+        self.assertEqual(response.status_code, 200)
+        item = response.json()['results'][0]
+        self.assertEqual(item['id'], pi.pk)
+        self.assertIn('image/webp', item['srcset'])
+        # srcset 只列出同一裁切方式（fit）的變體，裁成正方形的 thumb150 不混入
+        self.assertRegex(item['srcset']['image/jpeg'], r'^\S+ 400w, \S+ 800w$')
+        self.assertEqual(item['variants']['thumb150']['url'], f'/media/variant/product/{pi.pk}/thumb150/')
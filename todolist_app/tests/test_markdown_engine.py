@@ -0,0 +1,56 @@
+"""
+可重複使用的 Markdown 渲染引擎測試
+"""
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from todolist_app.utils.markdown_renderer import MarkdownEngine, get_engine, render_markdown
+import threading
+
+
+class MarkdownEngineTest(SimpleTestCase):
+    """MarkdownEngine 輸出與重複使用行為"""
+
+    def test_sanitizes_and_linkifies_in_one_pass(self):
+        html = render_markdown('請看 https://example.com 與 [文件](https://docs.example.com)\n\n<script>alert(1)</script>')
+        self.assertIn('<a href="https://example.com" rel="nofollow">https://example.com</a>', html)
+        self.assertIn('href="https://docs.example.com"', html)
+        self.assertNotIn('<script>', html)
+        self.assertIn('&lt;script&gt;', html)
+
+    def test_links_inside_escaped_code_are_not_split(self):
+        html = render_markdown('```\n<span>see example.com/path</span>\n```')
+        self.assertNotIn('&lt;/span&gt;"', html)
+
+    def test_state_is_reset_between_documents(self):
+        engine = MarkdownEngine()
+        first = engine.render('正文[^1]\n\n[^1]: 第一篇的註腳\n\n[ref]: https://example.com')
+        self.assertIn('第一篇的註腳', first)
+        second = engine.render('第二篇 [連結][ref]')
+        self.assertNotIn('註腳', second)
+        self.assertNotIn('example.com', second)
+
+    def test_pipeline_is_reused_per_thread(self):
+        engine = MarkdownEngine()
+        engine.render('# a')
+        md, cleaner = engine._local.markdown, engine._local.cleaner
+        engine.render('# b')
+        self.assertIs(engine._local.markdown, md)
+        self.assertIs(engine._local.cleaner, cleaner)
+
+        others = []
+        thread = threading.Thread(target=lambda: (engine.render('# c'), others.append(engine._local.markdown)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(others[0], md)
+        self.assertIs(get_engine(), get_engine())
+
+
+class BenchmarkMarkdownCommandTest(TestCase):
+    """benchmark_markdown 指令"""
+
+    def test_runs_on_project_docs(self):
+        out = StringIO()
+        call_command('benchmark_markdown', source='docs', limit=2, repeat=1, stdout=out)
+        self.assertIn('Corpus: 2 documents', out.getvalue())
+        self.assertIn('Speedup:', out.getvalue())
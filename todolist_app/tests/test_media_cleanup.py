@@ -0,0 +1,138 @@
+"""
+交易提交後批次清理媒體檔案測試
+"""
+from decimal import Decimal
+from unittest import mock
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from todolist_app.image_utils import render_variants_and_placeholder
+from todolist_app.media_cleanup import CleanupBatch, wait_for_pending
+from todolist_app.models import Category, Product, ProductImage
+from PIL import Image
+import io
+import os
+import shutil
+import tempfile
+
+
+def make_upload(color):
+    image = Image.new('RGB', (300, 300), color=color)
+    image_io = io.BytesIO()
+    image.save(image_io, format='JPEG')
+    return SimpleUploadedFile(f'{color}.jpg', image_io.getvalue(), content_type='image/jpeg')
+
+
+class MediaCleanupTest(TestCase):
+    """批次檔案清理測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        self.mediaOverride.enable()
+        self.product = Product.objects.create(productName='清理商品', price=Decimal('3.00'))
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def test_cascade_delete_registers_single_batch_and_prunes_directories(self):
+        images = [ProductImage.objects.create(product=self.product, image=make_upload(c)) for c in ('red', 'green', 'blue')]
+        paths = [img.image.path for img in images]
+        productDir = os.path.join(self.mediaRoot, 'products', str(self.product.pk))
+
+        with mock.patch('gc.collect') as gcCollect, mock.patch('time.sleep') as sleep:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                self.product.delete()
+        gcCollect.assert_not_called()
+        sleep.assert_not_called()
+
+        # 三張圖片與其所有變體只註冊一個提交後回呼，且刪除當下不碰檔案
+        self.assertEqual(len([cb for cb in callbacks if isinstance(cb, CleanupBatch)]), 1)
+        for path in paths:
+            self.assertTrue(os.path.exists(path))
+
+        for cb in callbacks:
+            cb()
+        wait_for_pending()
+
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(productDir))
+        self.assertTrue(os.path.isdir(os.path.join(self.mediaRoot, 'products')))
+
+    def test_rolled_back_delete_keeps_files(self):
+        pi = ProductImage.objects.create(product=self.product, image=make_upload('red'))
+        path = pi.image.path
+        pk = pi.pk
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    pi.delete()
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+        wait_for_pending()
+
+        self.assertEqual(callbacks, [])
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(ProductImage.objects.filter(pk=pk).exists())
+
+    @override_settings(MEDIA_CLEANUP_ASYNC=False)
+    def test_inline_mode_removes_files_in_commit_hook(self):
+        pi = ProductImage.objects.create(product=self.product, image=make_upload('red'))
+        path = pi.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            pi.delete()
+        self.assertFalse(os.path.exists(path))
+
+
+@override_settings(MEDIA_CLEANUP_ASYNC=False)
+class AutocommitReplaceCleanupTest(TransactionTestCase):
+    """未開啟交易（autocommit）時替換圖片，舊的原圖與縮圖同樣會被清除"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        self.mediaOverride.enable()
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def assert_replaced_files_removed(self, owner):
+        oldPaths = [f.path for f in (owner.image, owner.thumbnail150, owner.thumbnail800)]
+        for path in oldPaths:
+            self.assertTrue(os.path.exists(path))
+
+        owner.image = make_upload('green')
+        owner.save()
+
+        for path in oldPaths:
+            self.assertFalse(os.path.exists(path))
+        for f in (owner.image, owner.thumbnail150, owner.thumbnail800):
+            self.assertTrue(os.path.exists(f.path))
+
+    def test_product_image_replace(self):
+        product = Product.objects.create(productName='替換商品', price=Decimal('3.00'))
+        self.assert_replaced_files_removed(ProductImage.objects.create(product=product, image=make_upload('red')))
+
+    def test_category_replace(self):
+        self.assert_replaced_files_removed(Category.objects.create(categoryName='替換分類', image=make_upload('red')))
+
+    def test_variants_are_rendered_outside_the_transaction(self):
+        inTransaction = []
+
+        def render(*args, **kwargs):
+            inTransaction.append(connection.in_atomic_block)
+            return render_variants_and_placeholder(*args, **kwargs)
+
+        product = Product.objects.create(productName='交易外商品', price=Decimal('3.00'))
+        with mock.patch('todolist_app.models.render_variants_and_placeholder', side_effect=render):
+            image = ProductImage.objects.create(product=product, image=make_upload('red'))
+            image.image = make_upload('blue')
+            image.save()
+            Category.objects.create(categoryName='交易外分類', image=make_upload('green'))
+        # 解碼與編碼期間不持有交易（與 ImageBlob 的列鎖）
+        self.assertEqual(inTransaction, [False, False, False])
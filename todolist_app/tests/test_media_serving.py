@@ -0,0 +1,91 @@
+"""
+媒體檔案服務（Range、條件請求、immutable 快取、X-Accel-Redirect）測試
+"""
+from django.test import TestCase, override_settings
+from todolist_app.media_serving import IMMUTABLE_CACHE_CONTROL, parse_range
+import os
+import shutil
+import tempfile
+
+
+class MediaServingTest(TestCase):
+    """serve_media 測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot, MEDIA_ACCEL_MODE='')
+        self.mediaOverride.enable()
+        self.content = bytes(range(256)) * 40
+        self.name = 'products/1/thumbs/0123abcd_photo_thumb150.jpg'
+        path = os.path.join(self.mediaRoot, self.name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as fh:
+            fh.write(self.content)
+        with open(os.path.join(self.mediaRoot, 'plain.txt'), 'wb') as fh:
+            fh.write(b'hello')
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def url(self, name=None):
+        return f'/media/{name or self.name}'
+
+    def test_full_response_with_immutable_cache(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response['Content-Length']), len(self.content))
+
+        other = self.client.get(self.url('plain.txt'))
+        self.assertNotIn('immutable', other['Cache-Control'])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url())['ETag']
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url(), HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url(), HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get(self.url(), HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # If-Range 不符時回傳完整檔案
+        response = self.client.get(self.url(), HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-', 10), (0, 9))
+        self.assertEqual(parse_range('bytes=5-100', 10), (5, 9))
+        self.assertIsNone(parse_range('bytes=0-1,4-5', 10))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=-0', 10)
+
+    def test_missing_and_traversal_return_404(self):
+        self.assertEqual(self.client.get(self.url('products/1/nope.jpg')).status_code, 404)
+        self.assertEqual(self.client.get(self.url('products/1')).status_code, 404)
+        self.assertEqual(self.client.get('/media/..%2F..%2Fetc%2Fpasswd').status_code, 404)
+
+    @override_settings(MEDIA_ACCEL_MODE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel_redirect_mode(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.name)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+    @override_settings(MEDIA_ACCEL_MODE='x-sendfile')
+    def test_x_sendfile_mode(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.mediaRoot, self.name))
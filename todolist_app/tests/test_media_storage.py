@@ -0,0 +1,119 @@
+"""
+非本機儲存空間（S3 相容 bucket 的替身）媒體存取測試
+
+以 InMemoryStorage 作為預設儲存空間：檔案不存在於磁碟上，任何殘留的
+.path / os.* 呼叫都會讓測試失敗。
+"""
+from decimal import Decimal
+from io import StringIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from todolist_app.media_cleanup import wait_for_pending
+from todolist_app.media_storage import file_stat, local_path, walk_files
+from todolist_app.models import Category, ImageBlob, Product, ProductImage
+from PIL import Image
+import io
+import os
+import shutil
+import tempfile
+
+
+def make_upload(name, color):
+    image = Image.new('RGB', (300, 200), color=color)
+    image_io = io.BytesIO()
+    image.save(image_io, format='JPEG')
+    return SimpleUploadedFile(name, image_io.getvalue(), content_type='image/jpeg')
+
+
+class ObjectStorageMediaTest(TestCase):
+    """媒體檔案只透過 Storage API 存取"""
+
+    def setUp(self):
+        # MEDIA_ROOT 指向空的暫存目錄，確認沒有任何檔案寫到本機
+        self.mediaRoot = tempfile.mkdtemp()
+        self.storageOverride = override_settings(
+            MEDIA_ROOT=self.mediaRoot,
+            MEDIA_ACCEL_MODE='',
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+        )
+        self.storageOverride.enable()
+        self.product = Product.objects.create(productName='物件儲存商品', price=Decimal('3.00'))
+        self.image = ProductImage.objects.create(product=self.product, image=make_upload('remote.jpg', 'red'))
+
+    def tearDown(self):
+        self.storageOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def test_upload_and_variants_are_written_through_storage(self):
+        self.assertIsNone(local_path(default_storage, self.image.image.name))
+        self.assertTrue(default_storage.exists(self.image.image.name))
+        for variant in self.image.variants.all():
+            self.assertTrue(default_storage.exists(variant.file.name))
+        self.assertEqual(os.listdir(self.mediaRoot), [])
+
+        names = set(walk_files(default_storage, 'products'))
+        self.assertIn(self.image.image.name, names)
+        size, _ = file_stat(default_storage, self.image.image.name)
+        self.assertEqual(size, self.image.imageBytes)
+        with self.assertRaises(FileNotFoundError):
+            file_stat(default_storage, f'products/{self.product.pk}')
+
+    def test_serve_media_streams_from_storage(self):
+        url = f'/media/{self.image.image.name}'
+        with default_storage.open(self.image.image.name, 'rb') as fh:
+            content = fh.read()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), content[10:20])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        variant = self.image.variants.first()
+        response = self.client.get(f'/media/variant/product/{self.image.pk}/{variant.variantName}/', HTTP_ACCEPT='image/webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/media/products/{self.product.pk}/').status_code, 404)
+
+    def test_accel_redirect_uses_storage_name(self):
+        with override_settings(MEDIA_ACCEL_MODE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/bucket/'):
+            response = self.client.get(f'/media/{self.image.image.name}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/bucket/{self.image.image.name}')
+
+    def test_delete_removes_objects(self):
+        names = [self.image.image.name] + list(self.image.variants.values_list('file', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        wait_for_pending()
+        for name in names:
+            self.assertFalse(default_storage.exists(name), name)
+
+    def test_clone_copies_legacy_file_through_storage(self):
+        ImageBlob.objects.all().delete()
+        clone = self.product.clone()
+        copy = clone.images.get()
+        self.assertNotEqual(copy.image.name, self.image.image.name)
+        with default_storage.open(copy.image.name, 'rb') as a, default_storage.open(self.image.image.name, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_sweep_media_lists_and_deletes_through_storage(self):
+        orphan = default_storage.save('categories/999/orphan.jpg', ContentFile(b'orphan'))
+        category = Category.objects.create(categoryName='物件分類', image=make_upload('cat.jpg', 'blue'))
+
+        out = StringIO()
+        call_command('sweep_media', grace_seconds=0, stdout=out)
+
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(category.image.name))
+        self.assertTrue(default_storage.exists(self.image.image.name))
+        self.assertIn('Removed 1 orphan files', out.getvalue())
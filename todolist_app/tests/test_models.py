@@ -113,8 +113,8 @@ class BlogPostModelTest(TestCase):
         self.assertIsNotNone(post.htmlContent)
         self.assertTrue(len(post.htmlContent) > 0)
         
-        # 檢查 HTML 標籤（基本檢查，實際內容依渲染器而定）
-        self.assertIn('<h1>', post.htmlContent.lower())
+        # 檢查 HTML 標籤（基本檢查，實際內容依渲染器而定；標題帶有目錄錨點 id）
+        self.assertIn('<h1 id="toc-標題">', post.htmlContent.lower())
         self.assertIn('<strong>', post.htmlContent.lower() or '<b>' in post.htmlContent.lower())
     
     def test_status_defaults_to_draft(self):
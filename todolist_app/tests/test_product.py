@@ -2,7 +2,7 @@
 商品功能測試
 """
 from decimal import Decimal
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -11,6 +11,25 @@ from todolist_app.models import Product, ProductImage
 from PIL import Image
 import io
 import time
+import shutil
+import tempfile
+
+
+# 測試上傳的圖片與縮圖寫入暫存目錄，不寫入專案的 media/
+_mediaRoot = None
+_mediaOverride = None
+
+
+def setUpModule():
+    global _mediaRoot, _mediaOverride
+    _mediaRoot = tempfile.mkdtemp()
+    _mediaOverride = override_settings(MEDIA_ROOT=_mediaRoot)
+    _mediaOverride.enable()
+
+
+def tearDownModule():
+    _mediaOverride.disable()
+    shutil.rmtree(_mediaRoot, ignore_errors=True)
 
 
 class ProductModelTest(TestCase):
@@ -0,0 +1,117 @@
+"""
+商品複製（admin action 與 API）測試
+"""
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from todolist_app.media_cleanup import wait_for_pending
+from todolist_app.models import Category, ImageBlob, ImageVariant, Product, ProductImage
+from PIL import Image
+import io
+import os
+import shutil
+import tempfile
+import time
+
+
+def make_upload(color):
+    image = Image.new('RGB', (200, 150), color=color)
+    image_io = io.BytesIO()
+    image.save(image_io, format='JPEG')
+    return SimpleUploadedFile(f'{color}.jpg', image_io.getvalue(), content_type='image/jpeg')
+
+
+class ProductCloneTest(TestCase):
+    """商品複製測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(MEDIA_ROOT=self.mediaRoot)
+        self.mediaOverride.enable()
+        self.category = Category.objects.create(categoryName='複製分類')
+        self.product = Product.objects.create(productName='原始商品', price=Decimal('10.00'), stockQuantity=3)
+        self.product.categories.add(self.category)
+        self.images = [
+            ProductImage.objects.create(product=self.product, image=make_upload(c), isPrimary=(i == 0), displayOrder=i)
+            for i, c in enumerate(('red', 'green', 'blue'))
+        ]
+        self.staff = User.objects.create_user(username='staff', password='pw', is_staff=True, is_superuser=True)
+        self.client.force_login(self.staff)
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def test_clone_shares_blobs_without_rendering(self):
+        with mock.patch('todolist_app.models.render_variants_and_placeholder', side_effect=AssertionError('render')):
+            clone = self.product.clone()
+
+        self.assertEqual(clone.productName, '原始商品 (複本)')
+        self.assertEqual(list(clone.categories.all()), [self.category])
+        copies = list(clone.images.order_by('displayOrder'))
+        self.assertEqual([c.image.name for c in copies], [i.image.name for i in self.images])
+        self.assertEqual([c.isPrimary for c in copies], [True, False, False])
+        self.assertEqual(copies[0].placeholder, self.images[0].placeholder)
+        self.assertEqual(ImageVariant.objects.filter(productImage__product=clone).count(),
+                         ImageVariant.objects.filter(productImage__product=self.product).count())
+        self.assertTrue(all(blob.refCount == 2 for blob in ImageBlob.objects.all()))
+
+    def test_deleting_original_keeps_clone_files(self):
+        clone = self.product.clone()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        wait_for_pending()
+        for img in clone.images.all():
+            self.assertTrue(os.path.exists(img.image.path))
+            for variant in img.variants.all():
+                self.assertTrue(os.path.exists(variant.file.path))
+
+    def test_legacy_image_without_blob_is_hard_linked(self):
+        ImageBlob.objects.all().delete()
+        clone = self.product.clone()
+        for src, copy in zip(self.images, clone.images.order_by('displayOrder')):
+            self.assertTrue(copy.image.name.startswith(f'products/{clone.pk}/'))
+            self.assertEqual(os.stat(copy.image.path).st_ino, os.stat(src.image.path).st_ino)
+
+    def test_legacy_clone_gets_its_own_thumbnails_with_fresh_mtime(self):
+        ImageBlob.objects.all().delete()
+        old = time.time() - 7200
+        for src in self.images:
+            for f in (src.image, src.thumbnail150, src.thumbnail800):
+                os.utime(f.path, (old, old))
+
+        clone = self.product.clone()
+        copies = list(clone.images.order_by('displayOrder'))
+        for copy in copies:
+            files = [copy.image, copy.thumbnail150, copy.thumbnail800] + [v.file for v in copy.variants.all()]
+            for f in files:
+                self.assertTrue(f.name.startswith(f'products/{clone.pk}/'))
+                # sweep_media 的寬限期以 mtime 判斷，硬連結也必須是新的
+                self.assertGreater(os.stat(f.path).st_mtime, old + 3600)
+            # thumbnail150 與其 JPEG 變體仍指向同一個複本
+            self.assertIn(copy.thumbnail150.name, [v.file.name for v in copy.variants.all()])
+
+        # 刪除原商品不影響複本的縮圖
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        wait_for_pending()
+        for copy in copies:
+            for f in [copy.image, copy.thumbnail150, copy.thumbnail800] + [v.file for v in copy.variants.all()]:
+                self.assertTrue(os.path.exists(f.path))
+
+    def test_api_and_admin_action(self):
+        response = self.client.post(reverse('api_clone_product', args=[self.product.pk]),
+                                    data={'productName': '變體商品'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['imageCount'], 3)
+        self.assertTrue(Product.objects.filter(productName='變體商品').exists())
+
+        response = self.client.post(reverse('admin:todolist_app_product_changelist'), {
+            'action': 'clone_products',
+            '_selected_action': [self.product.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Product.objects.filter(productName='原始商品 (複本)').count(), 1)
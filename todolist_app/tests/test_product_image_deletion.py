@@ -2,12 +2,32 @@
 商品圖片檔案刪除測試
 """
 from decimal import Decimal
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from todolist_app.media_cleanup import wait_for_pending
 from todolist_app.models import Product, ProductImage
 from PIL import Image
 import io
 import os
+import shutil
+import tempfile
+
+
+# 測試上傳的圖片與縮圖寫入暫存目錄，不寫入專案的 media/
+_mediaRoot = None
+_mediaOverride = None
+
+
+def setUpModule():
+    global _mediaRoot, _mediaOverride
+    _mediaRoot = tempfile.mkdtemp()
+    _mediaOverride = override_settings(MEDIA_ROOT=_mediaRoot)
+    _mediaOverride.enable()
+
+
+def tearDownModule():
+    _mediaOverride.disable()
+    shutil.rmtree(_mediaRoot, ignore_errors=True)
 
 
 class ProductImageDeletionTest(TestCase):
@@ -22,6 +42,12 @@ class ProductImageDeletionTest(TestCase):
             stockQuantity=100
         )
     
+    def delete_and_flush(self, obj):
+        """刪除物件並執行交易提交後的檔案清理（TestCase 不會真正提交交易）"""
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.delete()
+        wait_for_pending()
+
     def create_test_image(self, width=500, height=500):
         """建立測試用圖片"""
         image = Image.new('RGB', (width, height), color='green')
@@ -50,7 +76,7 @@ class ProductImageDeletionTest(TestCase):
         self.assertTrue(os.path.exists(image_path))
         
         # 刪除物件
-        product_image.delete()
+        self.delete_and_flush(product_image)
         
         # 驗證檔案已被刪除
         self.assertFalse(os.path.exists(image_path))
@@ -72,7 +98,7 @@ class ProductImageDeletionTest(TestCase):
         self.assertTrue(os.path.exists(thumb800_path))
         
         # 刪除物件
-        product_image.delete()
+        self.delete_and_flush(product_image)
         
         # 驗證縮圖已被刪除
         self.assertFalse(os.path.exists(thumb150_path))
@@ -116,12 +142,9 @@ class ProductImageDeletionTest(TestCase):
         product_image2.thumbnail800.close()
         
         # 刪除商品（級聯刪除所有圖片）
-        self.product.delete()
-        
-        # 驗證所有檔案已被刪除（給點時間讓 Windows 釋放檔案）
-        import time
-        time.sleep(0.5)
+        self.delete_and_flush(self.product)
         
+        # 驗證所有檔案已被刪除
         for path in paths:
             self.assertFalse(os.path.exists(path), f'檔案應已刪除: {path}')
     
@@ -153,7 +176,7 @@ class ProductImageDeletionTest(TestCase):
         
         # 嘗試刪除物件（不應該拋出異常）
         try:
-            product_image.delete()
+            self.delete_and_flush(product_image)
             # 驗證成功刪除
             self.assertFalse(ProductImage.objects.filter(id=product_image.id).exists())
         except Exception as e:
@@ -174,7 +197,7 @@ class ProductImageDeletionTest(TestCase):
         self.assertTrue(product_image.image.path.startswith(media_root))
         
         # 清理測試檔案
-        product_image.delete()
+        self.delete_and_flush(product_image)
         
         # 驗證清理成功
         self.assertFalse(os.path.exists(product_image.image.path))
@@ -0,0 +1,94 @@
+"""
+rerender_posts 管理指令測試
+"""
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from todolist_app.models import BlogPost
+from todolist_app.utils.markdown_renderer import RENDERER_VERSION, render_many
+
+
+class RerenderPostsCommandTest(TestCase):
+    """以目前渲染器批次重新產生 htmlContent"""
+
+    def setUp(self):
+        caches['default'].clear()
+        author = User.objects.create_user(username='rerender', password='pw')
+        self.posts = [
+            BlogPost.objects.create(
+                author=author, title=f'Rerender {i}', markdownContent=f'# 標題 {i}\n\n內容 {i % 2}',
+                status=BlogPost.STATUS_PUBLISHED,
+            )
+            for i in range(5)
+        ]
+        self.current = self.posts[4]
+        # 模擬舊版渲染器的輸出
+        BlogPost.objects.exclude(pk=self.current.pk).update(htmlContent='<p>stale</p>', rendererVersion='1')
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('rerender_posts', *args, stdout=out)
+        return out.getvalue()
+
+    def assert_fresh(self):
+        for post in BlogPost.objects.all():
+            self.assertEqual(post.rendererVersion, RENDERER_VERSION)
+            self.assertIn('標題', post.htmlContent)
+
+    def test_only_stale_posts_are_rerendered_in_process(self):
+        before = {p.pk: (p.slug, p.updatedAt) for p in BlogPost.objects.all()}
+        caches['default'].clear()
+
+        # 讀取 + 每批一個交易（savepoint、每筆一個條件式 UPDATE、release；批次 2 筆：2 + 2）
+        with self.assertNumQueries(9):
+            out = self.run_command('--workers', '1', '--batch-size', '2')
+
+        self.assertIn('Re-rendered 4 posts (0 from the render cache)', out)
+        self.assert_fresh()
+        # update() 不經過 save()：slug 與 updatedAt 都不變
+        self.assertEqual({p.pk: (p.slug, p.updatedAt) for p in BlogPost.objects.all()}, before)
+
+        self.assertIn('Re-rendered 0 posts', self.run_command('--workers', '1'))
+
+    def test_posts_edited_while_rendering_are_not_overwritten(self):
+        edited = self.posts[0]
+
+        def edit_then_render(items):
+            # 渲染期間文章被編輯：save() 已以新內容重新渲染
+            post = BlogPost.objects.get(pk=edited.pk)
+            post.markdownContent = '# 編輯後的標題'
+            post.save()
+            return render_many(items)
+
+        with mock.patch('todolist_app.management.commands.rerender_posts.render_many', side_effect=edit_then_render):
+            out = self.run_command('--workers', '1')
+
+        self.assertIn('Re-rendered 3 posts', out)
+        self.assertIn('skipped 1 edited while rendering', out)
+        post = BlogPost.objects.get(pk=edited.pk)
+        self.assertIn('編輯後的標題', post.htmlContent)
+        self.assertEqual(post.markdownContent, '# 編輯後的標題')
+
+    def test_process_pool_and_render_cache(self):
+        out = self.run_command('--workers', '2', '--batch-size', '2')
+        self.assertIn('Re-rendered 4 posts', out)
+        self.assert_fresh()
+
+        # 渲染結果寫入共用快取，--force 時全部由快取取得
+        out = self.run_command('--workers', '2', '--force')
+        self.assertIn('Re-rendered 5 posts (5 from the render cache)', out)
+
+    def test_cached_pages_are_invalidated(self):
+        post = self.posts[0]
+        url = reverse('blog_detail', kwargs={'slug': post.slug})
+        self.assertContains(self.client.get(url), 'stale')
+        etag = self.client.get(url)['ETag']
+
+        self.run_command('--workers', '1')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'stale')
@@ -0,0 +1,99 @@
+"""
+sweep_media 孤立媒體檔案清理指令測試
+"""
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from todolist_app.models import Category, Product, ProductImage
+from PIL import Image
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+def make_upload(name, color):
+    image = Image.new('RGB', (200, 200), color=color)
+    image_io = io.BytesIO()
+    image.save(image_io, format='JPEG')
+    return SimpleUploadedFile(name, image_io.getvalue(), content_type='image/jpeg')
+
+
+class SweepMediaCommandTest(TestCase):
+    """sweep_media 指令測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(
+            MEDIA_ROOT=self.mediaRoot,
+            THUMB_CACHE_DIR=os.path.join(self.mediaRoot, 'thumbcache'),
+        )
+        self.mediaOverride.enable()
+
+        product = Product.objects.create(productName='掃描商品', price=Decimal('2.00'))
+        self.productImage = ProductImage.objects.create(product=product, image=make_upload('keep.jpg', 'red'))
+        self.category = Category.objects.create(categoryName='掃描分類', image=make_upload('cat.jpg', 'blue'))
+
+        self.oldOrphan = self.write_file('products/999/thumbs/orphan.jpg', age=7200)
+        self.categoryOrphan = self.write_file('categories/999/orphan.jpg', age=7200)
+        self.freshOrphan = self.write_file('products/999/fresh.jpg', age=0)
+        self.cacheFile = self.write_file('thumbcache/ab/abcdef.jpg', age=7200)
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def write_file(self, name, age):
+        path = os.path.join(self.mediaRoot, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(b'orphan')
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def referenced_paths(self):
+        names = [self.productImage.image.name, self.category.image.name]
+        names += list(self.productImage.variants.values_list('file', flat=True))
+        return [os.path.join(self.mediaRoot, n) for n in names]
+
+    def test_removes_old_orphans_and_keeps_referenced_files(self):
+        out = StringIO()
+        call_command('sweep_media', stdout=out)
+
+        self.assertFalse(os.path.exists(self.oldOrphan))
+        self.assertFalse(os.path.exists(self.categoryOrphan))
+        self.assertFalse(os.path.isdir(os.path.join(self.mediaRoot, 'categories', '999')))
+        # 寬限期內的檔案與縮圖快取不受影響
+        self.assertTrue(os.path.exists(self.freshOrphan))
+        self.assertTrue(os.path.exists(self.cacheFile))
+        for path in self.referenced_paths():
+            self.assertTrue(os.path.exists(path), path)
+        self.assertIn('Removed 2 orphan files', out.getvalue())
+
+    def test_dry_run_writes_ndjson_report_without_deleting(self):
+        reportPath = os.path.join(self.mediaRoot, 'report.ndjson')
+        call_command('sweep_media', dry_run=True, report=reportPath, stdout=StringIO())
+
+        self.assertTrue(os.path.exists(self.oldOrphan))
+        with open(reportPath, encoding='utf-8') as fh:
+            records = [json.loads(line) for line in fh]
+        paths = {r['path'] for r in records}
+        self.assertEqual(paths, {'products/999/thumbs/orphan.jpg', 'categories/999/orphan.jpg'})
+        self.assertTrue(all(r['action'] == 'would-delete' for r in records))
+
+    def test_shard_and_grace_options(self):
+        call_command('sweep_media', shard=['products'], grace_seconds=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(self.oldOrphan))
+        self.assertFalse(os.path.exists(self.freshOrphan))
+        self.assertTrue(os.path.exists(self.categoryOrphan))
+
+    def test_cleanup_category_images_only_touches_categories(self):
+        call_command('cleanup_category_images', stdout=StringIO())
+        self.assertFalse(os.path.exists(self.categoryOrphan))
+        self.assertTrue(os.path.exists(self.oldOrphan))
+        self.assertTrue(os.path.exists(os.path.join(self.mediaRoot, self.category.image.name)))
@@ -0,0 +1,142 @@
+"""
+RSS / Atom 訂閱與 sitemap（串流、分段快取、版本失效）測試
+"""
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from todolist_app.models import BlogPost, Category, Product
+from xml.etree import ElementTree
+
+
+NS = {'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9', 'atom': 'http://www.w3.org/2005/Atom'}
+
+
+def body(response):
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+class BlogFeedTest(TestCase):
+    """文章訂閱"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='feeder', password='pw')
+        self.post = BlogPost.objects.create(
+            author=self.author, title='Feed Post', markdownContent='內文 **粗體**', tags='news', status=BlogPost.STATUS_PUBLISHED,
+        )
+        BlogPost.objects.create(author=self.author, title='Draft Post', markdownContent='x')
+
+    def test_rss_and_atom(self):
+        response = self.client.get(reverse('blog_feed_rss'))
+        self.assertEqual(response['Content-Type'], 'application/rss+xml; charset=utf-8')
+        self.assertTrue(response.streaming)
+        channel = ElementTree.fromstring(body(response)).find('channel')
+        items = channel.findall('item')
+        self.assertEqual([i.findtext('title') for i in items], ['Feed Post'])
+        self.assertTrue(items[0].findtext('link').endswith(reverse('blog_detail', kwargs={'slug': self.post.slug})))
+        self.assertEqual(items[0].findtext('description'), '內文 粗體')
+        self.assertEqual(items[0].findtext('category'), 'news')
+
+        atom = ElementTree.fromstring(body(self.client.get(reverse('blog_feed_atom'))))
+        self.assertEqual([e.findtext('atom:title', namespaces=NS) for e in atom.findall('atom:entry', NS)], ['Feed Post'])
+
+    def test_cached_with_conditional_get_and_invalidated_on_save(self):
+        url = reverse('blog_feed_rss')
+        first = self.client.get(url)
+        content = body(first)
+        with self.assertNumQueries(0):
+            self.assertEqual(body(self.client.get(url)), content)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertIn('public', first['Cache-Control'])
+
+        self.post.title = 'Renamed Post'
+        self.post.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        self.assertIn('Renamed Post', body(self.client.get(url)))
+
+
+@override_settings(SITEMAP_MAX_URLS=2, CATALOG_PRODUCT_URL='/shop/products/{id}/', CATALOG_CATEGORY_URL='')
+class SitemapTest(TestCase):
+    """sitemap index 與各區段"""
+
+    def setUp(self):
+        caches['default'].clear()
+        author = User.objects.create_user(username='mapper', password='pw')
+        self.posts = [
+            BlogPost.objects.create(author=author, title=f'Map {i}', markdownContent='x', status=BlogPost.STATUS_PUBLISHED)
+            for i in range(5)
+        ]
+        self.product = Product.objects.create(productName='上架商品', price=Decimal('1.00'))
+        Product.objects.create(productName='下架商品', price=Decimal('1.00'), isActive=False)
+        Category.objects.create(categoryName='未列出的分類')
+
+    def locs(self, url, tag):
+        root = ElementTree.fromstring(body(self.client.get(url)))
+        return [e.findtext('sm:loc', namespaces=NS) for e in root.findall(f'sm:{tag}', NS)]
+
+    def test_index_splits_sections_by_max_urls(self):
+        locs = self.locs(reverse('sitemap_index'), 'sitemap')
+        self.assertEqual([loc.rsplit('/', 1)[1] for loc in locs], [
+            'sitemap-posts-1.xml', 'sitemap-posts-2.xml', 'sitemap-posts-3.xml', 'sitemap-products-1.xml',
+        ])
+
+    def test_section_pages(self):
+        urls = []
+        for page in (1, 2, 3):
+            urls += self.locs(reverse('sitemap_section', kwargs={'section': 'posts', 'page': page}), 'url')
+        self.assertEqual(urls, [f'http://testserver/app/blog/{p.slug}/' for p in self.posts])
+        self.assertEqual(
+            self.locs(reverse('sitemap_section', kwargs={'section': 'products', 'page': 1}), 'url'),
+            [f'http://testserver/shop/products/{self.product.pk}/'],
+        )
+        self.assertEqual(self.client.get(reverse('sitemap_section', kwargs={'section': 'posts', 'page': 4})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('sitemap_section', kwargs={'section': 'categories', 'page': 1})).status_code, 404)
+
+    def test_catalog_changes_invalidate_product_sitemap(self):
+        url = reverse('sitemap_section', kwargs={'section': 'products', 'page': 1})
+        etag = self.client.get(url)['ETag']
+        postsEtag = self.client.get(reverse('sitemap_section', kwargs={'section': 'posts', 'page': 1}))['ETag']
+
+        self.product.isActive = False
+        self.product.save()
+        self.assertEqual(self.locs(url, 'url'), [])
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        # 文章的 sitemap 不受商品變更影響
+        self.assertEqual(self.client.get(reverse('sitemap_section', kwargs={'section': 'posts', 'page': 1}))['ETag'], postsEtag)
+
+
+@override_settings(SITEMAP_MAX_URLS=50000)
+class ChunkedSitemapCacheTest(TestCase):
+    """大型 sitemap 分段產生與分段快取"""
+
+    def setUp(self):
+        caches['default'].clear()
+        author = User.objects.create_user(username='chunker', password='pw')
+        BlogPost.objects.bulk_create([
+            BlogPost(author=author, title=f'Bulk {i}', slug=f'bulk-{i}', markdownContent='x', status=BlogPost.STATUS_PUBLISHED, publishedAt='2026-01-01T00:00:00Z')
+            for i in range(25)
+        ])
+        self.url = reverse('sitemap_section', kwargs={'section': 'posts', 'page': 1})
+
+    @mock.patch('todolist_app.views_syndication.CHUNK_ROWS', 10)
+    def test_chunks_are_cached_separately_and_evictions_regenerate(self):
+        chunks = list(self.client.get(self.url).streaming_content)
+        content = b''.join(chunks).decode('utf-8')
+        self.assertEqual(content.count('<url>'), 25)
+        # 開頭、3 段網址（10 + 10 + 5）、結尾，每段各自一個快取項目
+        self.assertEqual(len(chunks), 5)
+        cache = caches['default']
+        docKey = f'syndication:doc:http:testserver:sitemap:posts:1:50000:{cache.get("blog:list:version")}'
+        self.assertEqual(cache.get(docKey), 5)
+        self.assertEqual(cache.get(f'{docKey}:2').count('<url>'), 10)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(body(self.client.get(self.url)), content)
+
+        # 串流中途遺失一段時重新產生，並略過已送出的部分
+        cache.delete(f'{docKey}:2')
+        self.assertEqual(body(self.client.get(self.url)), content)
@@ -0,0 +1,158 @@
+"""
+依需求產生縮圖（/media/thumb/）與磁碟快取測試
+"""
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from todolist_app import thumb_cache
+from todolist_app.image_utils import get_variant_specs, render_variants
+from todolist_app.models import ImageBlob, Product, ProductImage
+from PIL import Image
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+LAZY_VARIANTS = {
+    'thumb150': {'size': 150, 'crop': 'square', 'formats': ['JPEG']},
+    'card300': {'size': 300, 'crop': 'cover', 'formats': ['WEBP', 'JPEG'], 'eager': False},
+}
+
+
+def create_test_image(name='lazy.jpg', color='red'):
+    image = Image.new('RGB', (600, 400), color=color)
+    image_io = io.BytesIO()
+    image.save(image_io, format='JPEG')
+    return SimpleUploadedFile(name, image_io.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(IMAGE_VARIANTS=LAZY_VARIANTS)
+class ThumbnailEndpointTest(TestCase):
+    """on-demand 縮圖端點測試"""
+
+    def setUp(self):
+        self.mediaRoot = tempfile.mkdtemp()
+        self.mediaOverride = override_settings(
+            MEDIA_ROOT=self.mediaRoot,
+            THUMB_CACHE_DIR=os.path.join(self.mediaRoot, 'thumbcache'),
+        )
+        self.mediaOverride.enable()
+        self.product = Product.objects.create(productName='縮圖商品', price=Decimal('5.00'))
+        self.productImage = ProductImage.objects.create(product=self.product, image=create_test_image())
+
+    def tearDown(self):
+        self.mediaOverride.disable()
+        shutil.rmtree(self.mediaRoot, ignore_errors=True)
+
+    def test_lazy_variant_not_generated_at_upload(self):
+        names = set(self.productImage.variants.values_list('variantName', flat=True))
+        self.assertEqual(names, {'thumb150'})
+
+    def test_first_request_renders_then_serves_from_cache(self):
+        url = f'/media/thumb/{self.productImage.pk}/card300'
+        with mock.patch('todolist_app.thumb_cache.render_variants', side_effect=render_variants) as spy:
+            first = self.client.get(url, HTTP_ACCEPT='image/webp')
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(first['Content-Type'], 'image/webp')
+            body = b''.join(first.streaming_content)
+            second = self.client.get(url, HTTP_ACCEPT='image/webp')
+            self.assertEqual(b''.join(second.streaming_content), body)
+        self.assertEqual(spy.call_count, 1)
+
+        with Image.open(io.BytesIO(body)) as img:
+            self.assertEqual(img.size, (300, 300))
+
+    def test_cache_is_addressed_by_content_hash(self):
+        url = f'/media/thumb/{self.productImage.pk}/card300'
+        blob = ImageBlob.objects.get(fileName=self.productImage.image.name)
+        first = b''.join(self.client.get(url).streaming_content)
+
+        # 同一檔名寫入不同內容（雜湊隨之改變）時不得取得舊縮圖
+        storage = self.productImage.image.storage
+        storage.delete(blob.fileName)
+        storage.save(blob.fileName, create_test_image(color='green'))
+        ImageBlob.objects.filter(pk=blob.pk).update(contentHash='0' * 64)
+        with mock.patch('todolist_app.thumb_cache.render_variants', side_effect=render_variants) as spy:
+            second = b''.join(self.client.get(url).streaming_content)
+        self.assertEqual(spy.call_count, 1)
+        self.assertNotEqual(first, second)
+
+        # 相同內容不論檔名都共用同一個快取項目；沒有 ImageBlob 的舊資料才以檔名定址
+        spec = get_variant_specs()['card300']
+        image = self.productImage.image
+        self.assertEqual(
+            thumb_cache.cache_key(thumb_cache.source_id(image, 'a' * 64), spec, 'JPEG'),
+            thumb_cache.cache_key(thumb_cache.source_id(mock.Mock(name='other.jpg'), 'a' * 64), spec, 'JPEG'),
+        )
+        self.assertEqual(thumb_cache.source_id(image), f'name:{image.name}')
+
+    def test_eager_variant_served_from_stored_file(self):
+        with mock.patch('todolist_app.thumb_cache.render_variants') as spy:
+            response = self.client.get(f'/media/thumb/{self.productImage.pk}/thumb150')
+            self.assertEqual(response.status_code, 200)
+            response.close()
+        spy.assert_not_called()
+
+    def test_unknown_variant_or_image_returns_404(self):
+        self.assertEqual(self.client.get(f'/media/thumb/{self.productImage.pk}/nope').status_code, 404)
+        self.assertEqual(self.client.get('/media/thumb/999999/card300').status_code, 404)
+
+    def test_concurrent_requests_render_once(self):
+        spec = get_variant_specs()['card300']
+        calls = []
+
+        def slowRender(*args, **kwargs):
+            calls.append(1)
+            time.sleep(0.2)
+            return render_variants(*args, **kwargs)
+
+        paths = []
+        # 每個執行緒使用各自的 instance，模擬不同請求
+        images = [ProductImage.objects.get(pk=self.productImage.pk) for _ in range(5)]
+
+        def worker(image):
+            paths.append(thumb_cache.get_or_render(image.image, spec, 'JPEG'))
+
+        with mock.patch('todolist_app.thumb_cache.render_variants', side_effect=slowRender):
+            threads = [threading.Thread(target=worker, args=(image,)) for image in images]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(paths)), 1)
+        self.assertTrue(os.path.isfile(paths[0]))
+
+
+class ThumbnailCacheEvictionTest(TestCase):
+    """磁碟快取 LRU 淘汰測試"""
+
+    def setUp(self):
+        self.cacheRoot = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheRoot, ignore_errors=True)
+
+    def test_least_recently_used_files_evicted_first(self):
+        paths = []
+        now = time.time()
+        for i in range(5):
+            path = os.path.join(self.cacheRoot, f'{i:02d}', f'{i:02d}entry.jpg')
+            thumb_cache._write_atomic(path, b'x' * 100)
+            os.utime(path, (now - 100 + i, now - 100 + i))
+            paths.append(path)
+
+        # 將最舊的檔案標記為最近使用
+        thumb_cache._touch(paths[0])
+
+        total = thumb_cache.evict(self.cacheRoot, limit=300)
+        self.assertLessEqual(total, 300)
+        self.assertTrue(os.path.exists(paths[0]))
+        self.assertFalse(os.path.exists(paths[1]))
+        self.assertFalse(os.path.exists(paths[2]))
+        self.assertTrue(os.path.exists(paths[4]))
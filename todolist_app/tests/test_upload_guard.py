@@ -0,0 +1,95 @@
+"""
+上傳串流階段的圖片檢查（ImageUploadGuardHandler）測試
+"""
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase
+from todolist_app.image_utils import MAX_FILE_SIZE, sniff_image_header
+from todolist_app.models import Product, ProductImage
+from todolist_app.upload_handlers import ImageUploadGuardHandler, RejectedUpload
+from PIL import Image
+import io
+
+
+def make_image_bytes(fmt='JPEG', size=(320, 240), mode='RGB', **kwargs):
+    image = Image.new(mode, size, color='red')
+    image_io = io.BytesIO()
+    image.save(image_io, format=fmt, **kwargs)
+    return image_io.getvalue()
+
+
+class SniffImageHeaderTest(TestCase):
+    """由前段位元組判斷格式與尺寸"""
+
+    def test_formats_and_dimensions(self):
+        cases = [
+            ('JPEG', make_image_bytes('JPEG', exif=b'Exif\x00\x00' + b'\x00' * 2000)),
+            ('PNG', make_image_bytes('PNG')),
+            ('WEBP', make_image_bytes('WEBP')),
+            ('WEBP', make_image_bytes('WEBP', lossless=True)),
+            ('WEBP', make_image_bytes('WEBP', mode='RGBA')),
+        ]
+        for fmt, data in cases:
+            self.assertEqual(sniff_image_header(data[:4096]), (fmt, (320, 240)))
+
+    def test_short_or_unknown_data(self):
+        self.assertEqual(sniff_image_header(b'\xff\xd8\xff\xe0'), ('JPEG', None))
+        self.assertEqual(sniff_image_header(b'GIF89a......'), (None, None))
+        with self.assertRaises(ValueError):
+            sniff_image_header(b'\x89PNG\r\n\x1a\n' + b'\x00' * 16)
+
+
+class ImageUploadGuardHandlerTest(TestCase):
+    """串流上傳時提早拒絕檔案"""
+
+    def start(self, name='a.jpg', content_type='image/jpeg'):
+        handler = ImageUploadGuardHandler()
+        handler.new_file('image', name, content_type, None)
+        return handler
+
+    def test_valid_image_passes_through(self):
+        data = make_image_bytes()
+        handler = self.start()
+        self.assertEqual(handler.receive_data_chunk(data, 0), data)
+        self.assertIsNone(handler.file_complete(len(data)))
+
+    def test_junk_rejected_on_first_chunk(self):
+        handler = self.start()
+        self.assertIsNone(handler.receive_data_chunk(b'<?php echo 1; ?>' * 10, 0))
+        self.assertIsNone(handler.receive_data_chunk(b'more', 160))
+        rejected = handler.file_complete(164)
+        self.assertIsInstance(rejected, RejectedUpload)
+        self.assertEqual(rejected.size, 0)
+        self.assertIn('無效的圖片檔案', rejected.rejectionReason)
+
+    def test_dimensions_rejected_from_header(self):
+        data = make_image_bytes('PNG', size=(4500, 10))
+        handler = self.start('wide.png', 'image/png')
+        self.assertIsNone(handler.receive_data_chunk(data[:1024], 0))
+        self.assertIn('4000', handler.file_complete(1024).rejectionReason)
+
+    def test_byte_limit_stops_forwarding(self):
+        data = make_image_bytes()
+        handler = self.start()
+        self.assertEqual(handler.receive_data_chunk(data, 0), data)
+        chunk = b'\x00' * (1024 * 1024)
+        forwarded = [handler.receive_data_chunk(chunk, 0) for _ in range(MAX_FILE_SIZE // len(chunk) + 2)]
+        self.assertIsNone(forwarded[-1])
+        self.assertIn(str(MAX_FILE_SIZE), handler.file_complete(0).rejectionReason)
+
+    def test_non_image_upload_is_ignored(self):
+        handler = self.start('notes.txt', 'text/plain')
+        self.assertEqual(handler.receive_data_chunk(b'hello', 0), b'hello')
+        self.assertIsNone(handler.file_complete(5))
+
+    def test_rejection_surfaces_as_validation_error(self):
+        product = Product.objects.create(productName='上傳商品', price=Decimal('1.00'))
+        upload = SimpleUploadedFile('fake.jpg', b'not an image at all', content_type='image/jpeg')
+        request = RequestFactory().post('/upload/', {'image': upload})
+        uploaded = request.FILES['image']
+        self.assertIsInstance(uploaded, RejectedUpload)
+
+        with self.assertRaises(ValidationError) as context:
+            ProductImage(product=product, image=uploaded).full_clean()
+        self.assertIn('image', context.exception.message_dict)
@@ -0,0 +1,177 @@
+"""
+依需求產生縮圖的磁碟快取
+
+快取鍵由原圖的內容雜湊（沒有 ImageBlob 的舊圖片用檔名）與變體參數組成；超過 THUMB_CACHE_MAX_BYTES 時淘汰最久未使用的檔案。
+同一行程內的同時請求只產生一次，跨行程以暫存檔加 rename 原子寫入。
+"""
+from contextlib import contextmanager
+from dataclasses import replace
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from .image_utils import FORMAT_EXTENSIONS, render_variants
+import hashlib
+import os
+import tempfile
+import threading
+
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Evict down to this fraction of the limit so eviction does not run on every write
+EVICT_TARGET_RATIO = 0.9
+
+_locks = {}
+_locksGuard = threading.Lock()
+_sizeLock = threading.Lock()
+_cachedBytes = {}
+
+
+def cache_dir():
+    configured = getattr(settings, 'THUMB_CACHE_DIR', None)
+    # 不放在 MEDIA_ROOT 之下，避免快取檔案經由 /media/ 公開
+    return str(configured or os.path.join(tempfile.gettempdir(), 'thumbcache'))
+
+
+def cache_storage():
+    """Storage rooted at the cache directory, for serving cached files.
+
+    The cache is deliberately node-local disk: every web node renders and
+    evicts its own copies, only the source images live in shared media storage.
+    """
+    return FileSystemStorage(location=cache_dir())
+
+
+def max_bytes():
+    return int(getattr(settings, 'THUMB_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+
+
+def cache_key(source, spec, fmt):
+    """`source` identifies the image content: `source_id()` of the original."""
+    raw = f'{source}|{spec.size}|{spec.crop}|{spec.quality}|{fmt}'
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def source_id(fieldFile, contentHash=None):
+    if contentHash:
+        return f'blob:{contentHash}'
+    return f'name:{fieldFile.name}'
+
+
+def cache_path(key, fmt):
+    return os.path.join(cache_dir(), key[:2], f'{key}.{FORMAT_EXTENSIONS[fmt]}')
+
+
+@contextmanager
+def _key_lock(key):
+    with _locksGuard:
+        entry = _locks.get(key)
+        if entry is None:
+            entry = _locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locksGuard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _locks[key]
+
+
+def _touch(path):
+    """Mark `path` as recently used; return False when it is not cached."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmpPath = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmpPath, path)
+    except BaseException:
+        try:
+            os.remove(tmpPath)
+        except OSError:
+            pass
+        raise
+
+
+def _scan(root):
+    """Return [(mtime, size, path)] for every cached file under root."""
+    entries = []
+    try:
+        shards = list(os.scandir(root))
+    except FileNotFoundError:
+        return entries
+    for shard in shards:
+        if not shard.is_dir(follow_symlinks=False):
+            continue
+        for entry in os.scandir(shard.path):
+            if entry.is_file(follow_symlinks=False) and not entry.name.endswith('.tmp'):
+                st = entry.stat(follow_symlinks=False)
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    return entries
+
+
+def evict(root=None, limit=None):
+    """Delete least recently used files until the cache fits in `limit` bytes."""
+    root = root or cache_dir()
+    limit = max_bytes() if limit is None else limit
+    entries = _scan(root)
+    total = sum(size for _, size, _ in entries)
+    if total > limit:
+        target = int(limit * EVICT_TARGET_RATIO)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                total -= size
+            except OSError:
+                pass
+    return total
+
+
+def _account(root, added):
+    with _sizeLock:
+        if root not in _cachedBytes:
+            _cachedBytes[root] = sum(size for _, size, _ in _scan(root))
+        else:
+            _cachedBytes[root] += added
+        if _cachedBytes[root] > max_bytes():
+            _cachedBytes[root] = evict(root)
+
+
+def get_or_render(fieldFile, spec, fmt, contentHash=None):
+    """Return the path of the cached `spec` rendering of `fieldFile` in `fmt`.
+
+    `contentHash` is the source's ImageBlob hash when it has one. Renders and
+    stores it on a miss; hits only cost a stat/utime.
+    """
+    key = cache_key(source_id(fieldFile, contentHash), spec, fmt)
+    path = cache_path(key, fmt)
+    if _touch(path):
+        return path
+
+    with _key_lock(key):
+        # another request may have rendered it while we waited
+        if _touch(path):
+            return path
+        fieldFile.open('rb')
+        try:
+            _, _, content, _, _ = render_variants(fieldFile, [replace(spec, formats=(fmt,))])[0]
+        finally:
+            fieldFile.close()
+        data = content.read()
+        _write_atomic(path, data)
+
+    _account(cache_dir(), len(data))
+    return path
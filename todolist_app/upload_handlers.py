@@ -0,0 +1,121 @@
+"""Upload handlers that inspect file content while the request body streams in.
+
+``ImageUploadGuardHandler`` must come first in ``FILE_UPLOAD_HANDLERS``. It
+checks the magic bytes and header of every image upload as the first chunks
+arrive and stops passing data on once the file turns out to be junk, too
+large in bytes or too large in pixels. The rejected file never reaches the
+memory/temporary-file handlers after that point, and the field receives a
+``RejectedUpload`` whose reason ``validate_image_file`` reports as a normal
+form error.
+
+The hashing handlers attach the digest to the resulting UploadedFile as
+``contentHash`` so content-addressed storage (see ``ImageBlob`` in models)
+does not have to re-read the file after the upload completes.
+"""
+from io import BytesIO
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.core.exceptions import ValidationError
+from .image_utils import (
+    ALLOWED_EXTENSIONS, HEADER_SNIFF_BYTES, MAGIC_BYTES_LENGTH, MAX_FILE_SIZE,
+    _get_extension, check_image_size, new_content_hasher, sniff_image_header,
+)
+
+
+class RejectedUpload(UploadedFile):
+    """Empty placeholder for an upload the guard handler refused to store."""
+
+    def __init__(self, name, content_type, charset, reason):
+        super().__init__(BytesIO(), name, content_type, 0, charset)
+        self.rejectionReason = reason
+
+
+class ImageUploadGuardHandler(FileUploadHandler):
+    """Reject invalid or oversized image uploads before they are spooled."""
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.guarded = (content_type or '').startswith('image/') or _get_extension(file_name) in ALLOWED_EXTENSIONS
+        self.header = bytearray()
+        self.headerChecked = False
+        self.received = 0
+        self.rejection = None
+        if self.guarded and content_length and content_length > MAX_FILE_SIZE:
+            self._reject(f'圖片檔案大小不可超過 {MAX_FILE_SIZE} bytes')
+
+    def _reject(self, reason):
+        self.rejection = reason
+        self.header = bytearray()
+        # 回傳 None 讓後續 handler 不再收到此檔案的資料
+        return None
+
+    def _check_header(self, final=False):
+        try:
+            fmt, size = sniff_image_header(bytes(self.header))
+        except ValueError as e:
+            return self._reject(f'無效的圖片檔案: {e}')
+        if fmt is None:
+            if final or len(self.header) >= MAGIC_BYTES_LENGTH:
+                return self._reject('無效的圖片檔案: 無法辨識的圖片格式')
+            return None
+        if size is not None:
+            self.headerChecked = True
+            self.header = bytearray()
+            try:
+                check_image_size(*size)
+            except ValidationError as e:
+                return self._reject(e.message_dict['image'][0])
+        elif final or len(self.header) >= HEADER_SNIFF_BYTES:
+            # 標頭不在前段資料中，交由 Pillow 在驗證時處理
+            self.headerChecked = True
+        return None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.guarded:
+            return raw_data
+        if self.rejection:
+            return None
+
+        self.received += len(raw_data)
+        if self.received > MAX_FILE_SIZE:
+            return self._reject(f'圖片檔案大小不可超過 {MAX_FILE_SIZE} bytes')
+
+        if not self.headerChecked:
+            self.header += raw_data[:HEADER_SNIFF_BYTES - len(self.header)]
+            self._check_header()
+            if self.rejection:
+                return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.guarded and not self.rejection and not self.headerChecked:
+            self._check_header(final=True)
+        if self.rejection:
+            return RejectedUpload(self.file_name, self.content_type, self.charset, self.rejection)
+        return None
+
+
+class ContentHashMixin:
+    def new_file(self, *args, **kwargs):
+        # 需在 super() 之前建立：MemoryFileUploadHandler 啟用時會拋出 StopFutureHandlers
+        self.contentHasher = new_content_hasher()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if getattr(self, 'activated', True):
+            self.contentHasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file_obj = super().file_complete(file_size)
+        if file_obj is not None:
+            file_obj.contentHash = self.contentHasher.hexdigest()
+        return file_obj
+
+
+class HashingMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
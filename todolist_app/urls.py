@@ -2,6 +2,7 @@ from django.urls import path
 from . import views
 from django.contrib.auth import views as auth_views
 from . import views_api
+from . import views_syndication
 
 urlpatterns = [
     # Todo 相關路由
@@ -18,10 +19,21 @@ urlpatterns = [
     path('blog/', views.blog_list, name='blog_list'),
     path('blog/new/', views.blog_create, name='blog_create'),
     path('blog/drafts/', views.blog_drafts, name='blog_drafts'),
+    path('blog/tag/<str:slug>/', views.blog_tag, name='blog_tag'),
+    path('blog/feed/rss/', views_syndication.blog_feed, {'kind': 'rss'}, name='blog_feed_rss'),
+    path('blog/feed/atom/', views_syndication.blog_feed, {'kind': 'atom'}, name='blog_feed_atom'),
     path('blog/<slug:slug>/', views.blog_detail, name='blog_detail'),
     path('blog/<slug:slug>/edit/', views.blog_edit, name='blog_edit'),
     # API: categories and product-category assignment
     path('api/categories/', views_api.api_categories_list, name='api_categories_list'),
     path('api/categories/<int:category_id>/products/', views_api.api_category_products, name='api_category_products'),
     path('api/products/<int:product_id>/categories/', views_api.api_assign_product_categories, name='api_assign_product_categories'),
+    path('api/products/<int:product_id>/images/', views_api.api_product_images, name='api_product_images'),
+    path('api/products/<int:product_id>/images/bulk/', views_api.api_product_images_bulk, name='api_product_images_bulk'),
+    path('api/products/<int:product_id>/clone/', views_api.api_clone_product, name='api_clone_product'),
+    path('api/products/<int:product_id>/images/reorder/', views_api.api_product_images_reorder, name='api_product_images_reorder'),
+    path('api/blog/search/', views_api.api_blog_search, name='api_blog_search'),
+    # 訂閱與 sitemap
+    path('sitemap.xml', views_syndication.sitemap_index, name='sitemap_index'),
+    path('sitemap-<str:section>-<int:page>.xml', views_syndication.sitemap_section, name='sitemap_section'),
 ]
\ No newline at end of file
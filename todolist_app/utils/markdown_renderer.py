@@ -2,15 +2,215 @@
 # - 說明：將 Markdown 轉為 HTML，並使用 Bleach 做消毒以防 XSS
 # - 註解：依憲法規範使用繁體中文註解，函式與變數採駝峰式命名
 
-from typing import List
+import hashlib
+import html
+import math
+import re
+import threading
 
 try:
     import markdown
     import bleach
+    from bleach.linkifier import LinkifyFilter
+    from markdown.extensions.toc import slugify_unicode
 except Exception:
     # 如果套件尚未安裝，讓開發者在執行時安裝；此處不會中止 import
     markdown = None
     bleach = None
+    LinkifyFilter = None
+    slugify_unicode = None
+
+
+# 渲染器版本：調整擴充功能、允許的 tags/attributes 等會改變輸出的設定時必須遞增，
+# 舊版本的快取與文章的 htmlContent 才會被視為過期
+RENDERER_VERSION = '4'
+
+# 共用渲染快取的前綴與保存時間（同一組 (雜湊, 版本) 的輸出永遠相同，可長期保存）
+RENDER_CACHE_PREFIX = 'markdown'
+RENDER_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+# Markdown 擴充功能（CommonMark 風格；視需求可調整，調整後請遞增 RENDERER_VERSION）
+EXTENSIONS: tuple[str, ...] = (
+    'extra',
+    'codehilite',
+    'toc',
+)
+
+# 標題錨點 id 的固定前綴：消毒時只放行此前綴的 id，作者無法在文章中設定
+# csrftoken 之類的 id 覆蓋頁面上的元素（DOM clobbering）或與頁面錨點衝突
+HEADING_ID_PREFIX = 'toc-'
+
+
+def heading_slugify(value, separator):
+    """toc 的 slugify：保留中文（預設的 slugify 會把中文標題變成 `_1` 之類的 id）並加上固定前綴"""
+    return HEADING_ID_PREFIX + slugify_unicode(value, separator)
+
+
+EXTENSION_CONFIGS = {
+    'toc': {'slugify': heading_slugify},
+}
+
+# 閱讀統計與摘錄：英文等以空白分隔的語言每分鐘 200 字，中日韓文字每分鐘 400 字
+WORDS_PER_MINUTE = 200
+CJK_CHARS_PER_MINUTE = 400
+EXCERPT_LENGTH = 200
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+WORD_RE = re.compile(r'\w+')
+TAG_RE = re.compile(r'<[^>]+>')
+HEADING_RE = re.compile(r'<h[1-6][^>]*>.*?</h[1-6]>', re.S)
+
+def heading_attribute(tag, name, value):
+    # 標題只保留 toc 產生（帶固定前綴）的 id
+    return name == 'id' and value.startswith(HEADING_ID_PREFIX)
+
+
+# Bleach 允許的 tags & attributes（可視安全需求收斂）
+ALLOWED_TAGS = frozenset(bleach.sanitizer.ALLOWED_TAGS) | {
+    'p', 'pre', 'code', 'img', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'thead', 'tbody', 'tr', 'th', 'td'
+} if bleach is not None else frozenset()
+ALLOWED_ATTRIBUTES = {
+    **bleach.sanitizer.ALLOWED_ATTRIBUTES,
+    'img': ['src', 'alt', 'title'],
+    'a': ['href', 'title', 'rel'],
+    'th': ['colspan', 'rowspan'],
+    # toc 產生的標題錨點
+    **{f'h{level}': heading_attribute for level in range(1, 7)},
+} if bleach is not None else {}
+
+
+class MarkdownEngine:
+    """可重複使用的 Markdown → 安全 HTML 渲染器。
+
+    - 每個執行緒各保留一個 `markdown.Markdown` 實例，每次渲染前 `reset()` 後重用，
+      不必每次重新載入擴充功能與建立處理管線
+    - 每個執行緒各保留一個 `bleach.Cleaner`，並以 `LinkifyFilter` 在同一次解析中
+      完成消毒與自動連結，HTML 只解析一次（Cleaner 不是 thread-safe，因此不跨執行緒共用）
+    """
+
+    def __init__(self, extensions=EXTENSIONS, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES):
+        self.extensions = list(extensions)
+        self.tags = tags
+        self.attributes = attributes
+        self._local = threading.local()
+
+    def _markdown(self):
+        md = getattr(self._local, 'markdown', None)
+        if md is None:
+            md = self._local.markdown = markdown.Markdown(
+                extensions=self.extensions,
+                extension_configs={name: config for name, config in EXTENSION_CONFIGS.items() if name in self.extensions},
+                output_format='html5',
+            )
+        return md
+
+    def _cleaner(self):
+        cleaner = getattr(self._local, 'cleaner', None)
+        if cleaner is None:
+            cleaner = self._local.cleaner = bleach.sanitizer.Cleaner(
+                tags=self.tags,
+                attributes=self.attributes,
+                filters=[LinkifyFilter],
+            )
+        return cleaner
+
+    def render(self, markdownText: str) -> str:
+        md = self._markdown()
+        # reset() 清除上一篇文章的 toc、註腳與參考連結等狀態
+        unsafeHtml = md.reset().convert(markdownText or '')
+        return self._cleaner().clean(unsafeHtml)
+
+    def render_document(self, markdownText: str) -> dict:
+        """渲染 HTML，並一併產生目錄與閱讀統計（同一次 Markdown 解析）。
+
+        回傳的 dict 可直接存入快取：
+        - `html`: 經過消毒的 HTML
+        - `tocHtml` / `toc`: 目錄 HTML 與巢狀結構（level、id、name、children）
+        - `wordCount`、`readingMinutes`、`excerpt`: 由純文字計算
+        """
+        safeHtml = self.render(markdownText)
+        toc = [_toc_entry(token) for token in getattr(self._markdown(), 'toc_tokens', [])]
+        text = html_to_text(safeHtml)
+        wordCount, readingMinutes = text_stats(text)
+        return {
+            'html': safeHtml,
+            'tocHtml': toc_html(toc),
+            'toc': toc,
+            'wordCount': wordCount,
+            'readingMinutes': readingMinutes,
+            # 摘錄略過標題，從內文開始
+            'excerpt': make_excerpt(html_to_text(HEADING_RE.sub(' ', safeHtml))),
+        }
+
+
+def _toc_entry(token):
+    # toc 擴充功能給的 name 已跳脫 HTML，這裡存原始文字，輸出時再跳脫
+    return {
+        'level': token['level'],
+        # 作者以 {#id} 自訂、不帶前綴的 id 會被消毒移除，目錄中也不產生連結
+        'id': token['id'] if token['id'].startswith(HEADING_ID_PREFIX) else '',
+        'name': html.unescape(token['name']),
+        'children': [_toc_entry(child) for child in token.get('children', [])],
+    }
+
+
+def toc_html(toc) -> str:
+    """由目錄結構產生巢狀清單（自行跳脫，不需再經過 bleach）"""
+    if not toc:
+        return ''
+
+    def items(entries):
+        parts = []
+        for entry in entries:
+            children = f'<ul>{items(entry["children"])}</ul>' if entry['children'] else ''
+            name = html.escape(entry['name'])
+            if entry['id']:
+                name = f'<a href="#{html.escape(entry["id"])}">{name}</a>'
+            parts.append(f'<li>{name}{children}</li>')
+        return ''.join(parts)
+
+    return f'<nav class="toc"><ul>{items(toc)}</ul></nav>'
+
+
+def html_to_text(safeHtml: str) -> str:
+    """把已消毒的 HTML 轉為單行純文字"""
+    return ' '.join(html.unescape(TAG_RE.sub(' ', safeHtml or '')).split())
+
+
+def text_stats(text: str) -> tuple[int, int]:
+    """回傳 (字數, 閱讀分鐘數)：中日韓文字每字計 1，其餘以單字計"""
+    cjkCount = len(CJK_RE.findall(text))
+    wordCount = len(WORD_RE.findall(CJK_RE.sub(' ', text)))
+    if not cjkCount and not wordCount:
+        return 0, 0
+    minutes = wordCount / WORDS_PER_MINUTE + cjkCount / CJK_CHARS_PER_MINUTE
+    return cjkCount + wordCount, max(1, math.ceil(minutes))
+
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    """取純文字開頭作為摘錄；截斷時避免切在英文單字中間並加上刪節號"""
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    if text[length].isalnum() and cut[-1].isalnum() and not CJK_RE.match(cut[-1]):
+        head, sep, _ = cut.rpartition(' ')
+        if sep and len(head) > length // 2:
+            cut = head
+    return cut.rstrip() + '…'
+
+
+_engine = None
+_engineLock = threading.Lock()
+
+
+def get_engine() -> MarkdownEngine:
+    """回傳模組共用的 MarkdownEngine（第一次使用時建立）"""
+    global _engine
+    if _engine is None:
+        with _engineLock:
+            if _engine is None:
+                _engine = MarkdownEngine()
+    return _engine
 
 
 def render_markdown(markdownText: str) -> str:
@@ -26,29 +226,55 @@ def render_markdown(markdownText: str) -> str:
     if markdown is None or bleach is None:
         raise RuntimeError('請安裝 markdown 與 bleach 套件以啟用 markdown 渲染')
 
-    # 使用 CommonMark 風格的擴充功能集合（視需求可調整）
-    extensions: List[str] = [
-        'extra',
-        'codehilite',
-        'toc',
-    ]
-
-    # 先將 Markdown 轉為未消毒的 HTML
-    unsafeHtml = markdown.markdown(markdownText or '', extensions=extensions, output_format='html5')
-
-    # Bleach 允許的 tags & attributes（可視安全需求收斂）
-    allowedTags = list(bleach.sanitizer.ALLOWED_TAGS) + [
-        'p', 'pre', 'code', 'img', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'thead', 'tbody', 'tr', 'th', 'td'
-    ]
-    allowedAttributes = {
-        **bleach.sanitizer.ALLOWED_ATTRIBUTES,
-        'img': ['src', 'alt', 'title'],
-        'a': ['href', 'title', 'rel'],
-        'th': ['colspan', 'rowspan'],
-    }
+    return get_engine().render(markdownText)
+
+
+def render_document(markdownText: str) -> dict:
+    """渲染 HTML 並產生目錄與閱讀統計，詳見 MarkdownEngine.render_document"""
+    if markdown is None or bleach is None:
+        raise RuntimeError('請安裝 markdown 與 bleach 套件以啟用 markdown 渲染')
 
-    # 清理 HTML 並自動將連結轉為安全連結
-    cleaned = bleach.clean(unsafeHtml, tags=allowedTags, attributes=allowedAttributes)
-    linked = bleach.linkify(cleaned)
+    return get_engine().render_document(markdownText)
 
-    return linked
+
+def render_many(items):
+    """批次渲染 [(key, markdownText), ...]，回傳 [(key, render_document 的結果), ...]。
+
+    供 rerender_posts 在 ProcessPoolExecutor 的子行程中呼叫；本模組在 import 時不依賴
+    Django 設定，子行程不需要 django.setup()，每個行程各自重用一個 MarkdownEngine。
+    """
+    return [(key, render_document(markdownText)) for key, markdownText in items]
+
+
+def markdown_content_hash(markdownText: str) -> str:
+    """回傳 Markdown 原文的 BLAKE2b 雜湊（64 個十六進位字元）"""
+    return hashlib.blake2b((markdownText or '').encode('utf-8'), digest_size=32).hexdigest()
+
+
+def render_cache():
+    """共用渲染快取（settings.MARKDOWN_RENDER_CACHE）"""
+    from django.conf import settings
+    from django.core.cache import caches
+    return caches[getattr(settings, 'MARKDOWN_RENDER_CACHE', 'default')]
+
+
+def render_cache_key(contentHash: str) -> str:
+    return f'{RENDER_CACHE_PREFIX}:{RENDERER_VERSION}:{contentHash}'
+
+
+def render_document_cached(markdownText: str, contentHash: str | None = None) -> tuple[dict, str]:
+    """依 (內容雜湊, 渲染器版本) 查詢共用快取，未命中才渲染。
+
+    相同內容的文章（不論是哪一篇）只會渲染一次。
+
+    回傳：
+    - (render_document 的結果, 內容雜湊)
+    """
+    contentHash = contentHash or markdown_content_hash(markdownText)
+    cacheKey = render_cache_key(contentHash)
+    cache = render_cache()
+    document = cache.get(cacheKey)
+    if document is None:
+        document = render_document(markdownText)
+        cache.set(cacheKey, document, RENDER_CACHE_TIMEOUT)
+    return document, contentHash
@@ -1,25 +1,150 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden
+from django.db.models import Q
+from django.http import Http404, HttpResponseForbidden
+from django.urls import reverse
+from django.utils.functional import cached_property
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from .models import BlogPost, Todo
+from .models import BlogPost, Tag, Todo
 from .forms import BlogPostForm, TodoForm
+from .blog_cache import (
+    cached_page, detail_page_key, is_cacheable, list_cache_timeout, list_page_key, list_version, make_etag, tag_page_key,
+)
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
 
 
 # ==================== Blog 相關視圖 ====================
 
-# 列出公開文章
+# 文章列表每頁筆數（可由 settings.BLOG_LIST_PAGE_SIZE 覆寫）
+BLOG_LIST_PAGE_SIZE = 20
+
+# 列表只需要的欄位（摘要、摘錄與閱讀時間已預先計算）；markdownContent / htmlContent 等大型文字欄位不載入
+BLOG_LIST_FIELDS = ('title', 'slug', 'summary', 'excerpt', 'readingMinutes', 'publishedAt', 'updatedAt')
+
+
+def encode_blog_cursor(post):
+    """以 (publishedAt, id) 產生下一頁游標：`<epoch 微秒>.<id>`"""
+    micros = (post.publishedAt - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}.{post.pk}'
+
+
+def decode_blog_cursor(cursor):
+    """解析游標，格式錯誤時回傳 None"""
+    try:
+        micros, pk = cursor.split('.')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (ValueError, OverflowError):
+        return None
+
+
+class BlogListPage:
+    """
+    以 (publishedAt, id) 做 keyset 分頁的一頁文章。
+
+    查詢延遲到模板第一次讀取 `posts` 時才執行，片段快取命中時完全不查詢資料庫。
+    不論翻到第幾頁都只掃描索引上的 pageSize + 1 筆，不使用 OFFSET。
+    指定 tag 時只列出該標籤的文章（經由 tagSet 關聯表的 tag_id 索引）。
+    """
+
+    def __init__(self, cursor, pageSize, tag=None):
+        self.cursor = cursor
+        self.pageSize = pageSize
+        self.tag = tag
+
+    @property
+    def cacheKey(self):
+        tagSlug = self.tag.slug if self.tag else ''
+        return f'{list_version()}:{tagSlug}:{self.pageSize}:{self.cursor}'
+
+    @cached_property
+    def _rows(self):
+        qs = (
+            BlogPost.objects.filter(status=BlogPost.STATUS_PUBLISHED, publishedAt__isnull=False)
+            .only(*BLOG_LIST_FIELDS)
+            .order_by('-publishedAt', '-id')
+        )
+        if self.tag:
+            qs = qs.filter(tagSet=self.tag)
+        position = decode_blog_cursor(self.cursor) if self.cursor else None
+        if position:
+            publishedAt, pk = position
+            qs = qs.filter(Q(publishedAt__lt=publishedAt) | Q(publishedAt=publishedAt, id__lt=pk))
+        return list(qs[:self.pageSize + 1])
+
+    @property
+    def posts(self):
+        return self._rows[:self.pageSize]
+
+    @property
+    def nextCursor(self):
+        if len(self._rows) <= self.pageSize:
+            return None
+        return encode_blog_cursor(self._rows[self.pageSize - 1])
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value else None
+
+
+def _list_cursor(request):
+    cursor = request.GET.get('cursor', '')
+    if cursor and decode_blog_cursor(cursor) is None:
+        raise Http404('Invalid cursor')
+    return cursor
+
+
+def _render_list_page(request, page, pageUrl, etagParts):
+    response = render(request, 'blog/list.html', {
+        'page': page,
+        'tag': page.tag,
+        'pageUrl': pageUrl,
+        'cacheTimeout': list_cache_timeout(),
+    })
+    # 驗證值只有共用快取的回應會用到；登入使用者的片段快取命中時不應再查詢文章
+    if not is_cacheable(request):
+        return response, None, None
+    lastModified = max((p.updatedAt for p in page.posts), default=None)
+    return response, make_etag(*etagParts, list_version(), page.cursor), _timestamp(lastModified)
+
+
+# 列出公開文章（匿名訪客整頁快取，並支援 ETag / Last-Modified 條件請求）
 def blog_list(request):
-    posts = BlogPost.objects.filter(status=BlogPost.STATUS_PUBLISHED)
-    return render(request, 'blog/list.html', {'posts': posts})
+    cursor = _list_cursor(request)
+
+    def build():
+        page = BlogListPage(cursor, getattr(settings, 'BLOG_LIST_PAGE_SIZE', BLOG_LIST_PAGE_SIZE))
+        return _render_list_page(request, page, reverse('blog_list'), ('list',))
+
+    return cached_page(request, list_page_key(cursor), build)
+
 
+# 列出帶有某個標籤的公開文章（快取方式與 blog_list 相同）
+def blog_tag(request, slug):
+    cursor = _list_cursor(request)
 
-# 顯示單篇文章（公開）
+    def build():
+        tag = get_object_or_404(Tag, slug=slug)
+        page = BlogListPage(cursor, getattr(settings, 'BLOG_LIST_PAGE_SIZE', BLOG_LIST_PAGE_SIZE), tag=tag)
+        return _render_list_page(request, page, reverse('blog_tag', kwargs={'slug': tag.slug}), ('tag', tag.pk))
+
+    return cached_page(request, tag_page_key(slug, cursor), build)
+
+
+# 顯示單篇文章（公開；匿名訪客整頁快取，並支援 ETag / Last-Modified 條件請求）
 def blog_detail(request, slug):
-    post = get_object_or_404(BlogPost, slug=slug, status=BlogPost.STATUS_PUBLISHED)
-    return render(request, 'blog/detail.html', {'post': post})
+    def build():
+        post = get_object_or_404(BlogPost.objects.select_related('author'), slug=slug, status=BlogPost.STATUS_PUBLISHED)
+        response = render(request, 'blog/detail.html', {'post': post})
+        # rerender_posts 更新 htmlContent 時不變更 updatedAt，ETag 另外帶上渲染器版本
+        return response, make_etag(post.pk, post.updatedAt.timestamp(), post.rendererVersion), _timestamp(post.updatedAt)
+
+    return cached_page(request, detail_page_key(slug), build)
 
 
 # 新增或編輯文章（僅限登入使用者）
@@ -2,27 +2,198 @@ import json
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseNotAllowed
 from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_http_methods
-from .models import Category, Product
+from django.urls import reverse
+from .blog_search import MAX_RESULTS, normalize_query, search_posts
+from .bulk_upload import BulkUploadError, collect_uploads, create_product_images, validate_uploads
+from .image_utils import FORMAT_MIME_TYPES, get_variant_specs
+from .models import Category, Product, ProductImage
+
+
+def variants_to_dict(variants, kind, ownerId):
+    """Build srcset strings (per MIME type) and a per-variant summary.
+
+    `variants` should come from a prefetched `.variants.all()` so this does
+    no extra queries; sizes come from stored columns, so no file I/O either.
+    A srcset must list the same picture at different widths, so it only uses
+    variants with the crop mode of the widest configured variant.
+    """
+    variants = sorted(variants, key=lambda v: v.width)
+    crops = {name: spec.crop for name, spec in get_variant_specs().items()}
+    srcsetCrop = next((crops[v.variantName] for v in reversed(variants) if v.variantName in crops), None)
+    srcset = {}
+    summary = {}
+    for v in variants:
+        if crops.get(v.variantName) == srcsetCrop:
+            mime = FORMAT_MIME_TYPES.get(v.format, 'application/octet-stream')
+            srcset.setdefault(mime, []).append(f"{v.file.url} {v.width}w")
+        entry = summary.setdefault(v.variantName, {
+            'width': v.width,
+            'height': v.height,
+            'url': reverse('media_image_variant', args=[kind, ownerId, v.variantName]),
+            'formats': {},
+            'bytes': {},
+        })
+        entry['formats'][v.format] = v.file.url
+        entry['bytes'][v.format] = v.fileSize
+    return {
+        'srcset': {mime: ', '.join(items) for mime, items in srcset.items()},
+        'variants': summary,
+    }
 
 
 def category_to_dict(cat):
     return {
         'id': cat.pk,
         'categoryName': cat.categoryName,
-        'parent': cat.parent.pk if cat.parent else None,
+        'parent': cat.parent_id,
         'thumbnail150': cat.thumbnail150.url if cat.thumbnail150 else None,
         'thumbnail800': cat.thumbnail800.url if cat.thumbnail800 else None,
         'displayOrder': cat.displayOrder,
+        'metadata': cat.image_metadata_dict() if cat.image else None,
+        'placeholder': cat.placeholder or None,
+        'dominantColor': cat.dominantColor or None,
+        **variants_to_dict(cat.variants.all(), 'category', cat.pk),
+    }
+
+
+def product_image_to_dict(img):
+    return {
+        'id': img.pk,
+        'image': img.image.url if img.image else None,
+        'metadata': img.image_metadata_dict(),
+        'placeholder': img.placeholder or None,
+        'dominantColor': img.dominantColor or None,
+        'altText': img.altText,
+        'isPrimary': img.isPrimary,
+        'displayOrder': img.displayOrder,
+        'thumbnail150': img.thumbnail150.url if img.thumbnail150 else None,
+        'thumbnail800': img.thumbnail800.url if img.thumbnail800 else None,
+        **variants_to_dict(img.variants.all(), 'product', img.pk),
     }
 
 
 @require_http_methods(['GET'])
 def api_categories_list(request):
-    cats = Category.objects.filter(isActive=True).order_by('displayOrder', 'categoryName')
+    cats = Category.objects.filter(isActive=True).order_by('displayOrder', 'categoryName').prefetch_related('variants')
     data = [category_to_dict(c) for c in cats]
     return JsonResponse({'results': data})
 
 
+@require_http_methods(['GET'])
+def api_product_images(request, product_id):
+    product = get_object_or_404(Product, pk=product_id)
+    images = ProductImage.objects.filter(product=product).order_by('-isPrimary', 'displayOrder', 'uploadedAt').prefetch_related('variants')
+    return JsonResponse({'results': [product_image_to_dict(img) for img in images]})
+
+
+@require_http_methods(['POST'])
+def api_product_images_bulk(request, product_id):
+    """
+    一次上傳多張商品圖片。
+
+    multipart 欄位：
+    - images：一或多個圖片檔案，或內含圖片的 zip 壓縮檔
+    - primary：（選填）要設為主圖的圖片索引（依上傳順序，從 0 開始）
+    - altText：（選填）套用到所有圖片的替代文字
+
+    任一張圖片驗證失敗時整批不寫入，回傳 400 與逐檔錯誤。
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    product = get_object_or_404(Product, pk=product_id)
+
+    primaryIndex = request.POST.get('primary')
+    if primaryIndex not in (None, ''):
+        try:
+            primaryIndex = int(primaryIndex)
+        except ValueError:
+            return HttpResponseBadRequest('primary must be an integer')
+    else:
+        primaryIndex = None
+
+    try:
+        uploads = collect_uploads(request.FILES.getlist('images'))
+    except BulkUploadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if primaryIndex is not None and not 0 <= primaryIndex < len(uploads):
+        return HttpResponseBadRequest('primary is out of range')
+
+    errors = validate_uploads(uploads)
+    if errors:
+        return JsonResponse({'error': 'Invalid images', 'errors': errors}, status=400)
+
+    images = create_product_images(product, uploads, primaryIndex=primaryIndex, altText=request.POST.get('altText', '')[:255])
+    return JsonResponse({'results': [product_image_to_dict(img) for img in images]}, status=201)
+
+
+@require_http_methods(['POST'])
+def api_product_images_reorder(request, product_id):
+    """
+    重新排序商品圖片並可同時切換主圖。
+
+    JSON：{"order": [圖片 id, ...], "primary": 圖片 id（選填）}
+    order 需包含該商品所有圖片；排序與主圖在同一交易中以 UPDATE ... CASE 寫入。
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    try:
+        payload = json.loads(request.body.decode('utf-8'))
+    except Exception:
+        return HttpResponseBadRequest('Invalid JSON')
+
+    order = payload.get('order') if isinstance(payload, dict) else None
+    primary = payload.get('primary') if isinstance(payload, dict) else None
+    if not isinstance(order, list) or not all(isinstance(i, int) for i in order):
+        return HttpResponseBadRequest('Expecting {"order": [1,2,...], "primary": 1}')
+    if primary is not None and not isinstance(primary, int):
+        return HttpResponseBadRequest('primary must be an image id')
+
+    product = get_object_or_404(Product, pk=product_id)
+    try:
+        ProductImage.reorder(product, order, primaryId=primary)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    images = ProductImage.objects.filter(product=product).order_by('displayOrder').values('id', 'displayOrder', 'isPrimary')
+    return JsonResponse({'results': list(images)})
+
+
+@require_http_methods(['POST'])
+def api_clone_product(request, product_id):
+    """
+    複製商品（含分類指派與圖片）；圖片檔案共用或以硬連結建立，不重新產生縮圖。
+
+    JSON（選填）：{"productName": "新商品名稱"}
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    payload = {}
+    if request.body:
+        try:
+            payload = json.loads(request.body.decode('utf-8'))
+        except Exception:
+            return HttpResponseBadRequest('Invalid JSON')
+        if not isinstance(payload, dict):
+            return HttpResponseBadRequest('Expecting {"productName": "..."}')
+
+    productName = payload.get('productName')
+    if productName is not None and (not isinstance(productName, str) or not productName.strip() or len(productName) > 200):
+        return HttpResponseBadRequest('productName must be a non-empty string of at most 200 characters')
+
+    product = get_object_or_404(Product, pk=product_id)
+    clone = product.clone(productName=productName)
+    return JsonResponse({
+        'id': clone.pk,
+        'productName': clone.productName,
+        'categoryIds': list(clone.categories.values_list('pk', flat=True)),
+        'imageCount': clone.images.count(),
+    }, status=201)
+
+
 def _gather_descendant_ids(cat):
     ids = [cat.pk]
     for child in cat.children.all():
@@ -74,3 +245,23 @@ def api_assign_product_categories(request, product_id):
 
     product.categories.set(cats)
     return JsonResponse({'status': 'ok', 'assigned_ids': [c.pk for c in cats]})
+
+
+@require_http_methods(['GET'])
+def api_blog_search(request):
+    """Public ranked full-text search over published posts (see blog_search)."""
+    query = normalize_query(request.GET.get('q', ''))
+    if not query:
+        return HttpResponseBadRequest('q is required')
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        return HttpResponseBadRequest('limit must be an integer')
+    if not 1 <= limit <= MAX_RESULTS:
+        return HttpResponseBadRequest(f'limit must be between 1 and {MAX_RESULTS}')
+
+    results = [
+        {**r, 'url': reverse('blog_detail', kwargs={'slug': r['slug']})}
+        for r in search_posts(query, limit)
+    ]
+    return JsonResponse({'query': query, 'results': results})
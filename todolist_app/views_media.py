@@ -0,0 +1,107 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.core.files.utils import validate_file_name
+from django.db.models import OuterRef, Subquery
+from django.http import Http404
+from django.views.decorators.http import require_http_methods
+from django.shortcuts import get_object_or_404
+from .image_utils import FORMAT_MIME_TYPES, get_variant_specs, negotiate_format
+from .media_serving import serve_file
+from .models import ImageBlob, ImageVariant, ProductImage
+from . import thumb_cache
+import os
+
+
+# URL 中的 kind 對應到 ImageVariant 的擁有者欄位
+VARIANT_OWNER_FIELDS = {
+    'product': 'productImage_id',
+    'category': 'category_id',
+}
+
+# 變體名稱不在目前設定中時使用的格式偏好順序
+DEFAULT_FORMAT_PREFERENCE = ('AVIF', 'WEBP', 'PNG', 'JPEG')
+
+# 依 Accept 協商的網址內容可能隨設定改變，不能標記為 immutable
+NEGOTIATED_CACHE_CONTROL = 'public, max-age=86400'
+
+
+def _format_preference(variantName, available):
+    spec = get_variant_specs().get(variantName)
+    preference = spec.formats if spec else DEFAULT_FORMAT_PREFERENCE
+    ordered = tuple(f for f in preference if f in available)
+    # 只協商設定中仍列出的格式，順序與 fallback 都以設定為準；
+    # 已從設定移除的舊變體不再提供，除非已沒有任何設定中的格式可用
+    return ordered or tuple(sorted(available))
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_image_variant(request, kind, pk, variant):
+    """依 Accept 標頭挑選最佳格式（AVIF/WebP/JPEG）回傳圖片變體"""
+    ownerField = VARIANT_OWNER_FIELDS.get(kind)
+    if ownerField is None:
+        raise Http404('Unknown image kind')
+
+    rows = {v.format: v for v in ImageVariant.objects.filter(**{ownerField: pk, 'variantName': variant})}
+    if not rows:
+        raise Http404('Variant not found')
+
+    fmt = negotiate_format(request.headers.get('Accept', ''), _format_preference(variant, rows))
+    chosen = rows[fmt]
+    return serve_file(
+        request, chosen.file.storage, chosen.file.name,
+        content_type=FORMAT_MIME_TYPES.get(fmt, 'application/octet-stream'),
+        cache_control=NEGOTIATED_CACHE_CONTROL, vary='Accept',
+    )
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_thumbnail(request, image_id, variant):
+    """
+    依需求產生商品圖片縮圖。
+
+    已於上傳時產生（eager）的變體直接回傳既有檔案；其餘變體在第一次請求時
+    產生並寫入磁碟快取，之後的請求直接由快取回傳。
+    """
+    spec = get_variant_specs().get(variant)
+    if spec is None:
+        raise Http404('Unknown variant')
+
+    fmt = negotiate_format(request.headers.get('Accept', ''), spec.formats)
+    mime = FORMAT_MIME_TYPES[fmt]
+
+    stored = ImageVariant.objects.filter(productImage_id=image_id, variantName=variant, format=fmt).first()
+    if stored is not None:
+        try:
+            return serve_file(request, stored.file.storage, stored.file.name, content_type=mime, cache_control=NEGOTIATED_CACHE_CONTROL, vary='Accept')
+        except Http404:
+            # 變體檔案遺失時改由快取重新產生
+            pass
+
+    # 快取以原始檔的內容雜湊定址；同一查詢中一併取得對應 ImageBlob 的雜湊
+    blobHash = ImageBlob.objects.filter(fileName=OuterRef('image')).values('contentHash')[:1]
+    image = get_object_or_404(ProductImage.objects.only('id', 'image').annotate(blobHash=Subquery(blobHash)), pk=image_id)
+    if not image.image:
+        raise Http404('Image has no file')
+    try:
+        path = thumb_cache.get_or_render(image.image, spec, fmt, image.blobHash)
+    except (FileNotFoundError, OSError):
+        raise Http404('Source image missing')
+    return serve_file(
+        request, thumb_cache.cache_storage(), os.path.relpath(path, thumb_cache.cache_dir()),
+        content_type=mime, cache_control=NEGOTIATED_CACHE_CONTROL, vary='Accept',
+    )
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_media(request, path):
+    """
+    回傳預設儲存空間（本機 MEDIA_ROOT 或 S3 相容的 bucket）中的檔案，取代僅在 DEBUG 啟用的 static() 路由。
+
+    支援 ETag / Last-Modified 條件請求與 Range；檔名帶 uuid 或內容雜湊前綴的檔案
+    標記為 immutable。設定 MEDIA_ACCEL_MODE 時改由前端 proxy 傳送檔案。
+    """
+    try:
+        validate_file_name(path, allow_relative_path=True)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    return serve_file(request, default_storage, path)
@@ -0,0 +1,163 @@
+"""
+RSS / Atom 訂閱與 XML sitemap
+
+所有文件都以分批查詢（.iterator(chunk_size=...)）逐段產生並串流輸出，同時分段寫入快取；
+版本（文章列表版本 / 商品目錄版本）變更後舊文件自然失效。詳見 syndication 模組。
+"""
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import Http404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from xml.sax.saxutils import escape
+import io
+import math
+
+from .blog_cache import blog_cache, list_version
+from .models import BlogPost, Category, Product
+from .syndication import CHUNK_ROWS, DOC_KEY_PREFIX, catalog_version, chunked, document_response, sitemap_max_urls
+
+
+# 訂閱中的文章數（沒有摘要的文章以渲染時產生的 excerpt 作為描述）
+FEED_ITEMS = 50
+
+FEED_TYPES = {
+    'rss': (Rss201rev2Feed, 'application/rss+xml; charset=utf-8'),
+    'atom': (Atom1Feed, 'application/atom+xml; charset=utf-8'),
+}
+
+SITEMAP_CONTENT_TYPE = 'application/xml; charset=utf-8'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def _doc_key(request, *parts):
+    # 文件內含絕對網址，依 scheme 與 host 分開快取
+    return ':'.join([DOC_KEY_PREFIX, request.scheme, request.get_host(), *map(str, parts)])
+
+
+def _lastmod(value):
+    return value.isoformat(timespec='seconds') if value else None
+
+
+# ==================== 訂閱 ====================
+
+def blog_feed(request, kind):
+    """已發佈文章的 RSS 2.0 / Atom 1.0 訂閱（最新 FEED_ITEMS 篇）"""
+    feedClass, contentType = FEED_TYPES[kind]
+    version = list_version()
+
+    def generate():
+        feed = feedClass(
+            title=getattr(settings, 'BLOG_FEED_TITLE', '部落格'),
+            link=request.build_absolute_uri(reverse('blog_list')),
+            description=getattr(settings, 'BLOG_FEED_DESCRIPTION', '最新文章'),
+            language='zh-TW',
+            feed_url=request.build_absolute_uri(),
+        )
+        posts = (
+            BlogPost.objects.filter(status=BlogPost.STATUS_PUBLISHED, publishedAt__isnull=False)
+            .select_related('author')
+            .prefetch_related('tagSet')
+            .only('title', 'slug', 'summary', 'excerpt', 'publishedAt', 'updatedAt', 'author__username')
+            .order_by('-publishedAt', '-id')[:FEED_ITEMS]
+        )
+        for post in posts.iterator(chunk_size=FEED_ITEMS):
+            link = request.build_absolute_uri(reverse('blog_detail', kwargs={'slug': post.slug}))
+            feed.add_item(
+                title=post.title,
+                link=link,
+                description=post.summary or post.excerpt,
+                unique_id=link,
+                pubdate=post.publishedAt,
+                updateddate=post.updatedAt,
+                author_name=post.author.username,
+                categories=[tag.name for tag in post.tagSet.all()],
+            )
+        out = io.StringIO()
+        feed.write(out, 'utf-8')
+        yield out.getvalue()
+
+    key = _doc_key(request, 'feed', kind, version)
+    return document_response(request, key, f'feed-{kind}-{version}', contentType, generate)
+
+
+# ==================== Sitemap ====================
+
+def _sitemap_sections(request):
+    """
+    啟用的 sitemap 區段：名稱 ->（版本、依 pk 排序的 (網址參數, updatedAt) 查詢、網址產生函式）。
+
+    商品與分類沒有本站的公開頁面，網址由 CATALOG_PRODUCT_URL / CATALOG_CATEGORY_URL
+    （含 `{id}` 的網址樣板，例如前台網站的商品頁）決定；未設定時不列出該區段。
+    """
+    postUrl = request.build_absolute_uri(reverse('blog_detail', kwargs={'slug': '__slug__'}))
+    sections = {
+        'posts': (
+            list_version(),
+            BlogPost.objects.filter(status=BlogPost.STATUS_PUBLISHED, publishedAt__isnull=False).values_list('slug', 'updatedAt'),
+            lambda slug: postUrl.replace('__slug__', slug),
+        ),
+    }
+    for name, model, setting in (('products', Product, 'CATALOG_PRODUCT_URL'), ('categories', Category, 'CATALOG_CATEGORY_URL')):
+        template = getattr(settings, setting, '')
+        if template:
+            # 先換成佔位字，避免 build_absolute_uri 把大括號編碼掉
+            template = request.build_absolute_uri(template.replace('{id}', '__id__'))
+            sections[name] = (
+                catalog_version(),
+                model.objects.filter(isActive=True).values_list('pk', 'updatedAt'),
+                lambda pk, template=template: template.replace('__id__', str(pk)),
+            )
+    return sections
+
+
+def sitemap_index(request):
+    """Sitemap index：每個區段依 SITEMAP_MAX_URLS（預設 50,000）切成多個 sitemap 檔"""
+    sections = _sitemap_sections(request)
+    versions = '-'.join(str(version) for version, _, _ in sections.values())
+    limit = sitemap_max_urls()
+
+    def generate():
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+        for name, (_, qs, _) in sections.items():
+            stats = qs.order_by().aggregate(total=Count('pk'), lastmod=Max('updatedAt'))
+            lastmod = _lastmod(stats['lastmod'])
+            for page in range(1, max(math.ceil(stats['total'] / limit), 1) + 1):
+                loc = request.build_absolute_uri(reverse('sitemap_section', kwargs={'section': name, 'page': page}))
+                entry = f'<sitemap><loc>{escape(loc)}</loc>'
+                if lastmod:
+                    entry += f'<lastmod>{lastmod}</lastmod>'
+                yield entry + '</sitemap>\n'
+        yield '</sitemapindex>\n'
+
+    key = _doc_key(request, 'sitemap-index', limit, versions)
+    return document_response(request, key, f'sitemap-{limit}-{versions}', SITEMAP_CONTENT_TYPE, generate)
+
+
+def sitemap_section(request, section, page):
+    """單一 sitemap 檔：區段中依 pk 排序的第 page 批網址"""
+    sections = _sitemap_sections(request)
+    if section not in sections or page < 1:
+        raise Http404('Unknown sitemap')
+    version, qs, makeUrl = sections[section]
+    limit = sitemap_max_urls()
+    start = (page - 1) * limit
+    rows = qs.order_by('pk')[start:start + limit]
+    key = _doc_key(request, 'sitemap', section, page, limit, version)
+    # 第 1 頁即使沒有網址也回傳空的 urlset；其他頁超出範圍時 404（已快取時不需查詢）
+    if page > 1 and blog_cache().get(key) is None and not rows[:1].exists():
+        raise Http404('Sitemap page out of range')
+
+    def render(row):
+        arg, updatedAt = row
+        entry = f'<url><loc>{escape(makeUrl(arg))}</loc>'
+        if updatedAt:
+            entry += f'<lastmod>{_lastmod(updatedAt)}</lastmod>'
+        return entry + '</url>\n'
+
+    def generate():
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+        yield from chunked(rows.iterator(chunk_size=CHUNK_ROWS), render, CHUNK_ROWS)
+        yield '</urlset>\n'
+
+    return document_response(request, key, f'sitemap-{section}-{page}-{limit}-{version}', SITEMAP_CONTENT_TYPE, generate)